@@ -0,0 +1,340 @@
+"""
+`asyncio`-friendly counterparts to `.Connection` and `.Group`.
+
+Paramiko (and thus `.Connection`) is a blocking library, so the classes in
+this module dispatch each blocking operation to a
+`~concurrent.futures.ThreadPoolExecutor` and hand back an awaitable. That is,
+this is an `asyncio` interface over threads: the number of threads doing work
+at any one time is bounded by that executor's size (see the
+``aio.max_workers`` :ref:`config setting <default-values>`), not by the number
+of hosts being driven, so thousands of connections may be awaited from a
+single event loop -- but only that many operations make progress at once.
+
+.. note::
+    Each *open* connection still owns Paramiko's own transport thread; the
+    executor bounds the number of operations (handshakes, commands,
+    transfers) in flight, not the number of open transports. Close
+    connections you no longer need.
+
+.. versionadded:: 3.3
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .config import Config
+from .connection import Connection
+from .exceptions import GroupException
+from .group import GroupResult, _member_configs
+
+
+class AsyncConnection:
+    """
+    Awaitable wrapper around a `.Connection`.
+
+    Instantiation takes the same arguments as `.Connection` itself, plus an
+    optional ``executor`` keyword argument (a `concurrent.futures.Executor`
+    used to run blocking operations; defaults to the event loop's default
+    executor). To wrap an existing `.Connection`, use `from_connection`.
+
+    All methods mirror their `.Connection` counterparts in arguments and
+    return values, but must be awaited::
+
+        async def main():
+            async with AsyncConnection("web1") as cxn:
+                result = await cxn.run("uname -s", hide=True)
+
+    Attribute access not defined here (``host``, ``user``, ``is_connected``,
+    etc) is passed through to the wrapped `.Connection`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, *args, executor=None, **kwargs):
+        #: The wrapped, synchronous `.Connection`.
+        self.connection = Connection(*args, **kwargs)
+        #: The executor blocking calls are dispatched to (``None`` means the
+        #: running loop's default executor).
+        self.executor = executor
+
+    @classmethod
+    def from_connection(cls, connection, executor=None):
+        """
+        Alternate constructor wrapping an existing `.Connection` object.
+
+        .. versionadded:: 3.3
+        """
+        obj = cls.__new__(cls)
+        obj.connection = connection
+        obj.executor = executor
+        return obj
+
+    def __getattr__(self, name):
+        # Only called for attributes we don't define ourselves. (Guard against
+        # recursion if 'connection' itself isn't set yet, e.g. when copying.)
+        if name == "connection":
+            raise AttributeError(name)
+        return getattr(self.connection, name)
+
+    def __repr__(self):
+        return "<Async{}".format(repr(self.connection)[1:])
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(func, *args, **kwargs)
+        )
+
+    async def open(self):
+        """
+        Await `.Connection.open`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.open)
+
+    async def close(self):
+        """
+        Await `.Connection.close`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.close)
+
+    async def run(self, command, **kwargs):
+        """
+        Await `.Connection.run`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.run, command, **kwargs)
+
+    async def sudo(self, command, **kwargs):
+        """
+        Await `.Connection.sudo`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.sudo, command, **kwargs)
+
+    async def put(self, *args, **kwargs):
+        """
+        Await `.Connection.put`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.put, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        """
+        Await `.Connection.get`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._call(self.connection.get, *args, **kwargs)
+
+    def forward_local(self, *args, **kwargs):
+        """
+        Asynchronous context manager version of `.Connection.forward_local`.
+
+        Takes the same arguments; use with ``async with``::
+
+            async with cxn.forward_local(5432):
+                await do_database_things()
+
+        .. versionadded:: 3.3
+        """
+        return _AsyncContextManager(
+            self, partial(self.connection.forward_local, *args, **kwargs)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class _AsyncContextManager:
+    """
+    Drive a synchronous context manager's enter/exit from an executor.
+
+    Takes a factory for the manager rather than the manager itself, as merely
+    creating some of them (e.g. anything decorated with ``@opens``) blocks.
+    """
+
+    def __init__(self, cxn, factory):
+        self.cxn = cxn
+        self.factory = factory
+        self.manager = None
+
+    async def __aenter__(self):
+        def enter():
+            self.manager = self.factory()
+            return self.manager.__enter__()
+
+        return await self.cxn._call(enter)
+
+    async def __aexit__(self, *exc):
+        # Always tear down from a clean slate; the synchronous managers we
+        # wrap only use their exit for cleanup, and any exception from the
+        # block itself will continue propagating on its own.
+        await self.cxn._call(self.manager.__exit__, None, None, None)
+
+
+class AsyncGroup(list):
+    """
+    A collection of `.AsyncConnection` objects whose API operates on them
+    concurrently, as coroutines.
+
+    Behaves like `.Group` -- methods return a `.GroupResult`, or raise a
+    `.GroupException` wrapping one if any member failed -- except that those
+    methods must be awaited.
+
+    This is an `asyncio` interface over threads, not a non-blocking SSH
+    implementation: Paramiko only offers blocking calls, so each operation
+    (handshake, command, transfer) occupies a thread while it runs. What
+    this class changes is that those threads come from a single pool of
+    ``max_workers`` threads shared by all members, instead of one per host.
+    At most that many operations run at once, whatever the size of the
+    group; the rest wait their turn, so very large groups are worked through
+    in waves::
+
+        async def main():
+            async with AsyncGroup(*hosts, max_workers=64) as group:
+                results = await group.run("uptime", hide=True)
+
+    .. note::
+        As noted in `fabric.aio`, every *open* connection also keeps its own
+        Paramiko transport thread, on top of the pool.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, *hosts, max_workers=None, **kwargs):
+        """
+        Create a group of connections from one or more host strings.
+
+        Keyword arguments other than ``max_workers`` are handed to each
+        `.Connection` constructor, as with `.Group`.
+
+        :param int max_workers:
+            Size of the shared thread pool, i.e. the most operations that may
+            run at once across the whole group. Default: the
+            ``aio.max_workers`` :ref:`config setting <default-values>`.
+        """
+        # As with Group, members' configs are clones of one another (sharing
+        # ssh_config data and gateways) unless one is given.
+        config = kwargs.pop("config", None)
+        if config is not None:
+            configs = [config] * len(hosts)
+        else:
+            configs = _member_configs(len(hosts)) if hosts else []
+        if max_workers is None:
+            source = (
+                config if config is not None else next(iter(configs), None)
+            )
+            if isinstance(source, Config):
+                max_workers = source.aio.max_workers
+            else:
+                max_workers = Config.global_defaults()["aio"]["max_workers"]
+        #: The `~concurrent.futures.ThreadPoolExecutor` shared by all members.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.extend(
+            AsyncConnection(
+                host, executor=self.executor, config=config, **kwargs
+            )
+            for host, config in zip(hosts, configs)
+        )
+
+    @classmethod
+    def from_connections(cls, connections, **kwargs):
+        """
+        Alternate constructor accepting `.Connection` objects.
+
+        .. versionadded:: 3.3
+        """
+        group = cls(**kwargs)
+        group.extend(
+            AsyncConnection.from_connection(x, executor=group.executor)
+            for x in connections
+        )
+        return group
+
+    async def _do(self, method, *args, **kwargs):
+        values = await asyncio.gather(
+            *(getattr(cxn, method)(*args, **kwargs) for cxn in self),
+            return_exceptions=True,
+        )
+        results = GroupResult(
+            (cxn.connection, value) for cxn, value in zip(self, values)
+        )
+        if results.failed:
+            raise GroupException(results)
+        return results
+
+    async def run(self, *args, **kwargs):
+        """
+        Await `.AsyncConnection.run` on all members.
+
+        :returns: a `.GroupResult`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._do("run", *args, **kwargs)
+
+    async def sudo(self, *args, **kwargs):
+        """
+        Await `.AsyncConnection.sudo` on all members.
+
+        :returns: a `.GroupResult`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._do("sudo", *args, **kwargs)
+
+    async def put(self, *args, **kwargs):
+        """
+        Await `.AsyncConnection.put` on all members.
+
+        :returns: a `.GroupResult`.
+
+        .. versionadded:: 3.3
+        """
+        return await self._do("put", *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        """
+        Await `.AsyncConnection.get` on all members.
+
+        As with `.Group.get`, ``local`` defaults to ``"{host}/"``.
+
+        :returns: a `.GroupResult`.
+
+        .. versionadded:: 3.3
+        """
+        if len(args) < 2 and "local" not in kwargs:
+            kwargs["local"] = "{host}/"
+        return await self._do("get", *args, **kwargs)
+
+    async def close(self):
+        """
+        Close all member connections, then shut down the shared thread pool.
+
+        The group cannot be used again afterwards. Using it as an asynchronous
+        context manager (``async with``) calls this on exit.
+
+        .. versionadded:: 3.3
+        """
+        await asyncio.gather(*(cxn.close() for cxn in self))
+        # Waiting for the pool's threads to exit blocks, if only briefly.
+        await asyncio.get_running_loop().run_in_executor(
+            None, self.executor.shutdown
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,16 +1,336 @@
+from fnmatch import fnmatch
 from functools import partial
 from getpass import getpass
+import json
+import os
 from pathlib import Path
+from threading import Lock
+import time
 
 from paramiko import Agent, PKey
 from paramiko.auth_strategy import (
+    AuthFailure,
     AuthStrategy,
     Password,
     InMemoryPrivateKey,
     OnDiskPrivateKey,
 )
 
-from .util import win32
+from .util import debug, win32
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class KeyCache:
+    """
+    Thread-safe, process-wide cache of private keys loaded from disk.
+
+    Keys are loaded via `~paramiko.pkey.PKey.from_path` and reused for as long
+    as the key file (and any ``-cert.pub`` certificate alongside it) keeps the
+    same modification time, size and inode.
+
+    Used by `.OpenSSHAuthStrategy` via the module-level ``key_cache``
+    instance, when the ``authentication.cache_keys`` config setting is
+    enabled.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def load(self, path):
+        """
+        Return the key at ``path``, loading it only if not already cached.
+
+        Raises the same exceptions as `~paramiko.pkey.PKey.from_path`;
+        failures (e.g. keys requiring a passphrase) are never cached.
+        """
+        given, path = path, os.path.expanduser(str(path))
+        # PKey.from_path accepts either half of a key/cert pair.
+        cert_suffix = "-cert.pub"
+        key_path = (
+            path[: -len(cert_suffix)] if path.endswith(cert_suffix) else path
+        )
+        try:
+            signature = (
+                _signature(key_path),
+                _signature(key_path + cert_suffix)
+                if os.path.exists(key_path + cert_suffix)
+                else None,
+            )
+        except OSError:
+            # Let PKey.from_path complain about it (or not) as usual.
+            return PKey.from_path(given)
+        with self._lock:
+            cached = self._keys.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        debug("Loading private key from {!r}".format(path))
+        key = PKey.from_path(path)
+        with self._lock:
+            self._keys[path] = (signature, key)
+        return key
+
+    def clear(self):
+        """
+        Forget every cached key.
+        """
+        with self._lock:
+            self._keys.clear()
+
+
+class AgentCache:
+    """
+    Thread-safe, process-wide holder of a shared SSH agent connection.
+
+    Connecting to an agent (which is when `~paramiko.agent.Agent` fetches its
+    key list) costs a round trip, so rather than every `.OpenSSHAuthStrategy`
+    opening -- and closing -- its own connection, they share one, which is
+    replaced (picking up keys added to or removed from the agent) once it is
+    older than a given TTL. Signing requests over the shared connection are
+    serialized, as the agent protocol has no way to tell concurrent responses
+    apart.
+
+    Used via the module-level ``agent_cache`` instance, when the
+    ``authentication.agent_keys_ttl`` config setting is non-empty.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._agent = None
+        self._created = None
+        self._pid = None
+
+    def get(self, ttl):
+        """
+        Return the shared agent, (re)connecting first if it is over ``ttl``
+        seconds old.
+        """
+        with self._lock:
+            now = time.monotonic()
+            stale = (
+                self._agent is None
+                or now - self._created >= ttl
+                # Don't share a socket with our parent process.
+                or os.getpid() != self._pid
+            )
+            if stale:
+                # NOTE: the previous agent isn't closed, as other threads may
+                # still be signing with its keys; it is closed on garbage
+                # collection once they're done.
+                self._agent = _serialized(Agent())
+                self._created, self._pid = now, os.getpid()
+            return self._agent
+
+    def clear(self):
+        """
+        Close and forget the shared agent, if any.
+        """
+        with self._lock:
+            if self._agent is not None and self._pid == os.getpid():
+                self._agent.close()
+            self._agent = None
+
+
+def _serialized(agent):
+    # Guard an agent's request/response cycle with a lock, so concurrent
+    # users (e.g. AgentKey.sign_ssh_data) don't interleave on its socket.
+    lock = Lock()
+    send_message = agent._send_message
+
+    def locked(msg):
+        with lock:
+            return send_message(msg)
+
+    agent._send_message = locked
+    return agent
+
+
+class AuthMemo:
+    """
+    Thread-safe record of which auth source last worked for each host & user.
+
+    Sources are identified by `source_id`. If ``path`` is given, the record is
+    also loaded from (on first use) and saved to (on every change) that JSON
+    file, so it outlives the current process.
+
+    Used by `.OpenSSHAuthStrategy` when the ``authentication.memoize`` config
+    setting is enabled; see `auth_memo`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, path=None):
+        #: Path of the on-disk copy of this memo, if any.
+        self.path = path
+        self._lock = Lock()
+        self._entries = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+    def get(self, host, user):
+        """
+        Return the ID of the source which last worked for ``user@host``, or
+        ``None``.
+        """
+        with self._lock:
+            return self._load().get(self._key(host, user))
+
+    def remember(self, host, user, source_id):
+        """
+        Record that the source identified by ``source_id`` worked.
+        """
+        with self._lock:
+            entries = self._load()
+            key = self._key(host, user)
+            if entries.get(key) != source_id:
+                entries[key] = source_id
+                self._save()
+
+    def forget(self, host, user):
+        """
+        Forget whatever was recorded for ``user@host``.
+        """
+        with self._lock:
+            if self._load().pop(self._key(host, user), None) is not None:
+                self._save()
+
+    def _key(self, host, user):
+        return "{}@{}".format(user, host)
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None:
+                try:
+                    with open(self.path) as fd:
+                        self._entries = dict(json.load(fd))
+                except FileNotFoundError:
+                    pass
+                except (OSError, ValueError, TypeError) as e:
+                    debug("Ignoring unreadable {!r}: {}".format(self.path, e))
+        return self._entries
+
+    def _save(self):
+        if self.path is None:
+            return
+        # Write-then-rename, so readers (e.g. other processes) never see a
+        # partial file; last writer wins.
+        temp = "{}.{}.tmp".format(self.path, os.getpid())
+        try:
+            fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w") as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(temp, self.path)
+        except OSError as e:
+            debug("Unable to save {!r}: {}".format(self.path, e))
+
+
+def source_id(source):
+    """
+    Return a string identifying an `~paramiko.auth_strategy.AuthSource`
+    across processes, or ``None`` if it can't be identified.
+
+    Keys (and certs) are identified by type & fingerprint; passwords by the
+    string ``"password"``.
+
+    .. versionadded:: 3.3
+    """
+    if isinstance(source, Password):
+        return "password"
+    pkey = getattr(source, "pkey", None)
+    if pkey is None:
+        return None
+    return "{} {}".format(pkey.get_name(), pkey.fingerprint)
+
+
+_auth_memos = {}
+_auth_memos_lock = Lock()
+
+
+def auth_memo(path=None):
+    """
+    Return the process-wide `AuthMemo` for ``path`` (in-memory only if
+    ``None``), creating it if necessary.
+
+    .. versionadded:: 3.3
+    """
+    if path is not None:
+        path = os.path.abspath(os.path.expanduser(str(path)))
+    with _auth_memos_lock:
+        if path not in _auth_memos:
+            _auth_memos[path] = AuthMemo(path)
+        return _auth_memos[path]
+
+
+#: The process-wide `KeyCache` used by `.OpenSSHAuthStrategy`.
+key_cache = KeyCache()
+
+#: The process-wide `AgentCache` used by `.OpenSSHAuthStrategy`.
+agent_cache = AgentCache()
+
+
+def _identity(key):
+    # What makes two keys the same, as far as servers are concerned: their
+    # public half, which the fingerprint summarizes. Certs have the same
+    # fingerprint as their keys, but are offered (and accepted) separately.
+    cert = getattr(key, "public_blob", None) is not None
+    return (cert, key.fingerprint)
+
+
+# Signature algorithms usable with each key type, beyond its own name.
+_RSA_ALGORITHMS = ("rsa-sha2-512", "rsa-sha2-256")
+_CERT_SUFFIX = "-cert-v01@openssh.com"
+
+
+def _key_algorithms(name):
+    if name == "ssh-rsa":
+        return (name,) + _RSA_ALGORITHMS
+    if name == "ssh-rsa" + _CERT_SUFFIX:
+        return (name,) + tuple(x + _CERT_SUFFIX for x in _RSA_ALGORITHMS)
+    return (name,)
+
+
+def _accepted_algorithms(ssh_config):
+    """
+    Return a predicate telling whether a key is allowed by ``ssh_config``'s
+    ``PubkeyAcceptedAlgorithms`` (or older ``PubkeyAcceptedKeyTypes``).
+
+    Lists which only add to (``+``) or reorder (``^``) OpenSSH's defaults
+    allow everything we can load; ``-`` lists remove matching algorithms.
+    Keys whose type is unknown are always allowed.
+    """
+    value = ssh_config.get("pubkeyacceptedalgorithms") or ssh_config.get(
+        "pubkeyacceptedkeytypes"
+    )
+    if not value or value[0] in "+^":
+        return lambda key: True
+    exclude = value[0] == "-"
+    patterns = (value[1:] if exclude else value).split(",")
+
+    def accepted(key):
+        name = key.get_name()
+        if not name:
+            return True
+        matches = [
+            any(fnmatch(x, pattern) for pattern in patterns)
+            for x in _key_algorithms(name)
+        ]
+        return not all(matches) if exclude else any(matches)
+
+    return accepted
 
 
 class OpenSSHAuthStrategy(AuthStrategy):
@@ -29,12 +349,20 @@ class OpenSSHAuthStrategy(AuthStrategy):
     from the legacy/off-spec auth behavior observed in older Paramiko and
     Fabric versions).
 
+    Each distinct key is only offered once, however many places it was found
+    in, and the ``IdentitiesOnly`` and ``PubkeyAcceptedAlgorithms`` directives
+    are honored, so as not to waste attempts against servers' ``MaxAuthTries``
+    limits.
+
     We explicitly do not document the full details here, because the point is
     to match the documented/observed behavior of OpenSSH. Please see the `ssh
     <https://man.openbsd.org/ssh>`_ and `ssh_config
     <https://man.openbsd.org/ssh_config>`_ man pages for more information.
 
     .. versionadded:: 3.1
+    .. versionchanged:: 3.3
+        Deduplicate keys and honor ``IdentitiesOnly`` and
+        ``PubkeyAcceptedAlgorithms``.
     """
 
     # Skimming openssh code (ssh.c and sshconnect2.c) gives us the following
@@ -79,14 +407,32 @@ class OpenSSHAuthStrategy(AuthStrategy):
           invoke/fabric-configuration, and ssh_config configuration.
 
         Also handles connecting to an SSH agent, if possible, for easier
-        lifecycle tracking.
+        lifecycle tracking. Unless the ``authentication.agent_keys_ttl``
+        config setting is empty, this agent connection is shared with other
+        instances (see `.AgentCache`).
+
+        .. versionchanged:: 3.3
+            Share agent connections between instances.
         """
         super().__init__(ssh_config=ssh_config)
         self.username = username
         self.config = fabric_config
         # NOTE: Agent seems designed to always 'work' even w/o a live agent, in
         # which case it just yields an empty key list.
-        self.agent = Agent()
+        ttl = self.config.authentication.agent_keys_ttl
+        self._shared_agent = bool(ttl)
+        self.agent = agent_cache.get(ttl) if ttl else Agent()
+        # Which source worked last time, if memoizing (see get_sources).
+        self.memo = None
+        if self.config.authentication.memoize:
+            self.memo = auth_memo(self.config.authentication.memo_file)
+
+    def _load_key(self, path):
+        # Parsing keys (and possibly KDF-ing their passphrases) adds up across
+        # many connections; reuse them unless told otherwise.
+        if self.config.authentication.cache_keys:
+            return key_cache.load(path)
+        return PKey.from_path(path)
 
     def get_pubkeys(self):
         # Similar to OpenSSH, we first obtain sources in arbitrary order,
@@ -98,7 +444,7 @@ class OpenSSHAuthStrategy(AuthStrategy):
         # elsewhere!)
         for path in self.config.authentication.identities:
             try:
-                key = PKey.from_path(path)
+                key = self._load_key(path)
             except FileNotFoundError:
                 continue
             source = OnDiskPrivateKey(
@@ -117,7 +463,7 @@ class OpenSSHAuthStrategy(AuthStrategy):
         # implicit cert loading of IdentityFile...
         for path in self.ssh_config.get("identityfile", []):
             try:
-                key = PKey.from_path(path)
+                key = self._load_key(path)
             except FileNotFoundError:
                 continue
             source = OnDiskPrivateKey(
@@ -135,7 +481,7 @@ class OpenSSHAuthStrategy(AuthStrategy):
             for type_ in ("rsa", "ecdsa", "ed25519", "dsa"):
                 path = user_ssh / f"id_{type_}"
                 try:
-                    key = PKey.from_path(path)
+                    key = self._load_key(path)
                 except FileNotFoundError:
                     continue
                 source = OnDiskPrivateKey(
@@ -146,42 +492,76 @@ class OpenSSHAuthStrategy(AuthStrategy):
                 )
                 dest = config_certs if key.public_blob else config_keys
                 dest.append(source)
-        # TODO: set agent_keys to empty list if IdentitiesOnly is true
         agent_keys = self.agent.get_keys()
 
         # We've finally loaded everything; now it's time to throw them upwards
-        # in the intended order...
-        # TODO: define subroutine that dedupes (& honors
-        # PubkeyAcceptedAlgorithms) then rub that on all of the below.
+        # in the intended order, skipping duplicates & disallowed key types.
+        # (Keys are indexed by identity, so this is all linear time.)
+        accepted = _accepted_algorithms(self.ssh_config)
+        identities_only = self.ssh_config.get("identitiesonly") == "yes"
+        config_index = {_identity(x.pkey) for x in config_keys}
+        cli_index = {_identity(x.pkey) for x in cli_keys}
+        seen = set()
+
+        def fresh(key):
+            identity = _identity(key)
+            if identity in seen or not accepted(key):
+                return False
+            seen.add(identity)
+            return True
+
         # First, all local _certs_ (config wins over cli, for w/e reason)
-        for source in config_certs:
-            yield source
-        for source in cli_certs:
-            yield source
+        for source in config_certs + cli_certs:
+            if fresh(source.pkey):
+                yield source
         # Then all agent keys, first ones that were also mentioned in configs,
-        # then 'new' ones not found in configs.
+        # then 'new' ones not found in configs. (The latter are skipped when
+        # IdentitiesOnly is set, unless given on our own CLI/config.)
         deferred_agent_keys = []
         for key in agent_keys:
-            config_index = None
-            for i, config_key in enumerate(config_keys):
-                if config_key.pkey == key:
-                    config_index = i
-                    break
-            if config_index:
-                yield InMemoryPrivateKey(username=self.username, pkey=key)
-                # Nuke so it doesn't get re-yielded by regular conf keys bit
-                del config_keys[config_index]
-            else:
+            identity = _identity(key)
+            if identity in config_index:
+                if fresh(key):
+                    yield InMemoryPrivateKey(username=self.username, pkey=key)
+            elif not identities_only or identity in cli_index:
                 deferred_agent_keys.append(key)
         for key in deferred_agent_keys:
-            yield InMemoryPrivateKey(username=self.username, pkey=key)
-        for source in cli_keys:
-            yield source
-        # This will now be just the config-borne keys that were NOT in agent
-        for source in config_keys:
-            yield source
+            if fresh(key):
+                yield InMemoryPrivateKey(username=self.username, pkey=key)
+        # Then on-disk keys not already offered via the agent.
+        for source in cli_keys + config_keys:
+            if fresh(source.pkey):
+                yield source
 
     def get_sources(self):
+        """
+        Yield every source of authentication, in the order to try them.
+
+        That's public keys & certs (see `get_pubkeys`), then password --
+        except that, when memoizing (see the ``authentication.memoize`` config
+        setting), whichever source last worked for this host & user is moved
+        to the front, skipping attempts doomed to fail (and servers'
+        ``MaxAuthTries`` limits). Should it fail, the rest follow as usual.
+
+        .. versionchanged:: 3.3
+            Added memoization.
+        """
+        sources = self._get_sources()
+        remembered = None
+        if self.memo is not None and self._host is not None:
+            remembered = self.memo.get(self._host, self.username)
+        if remembered is None:
+            yield from sources
+            return
+        sources = list(sources)
+        for i, source in enumerate(sources):
+            if source_id(source) == remembered:
+                self.log.debug(f"Trying previously successful {source} first")
+                yield sources.pop(i)
+                break
+        yield from sources
+
+    def _get_sources(self):
         # TODO: initial none-auth + tracking the response's allowed types.
         # however, SSHClient never did this deeply, and there's no guarantee a
         # server _will_ send anything but "any" anyways...
@@ -192,16 +572,38 @@ class OpenSSHAuthStrategy(AuthStrategy):
         # Then password.
         yield Password(username=self.username, password_getter=prompter)
 
+    @property
+    def _host(self):
+        # The real (post-ssh_config) hostname, keying our memo.
+        try:
+            return self.ssh_config.get("hostname")
+        except AttributeError:
+            return None
+
     def authenticate(self, *args, **kwargs):
-        # Just do what our parent would, except make sure we close() after.
+        # Just do what our parent would, except make sure we close() after,
+        # and note what worked (or that nothing did) if memoizing.
         try:
-            return super().authenticate(*args, **kwargs)
+            result = super().authenticate(*args, **kwargs)
+        except AuthFailure:
+            if self.memo is not None and self._host is not None:
+                self.memo.forget(self._host, self.username)
+            raise
         finally:
             self.close()
+        if self.memo is not None and self._host is not None and result:
+            worked = source_id(result[-1].source)
+            if worked is not None:
+                self.memo.remember(self._host, self.username, worked)
+        return result
 
     def close(self):
         """
         Shut down any resources we ourselves opened up.
+
+        .. versionchanged:: 3.3
+            Shared agent connections are left open.
         """
         # TODO: bare try/except here as "best effort"? ugh
-        self.agent.close()
+        if not self._shared_agent:
+            self.agent.close()
@@ -1,11 +1,16 @@
-import copy
+from collections import deque
 import errno
+import glob
 import os
+import re
+import shlex
+from threading import Lock, RLock
 
 from invoke.config import Config as InvokeConfig, merge_dicts
-from paramiko.config import SSHConfig
+from paramiko.config import SSHConfig, SSHConfigDict
 
 from .runners import Remote, RemoteShell
+from .net import DNSCache
 from .util import get_local_user, debug
 
 
@@ -148,6 +153,21 @@ class Config(InvokeConfig):
         explicit = ssh_config is not None
         self._set(_given_explicit_object=explicit)
 
+        # Cache of ProxyJump-derived gateway Connections, keyed by hop chain;
+        # see Connection.get_gateway. Deliberately not carried over by clone().
+        self._set(_gateways=GatewayCache())
+
+        # Cache of hostname resolutions for Connection.open's address racing;
+        # shared with our clones.
+        self._set(_dns_cache=DNSCache())
+
+        # Memoized per-host lookups (see lookup_ssh_config), the SSH config
+        # files loaded so far and the top-level paths last loaded; all are
+        # shared with our clones.
+        self._set(_ssh_lookups=HostLookupCache())
+        self._set(_ssh_files=SSHConfigFiles())
+        self._set(_loaded_ssh_paths=None)
+
         # Arrive at some non-None SSHConfig object (upon which to run .parse()
         # later, in _load_ssh_file())
         if ssh_config is None:
@@ -180,6 +200,9 @@ class Config(InvokeConfig):
         Also (beforehand) ensures that Invoke-level config re: runtime SSH
         config file paths, is accounted for.
 
+        Files already loaded are not re-read; see `refresh_ssh_config` for
+        picking up changes to them.
+
         .. versionadded:: 2.0
         """
         # Update the runtime SSH config path (assumes enough regular config
@@ -192,6 +215,57 @@ class Config(InvokeConfig):
         if not self._given_explicit_object:
             self._load_ssh_files()
 
+    def refresh_ssh_config(self):
+        """
+        Reload our SSH config files, if any of them have changed on disk.
+
+        Every file loaded (including those pulled in via ``Include``) is
+        tracked by modification time, size and inode, so this is cheap -- a
+        ``stat`` per file -- when nothing has changed, and thus suitable for
+        calling before every batch of work in long-running processes.
+
+        Changes are seen by this config's clones too, since they share its SSH
+        config data.
+
+        :returns: ``True`` if anything was reloaded, ``False`` otherwise.
+
+        .. versionadded:: 3.3
+        """
+        # (Nothing was loaded from disk, e.g. when given an explicit SSHConfig;
+        # clones of configs which did load have the same paths recorded.)
+        if self._loaded_ssh_paths is None:
+            return False
+        if not self._ssh_files.changed():
+            return False
+        debug("SSH config files changed on disk; reloading")
+        self._load_ssh_files(force=True)
+        return True
+
+    def lookup_ssh_config(self, host):
+        """
+        Look up ``host`` in our SSH config data, returning its settings.
+
+        Equivalent to ``base_ssh_config.lookup(host)``, but memoized: matching
+        a host against a large ssh_config (and any canonicalization or
+        ``Match`` processing that entails) happens once per host, no matter
+        how many `.Connection` objects target it -- including those using
+        clones of this config, which share the same cache. The cache is
+        invalidated whenever the SSH config data is (re)loaded.
+
+        ``Include`` directives within loaded files are expanded here, on the
+        first lookup of a host matching the block containing them, rather
+        than up front.
+
+        :returns:
+            A fresh `~paramiko.config.SSHConfigDict`, which callers may
+            modify freely.
+
+        .. versionadded:: 3.3
+        """
+        return self._ssh_lookups.lookup(
+            self.base_ssh_config, host, prepare=self._ssh_files.expand
+        )
+
     def clone(self, *args, **kwargs):
         # TODO: clone() at this point kinda-sorta feels like it's retreading
         # __reduce__ and the related (un)pickling stuff...
@@ -206,14 +280,20 @@ class Config(InvokeConfig):
         # Copy over our custom attributes, so that the clone still resembles us
         # re: recording where the data originally came from (in case anything
         # re-runs ._load_ssh_files(), for example).
+        # The lookup cache goes along with the (shared) SSHConfig it caches.
         for attr in (
             "_runtime_ssh_path",
             "_system_ssh_path",
             "_user_ssh_path",
+            "_ssh_lookups",
+            "_ssh_files",
+            "_loaded_ssh_paths",
+            "_dns_cache",
         ):
             setattr(new, attr, getattr(self, attr))
         # Load SSH configs, in case they weren't prior to now (e.g. a vanilla
-        # Invoke clone(into), instead of a us-to-us clone.)
+        # Invoke clone(into), instead of a us-to-us clone.) This is a no-op if
+        # they already were.
         self.load_ssh_config()
         # All done
         return new
@@ -224,20 +304,21 @@ class Config(InvokeConfig):
         # Transmit our internal SSHConfig via explicit-obj kwarg, thus
         # bypassing any file loading. (Our extension of clone() above copies
         # over other attributes as well so that the end result looks consistent
-        # with reality.)
-        new_config = SSHConfig()
-        # TODO: as with other spots, this implies SSHConfig needs a cleaner
-        # public API re: creating and updating its core data.
-        new_config._config = copy.deepcopy(self.base_ssh_config._config)
-        return dict(kwargs, ssh_config=new_config)
+        # with reality.) The parsed data is shared, not copied: nothing
+        # modifies it after loading, and copying it for every clone gets
+        # expensive with large ssh_config files.
+        return dict(kwargs, ssh_config=self.base_ssh_config)
 
-    def _load_ssh_files(self):
+    def _load_ssh_files(self, force=False):
         """
         Trigger loading of configured SSH config file paths.
 
         Expects that ``base_ssh_config`` has already been set to an
         `~paramiko.config.SSHConfig` object.
 
+        Does nothing if the same paths have already been loaded, unless
+        ``force`` is given; otherwise, any previously loaded data is replaced.
+
         :returns: ``None``.
         """
         # TODO: does this want to more closely ape the behavior of
@@ -250,28 +331,45 @@ class Config(InvokeConfig):
                 raise FileNotFoundError(
                     errno.ENOENT, "No such file or directory", path
                 )
-            self._load_ssh_file(os.path.expanduser(path))
+            paths = [os.path.expanduser(path)]
         elif self.load_ssh_configs:
-            for path in (self._user_ssh_path, self._system_ssh_path):
-                self._load_ssh_file(os.path.expanduser(path))
+            paths = [
+                os.path.expanduser(x)
+                for x in (self._user_ssh_path, self._system_ssh_path)
+            ]
+        else:
+            paths = []
+        if paths == self._loaded_ssh_paths and not force:
+            return
+        self._ssh_files.reset()
+        for path in paths:
+            self._load_ssh_file(path)
+        # Swapped in whole, so concurrent lookups never see partial data.
+        self.base_ssh_config._config = self._ssh_files.rules()
+        self._loaded_ssh_paths = paths
+        self._ssh_lookups.invalidate()
 
     def _load_ssh_file(self, path):
         """
         Attempt to open and parse an SSH config file at ``path``.
 
-        Does nothing if ``path`` is not a path to a valid file.
+        Does nothing if ``path`` is not a path to a valid file (though its
+        later appearance is noticed by `refresh_ssh_config`).
 
         :returns: ``None``.
         """
-        if os.path.isfile(path):
-            old_rules = len(self.base_ssh_config._config)
-            with open(path) as fd:
-                self.base_ssh_config.parse(fd)
-            new_rules = len(self.base_ssh_config._config)
-            msg = "Loaded {} new ssh_config rules from {!r}"
-            debug(msg.format(new_rules - old_rules, path))
+        # As with OpenSSH, relative Include paths are relative to ~/.ssh,
+        # except within the system-wide file.
+        if path == os.path.expanduser(self._system_ssh_path):
+            include_dir = os.path.dirname(path)
         else:
+            include_dir = os.path.expanduser("~/.ssh")
+        rules = self._ssh_files.load(path, include_dir, top=True)
+        if rules is None:
             debug("File not found, skipping")
+        else:
+            msg = "Loaded {} ssh_config rules from {!r}"
+            debug(msg.format(len(rules), path))
 
     @staticmethod
     def global_defaults():
@@ -290,6 +388,9 @@ class Config(InvokeConfig):
         .. versionchanged:: 3.1
             Added the ``authentication`` settings section, plus sub-attributes
             such as ``authentication.strategy_class``.
+        .. versionchanged:: 3.3
+            Added the ``connection_pool``, ``transfers`` and ``tunnels``
+            settings sections, and the ``gateway_concurrency`` setting.
         """
         # TODO: hrm should the run-related things actually be derived from the
         # runner_class? E.g. Local defines local stuff, Remote defines remote
@@ -309,13 +410,29 @@ class Config(InvokeConfig):
         # 'load_ssh_configs' -> ssh.load_configs, 'ssh_config_path' ->
         # ssh.config_path, etc
         ours = {
+            "address_racing": {
+                "attempt_delay": 0.25,
+                "dns_ttl": 60,
+                "enabled": False,
+            },
+            "aio": {"max_workers": 32},
             "authentication": {
+                "agent_keys_ttl": 60,
+                "cache_keys": True,
                 "identities": [],
+                "memo_file": None,
+                "memoize": False,
                 "strategy_class": None,
             },
             "connect_kwargs": {},
+            "connection_pool": {
+                "enabled": False,
+                "idle_timeout": None,
+                "max_size": None,
+            },
             "forward_agent": False,
             "gateway": None,
+            "gateway_concurrency": None,
             "inline_ssh_env": True,
             "load_ssh_configs": True,
             "port": 22,
@@ -325,7 +442,382 @@ class Config(InvokeConfig):
             # TODO: this becomes an override/extend once Invoke grows execution
             # timeouts (which should be timeouts.execute)
             "timeouts": {"connect": None},
+            "transfers": {
+                "channels": 4,
+                "chunk_size": 4194304,
+                "chunked": False,
+                "compress": None,
+                "copy_buffer": 4,
+                "file_workers": 8,
+                "pipeline_depth": None,
+                "progress_interval": 0.5,
+                "resume": False,
+                "sync_block_size": 1048576,
+            },
+            "tunnels": {
+                "channel_chunk_size": 65536,
+                "socket_chunk_size": 65536,
+            },
             "user": get_local_user(),
         }
         merge_dicts(defaults, ours)
         return defaults
+
+
+class GatewayCache(dict):
+    """
+    ProxyJump-derived gateway `.Connection` objects, keyed by hop chain.
+
+    Used by `.Connection.get_gateway`, which holds `lock` while looking up or
+    creating entries, so that concurrent users of one cache (e.g. threads
+    driving a `.Group`) end up with a single gateway per chain.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.lock = RLock()
+
+    def __getstate__(self):
+        # Locks don't pickle (e.g. for ProcessPoolGroup); dict items are
+        # pickled separately anyway.
+        return {}
+
+    def __setstate__(self, state):
+        self.lock = RLock()
+
+
+class HostLookupCache:
+    """
+    Thread-safe memo of `~paramiko.config.SSHConfig.lookup` results.
+
+    Entries are keyed by host and a generation number, which `invalidate`
+    bumps; as a safety net, the number of rules in the looked-up
+    `~paramiko.config.SSHConfig` is part of the key too, so that parsing more
+    data into it directly also results in fresh lookups.
+
+    Used (and shared between clones) by `.Config.lookup_ssh_config`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        #: Incremented every time the cache is invalidated.
+        self.generation = 0
+        self._results = {}
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def __getstate__(self):
+        # Locks don't pickle (e.g. for ProcessPoolGroup); cached results are
+        # cheap to recompute on the other side.
+        return {"generation": self.generation}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.generation = state["generation"]
+
+    def invalidate(self):
+        """
+        Forget every cached lookup.
+        """
+        with self._lock:
+            self.generation += 1
+            self._results.clear()
+
+    def lookup(self, ssh_config, host, prepare=None):
+        """
+        Return a copy of ``ssh_config.lookup(host)``, computing it if needed.
+
+        ``prepare``, if given, is called as ``prepare(ssh_config, host)``
+        before computing a lookup.
+        """
+        key = (host, self.generation, len(ssh_config._config))
+        with self._lock:
+            options = self._results.get(key)
+        if options is None:
+            if prepare is not None:
+                prepare(ssh_config, host)
+                # (Which may have added rules.)
+                key = (host, self.generation, len(ssh_config._config))
+            # (Looked up outside the lock, as Match exec & canonicalization
+            # may be slow; at worst, racing threads look the same host up
+            # twice.)
+            options = ssh_config.lookup(host)
+            with self._lock:
+                self._results[key] = options
+        # Copy, lest callers' changes leak into the cache; some values (e.g.
+        # identityfile) are lists.
+        return SSHConfigDict(
+            (k, list(v) if isinstance(v, list) else v)
+            for k, v in options.items()
+        )
+
+
+# Parsed SSH config files, shared process-wide and keyed by path & the
+# directory relative Include paths within are resolved against; each value is
+# a (signature, rules) tuple. See SSHConfigFiles.
+_parsed_ssh_files = {}
+_parsed_ssh_files_lock = Lock()
+
+_INCLUDE_LINE = re.compile(r"^\s*include(?:\s*=\s*|\s+)(.*?)\s*$", re.I)
+_SECTION_LINE = re.compile(r"^\s*(?:host|match)(?:\s*=\s*|\s+)", re.I)
+
+
+def _signature(stat):
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _path_signature(path):
+    try:
+        return _signature(os.stat(path))
+    except OSError:
+        return None
+
+
+def _parse_ssh_chunk(lines):
+    parser = SSHConfig()
+    parser.parse(lines)
+    return parser._config
+
+
+def _parse_ssh_text(lines, include_dir):
+    """
+    Parse SSH config ``lines`` into a list of `~paramiko.config.SSHConfig`
+    rules, leaving ``Include`` directives unexpanded.
+
+    Each ``Include`` becomes a placeholder rule with the same condition as the
+    block it appeared in, no options, and ``include`` & ``include_dir`` keys
+    (see `SSHConfigFiles.expand`).
+    """
+    rules = []
+    chunk, header, first = [], None, True
+
+    def flush():
+        contexts = _parse_ssh_chunk(chunk)
+        # Past the first chunk, the leading implicit global block is empty
+        # (always so when resuming a block after an Include) and redundant.
+        if not first and not contexts[0]["config"]:
+            contexts = contexts[1:]
+        rules.extend(contexts)
+
+    for line in lines:
+        match = _INCLUDE_LINE.match(line)
+        if match is None:
+            if _SECTION_LINE.match(line):
+                header = line
+            chunk.append(line)
+            continue
+        flush()
+        if header is None:
+            placeholder = {"host": ["*"]}
+        else:
+            context = _parse_ssh_chunk([header])[1]
+            placeholder = {
+                key: context[key]
+                for key in ("host", "matches")
+                if key in context
+            }
+        placeholder.update(
+            config={},
+            include=shlex.split(match.group(1)),
+            include_dir=include_dir,
+        )
+        rules.append(placeholder)
+        # Options following the Include still belong to the enclosing block.
+        chunk = [header] if header is not None else []
+        first = False
+    flush()
+    return rules
+
+
+def _parse_ssh_file(path, include_dir):
+    """
+    Return the rules parsed from the SSH config file at ``path``, along with
+    that file's signature, or ``(None, None)`` if there's no such file.
+
+    Parse results are cached process-wide, and reused for as long as the
+    file's modification time, size and inode stay the same.
+    """
+    try:
+        fd = open(path)
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None, None
+    with fd:
+        signature = _signature(os.fstat(fd.fileno()))
+        key = (path, include_dir)
+        with _parsed_ssh_files_lock:
+            cached = _parsed_ssh_files.get(key)
+        if cached is not None and cached[0] == signature:
+            return signature, cached[1]
+        rules = _parse_ssh_text(fd, include_dir)
+    with _parsed_ssh_files_lock:
+        _parsed_ssh_files[key] = (signature, rules)
+    return signature, rules
+
+
+def _include_matches(context, host):
+    # Whether the (placeholder) rule's condition might hold for host. Only
+    # Host patterns & Match originalhost/all can be judged before the lookup
+    # itself; anything else is assumed to hold.
+    if context.get("host") and SSHConfig()._pattern_matches(
+        context["host"], host
+    ):
+        return True
+    if "matches" not in context:
+        return False
+    for criterion in context["matches"]:
+        if criterion["type"] == "all":
+            return True
+        if criterion["type"] == "originalhost":
+            matched = SSHConfig()._pattern_matches(criterion["param"], host)
+            if matched == criterion["negate"]:
+                return False
+    return True
+
+
+def _condition(context):
+    # A rule's condition, as a list of Match criteria (empty if unconditional)
+    if context.get("host"):
+        if context["host"] == ["*"]:
+            return []
+        return [
+            {"type": "originalhost", "param": context["host"], "negate": False}
+        ]
+    return [x for x in context.get("matches", []) if x["type"] != "all"]
+
+
+class SSHConfigFiles:
+    """
+    Tracks the SSH config files a `.Config` has loaded, and expands their
+    ``Include`` directives on demand.
+
+    Shared between a `.Config` and its clones; used by
+    `.Config.refresh_ssh_config` and `.Config.lookup_ssh_config`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        # Path -> signature (or None if missing) of every file loaded,
+        # Include glob -> the paths it matched, and the rules of each
+        # top-level file, in load order.
+        self._signatures = {}
+        self._globs = {}
+        self._rules = []
+        self._lock = RLock()
+
+    def __getstate__(self):
+        # Locks don't pickle (e.g. for ProcessPoolGroup).
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def reset(self):
+        """
+        Forget every tracked file.
+        """
+        with self._lock:
+            self._signatures.clear()
+            self._globs.clear()
+            self._rules = []
+
+    def load(self, path, include_dir, top=False):
+        """
+        Parse (or reuse the parse of) the file at ``path``, and track it.
+
+        :param str include_dir:
+            Directory relative ``Include`` paths are resolved against.
+        :param bool top:
+            Whether this is a top-level file, whose rules `rules` returns.
+
+        :returns:
+            A new list of rules, or ``None`` if there is no file at ``path``.
+        """
+        signature, rules = _parse_ssh_file(path, include_dir)
+        with self._lock:
+            self._signatures[path] = signature
+            if top and rules is not None:
+                self._rules.append(rules)
+        return None if rules is None else list(rules)
+
+    def rules(self):
+        """
+        Return a new list of all rules from the top-level files loaded.
+        """
+        with self._lock:
+            return [rule for rules in self._rules for rule in rules]
+
+    def changed(self):
+        """
+        Whether any tracked file has changed (or appeared, or disappeared)
+        since being loaded, or any Include glob now matches different files.
+        """
+        with self._lock:
+            signatures = list(self._signatures.items())
+            globs = list(self._globs.items())
+        for path, signature in signatures:
+            if _path_signature(path) != signature:
+                return True
+        return any(sorted(glob.glob(x)) != paths for x, paths in globs)
+
+    def expand(self, ssh_config, host):
+        """
+        Replace any ``Include`` placeholders in ``ssh_config`` which may apply
+        to ``host`` with the rules from the files they name.
+
+        Included rules only apply when the block containing the ``Include``
+        did, so each is given that block's condition as a leading ``Match``
+        criterion (``originalhost`` standing in for ``Host`` patterns).
+        Includes within included files are handled likewise.
+        """
+        with self._lock:
+            rules = ssh_config._config
+            if not any("include" in x for x in rules):
+                return
+            expanded, pending = [], deque(rules)
+            while pending:
+                rule = pending.popleft()
+                if "include" not in rule or not _include_matches(rule, host):
+                    expanded.append(rule)
+                    continue
+                # Expanded in place, in front of the remaining rules.
+                pending.extendleft(reversed(self._include(rule)))
+            # Swapped in whole, so concurrent lookups never see partial data.
+            if len(expanded) != len(rules) or any(
+                x is not y for x, y in zip(expanded, rules)
+            ):
+                ssh_config._config = expanded
+
+    def _include(self, placeholder):
+        prefix = _condition(placeholder)
+        rules = []
+        for pattern in placeholder["include"]:
+            pattern = os.path.expanduser(pattern)
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(placeholder["include_dir"], pattern)
+            paths = sorted(glob.glob(pattern))
+            with self._lock:
+                self._globs[pattern] = paths
+            for path in paths:
+                for rule in self.load(path, placeholder["include_dir"]) or []:
+                    if not prefix:
+                        rules.append(rule)
+                        continue
+                    if not (rule["config"] or "include" in rule):
+                        continue
+                    conditioned = dict(
+                        rule, host=[], matches=prefix + _condition(rule)
+                    )
+                    rules.append(conditioned)
+        return rules
@@ -1,6 +1,6 @@
 from contextlib import contextmanager
 from io import StringIO
-from threading import Event
+from threading import BoundedSemaphore, Lock
 import socket
 
 from decorator import decorator
@@ -13,6 +13,8 @@ from paramiko.proxy import ProxyCommand
 
 from .config import Config
 from .exceptions import InvalidV1Env
+from . import net
+from .pool import pool
 from .transfer import Transfer
 from .tunnels import TunnelManager, Tunnel
 
@@ -140,6 +142,10 @@ class Connection(Context):
     transport = None
     _sftp = None
     _agent_handler = None
+    _pooled = False
+    _open_lock = None
+    _handshake_slots = None
+    _held_slots = None
 
     @classmethod
     def from_v1(cls, env, **kwargs):
@@ -373,6 +379,9 @@ class Connection(Context):
         # that below. If it's somehow problematic we would want to break parent
         # __init__ up in a manner that is more cleanly overrideable.
         super().__init__(config=config)
+        # Serializes open() calls made on our behalf by other connections
+        # using us as their gateway (which may happen concurrently).
+        self._open_lock = Lock()
 
         #: The .Config object referenced when handling default values (for e.g.
         #: user or port, when not explicitly given) or deciding how to behave.
@@ -402,7 +411,7 @@ class Connection(Context):
         # NOTE: we load SSH config data as early as possible as it has
         # potential to affect nearly every other attribute.
         #: The per-host SSH config data, if any. (See :ref:`ssh-config`.)
-        self.ssh_config = self.config.base_ssh_config.lookup(host)
+        self.ssh_config = self.config.lookup_ssh_config(host)
 
         self.original_host = host
         #: The hostname of the target server.
@@ -505,21 +514,32 @@ class Connection(Context):
             # the front (actual, supplied as our own gateway) hop
             hops = reversed(self.ssh_config["proxyjump"].split(","))
             prev_gw = None
-            for hop in hops:
-                # Short-circuit if we appear to be our own proxy, which would
-                # be a RecursionError. Implies SSH config wildcards.
-                # TODO: in an ideal world we'd check user/port too in case they
-                # differ, but...seriously? They can file a PR with those extra
-                # half dozen test cases in play, E_NOTIME
-                if self.derive_shorthand(hop)["host"] == self.host:
-                    return None
-                # Happily, ProxyJump uses identical format to our host
-                # shorthand...
-                kwargs = dict(config=self.config.clone())
-                if prev_gw is not None:
-                    kwargs["gateway"] = prev_gw
-                cxn = Connection(hop, **kwargs)
-                prev_gw = cxn
+            # Gateway Connections are shared by every Connection using the
+            # same gateway cache (that of one Config object, e.g. all tasks in
+            # a fab session, or of a Group's member configs) and the same
+            # chain of hops, so that N targets behind one bastion result in
+            # one bastion connection.
+            chain = ()
+            with self.config._gateways.lock:
+                for hop in hops:
+                    # Short-circuit if we appear to be our own proxy, which
+                    # would be a RecursionError. Implies SSH config wildcards.
+                    # TODO: in an ideal world we'd check user/port too in case
+                    # they differ, but...seriously? They can file a PR with
+                    # those extra half dozen test cases in play, E_NOTIME
+                    if self.derive_shorthand(hop)["host"] == self.host:
+                        return None
+                    chain += (hop,)
+                    cxn = self.config._gateways.get(chain)
+                    if cxn is None:
+                        # Happily, ProxyJump uses identical format to our host
+                        # shorthand...
+                        kwargs = dict(config=self.config.clone())
+                        if prev_gw is not None:
+                            kwargs["gateway"] = prev_gw
+                        cxn = Connection(hop, **kwargs)
+                        self.config._gateways[chain] = cxn
+                    prev_gw = cxn
             return prev_gw
         elif "proxycommand" in self.ssh_config:
             # Just a string, which we interpret as a proxy command..
@@ -571,6 +591,31 @@ class Connection(Context):
         # hashable.
         return hash(self._identity())
 
+    def __getstate__(self):
+        # Network state (the client, its transport, SFTP sessions etc) cannot
+        # cross process boundaries; only ship connection parameters and
+        # config, so e.g. pickling for multiprocessing works on open objects.
+        state = self.__dict__.copy()
+        for key in (
+            "client",
+            "transport",
+            "_sftp",
+            "_agent_handler",
+            "_pooled",
+            "_open_lock",
+            "_handshake_slots",
+            "_held_slots",
+        ):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open_lock = Lock()
+        client = SSHClient()
+        client.set_missing_host_key_policy(AutoAddPolicy())
+        self.client = client
+
     def derive_shorthand(self, host_string):
         # NOTE: used to be defined inline; preserving API call for both
         # backwards compatibility and because it seems plausible we may want to
@@ -600,6 +645,12 @@ class Connection(Context):
         `SSHClient.connect <paramiko.client.SSHClient.connect>`. (For details,
         see :doc:`the configuration docs </concepts/configuration>`.)
 
+        If the ``connection_pool.enabled`` :ref:`config setting
+        <default-values>` is true, a live client already opened by another
+        `.Connection` with the same host, user and port is reused (via
+        `fabric.pool`) instead of connecting anew; and new clients are
+        registered there for others to reuse.
+
         :returns:
             The result of the internal call to `.SSHClient.connect`, if
             performing an initial connection; ``None`` otherwise.
@@ -608,10 +659,23 @@ class Connection(Context):
         .. versionchanged:: 3.1
             Now returns the inner Paramiko connect call's return value instead
             of always returning the implicit ``None``.
+        .. versionchanged:: 3.3
+            Added connection pooling, and started honoring ``Compression``
+            from SSH config files (unless ``compress`` is given in
+            ``connect_kwargs``). When ``address_racing.enabled`` is set,
+            the TCP connection is made via `open_socket`.
         """
         # Short-circuit
         if self.is_connected:
             return
+        pooling = self.config.connection_pool.enabled
+        if pooling:
+            client = pool.acquire(self._identity())
+            if client is not None:
+                self.client = client
+                self.transport = client.get_transport()
+                self._pooled = True
+                return
         err = "Refusing to be ambiguous: connect() kwarg '{}' was given both via regular arg and via connect_kwargs!"  # noqa
         # These may not be given, period
         for key in """
@@ -638,6 +702,11 @@ class Connection(Context):
             kwargs["sock"] = self.open_gateway()
         if self.connect_timeout:
             kwargs["timeout"] = self.connect_timeout
+        if "sock" not in kwargs and self.config.address_racing.enabled:
+            kwargs["sock"] = self.open_socket(timeout=kwargs.get("timeout"))
+        # Transport compression: explicit connect_kwargs win over ssh_config
+        if "compress" not in kwargs and "compression" in self.ssh_config:
+            kwargs["compress"] = self.ssh_config["compression"] == "yes"
         # Strip out empty defaults for less noisy debugging
         if "key_filename" in kwargs and not kwargs["key_filename"]:
             del kwargs["key_filename"]
@@ -662,20 +731,70 @@ class Connection(Context):
                 username=self.user,
             )
         # Actually connect!
-        result = self.client.connect(**kwargs)
+        try:
+            result = self.client.connect(**kwargs)
+        finally:
+            # Free up our gateway's handshake slot, if open_gateway took one.
+            if self._held_slots is not None:
+                self._held_slots.release()
+                self._held_slots = None
         self.transport = self.client.get_transport()
+        if pooling:
+            self._pooled = pool.register(self._identity(), self.client)
         return result
 
+    def open_socket(self, timeout=None):
+        """
+        Connect a socket to our host & port, racing its addresses.
+
+        Used by `open` when the ``address_racing.enabled`` :ref:`config
+        setting <default-values>` is true (and there is no gateway). Rather
+        than trying each address our hostname resolves to in turn, attempts
+        are started ``address_racing.attempt_delay`` seconds apart (or as soon
+        as earlier ones fail), alternating address families, and the first to
+        connect wins -- see `fabric.net.connect`. Resolutions are cached for
+        ``address_racing.dns_ttl`` seconds, in a cache our `.Config` shares
+        with its clones (e.g. those of all members of a `.Group`).
+        ``AddressFamily`` from :ref:`ssh_config <ssh-config>` is honored.
+
+        :param float timeout: Overall connection timeout, if any.
+
+        :returns: A connected `socket.socket`.
+
+        .. versionadded:: 3.3
+        """
+        settings = self.config.address_racing
+        family = {"inet": socket.AF_INET, "inet6": socket.AF_INET6}.get(
+            self.ssh_config.get("addressfamily"), socket.AF_UNSPEC
+        )
+        infos = self.config._dns_cache.resolve(
+            self.host, self.port, family=family, ttl=settings.dns_ttl
+        )
+        return net.connect(
+            infos, timeout=timeout, delay=settings.attempt_delay
+        )
+
     def open_gateway(self):
         """
         Obtain a socket-like object from `gateway`.
 
+        Gateway `.Connection` objects may be shared by many connections at
+        once (see :ref:`ssh-gateways`); they are opened at most once no matter
+        how many threads call this method concurrently. If the
+        ``gateway_concurrency`` :ref:`config setting <default-values>` is set,
+        this method also blocks until fewer than that many connections are
+        mid-handshake through the same gateway; the slot is given back by
+        `open` once its own handshake completes.
+
         :returns:
             A ``direct-tcpip`` `paramiko.channel.Channel`, if `gateway` was a
             `.Connection`; or a `~paramiko.proxy.ProxyCommand`, if `gateway`
             was a string.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            Made safe for concurrent use with shared gateways, and added the
+            ``gateway_concurrency`` limit.
         """
         # ProxyCommand is faster to set up, so do it first.
         if isinstance(self.gateway, str):
@@ -688,7 +807,15 @@ class Connection(Context):
             return ProxyCommand(ssh_conf.lookup(self.host)["proxycommand"])
         # Handle inner-Connection gateway type here.
         # TODO: logging
-        self.gateway.open()
+        gateway = self.gateway
+        with gateway._open_lock:
+            gateway.open()
+            limit = self.config.gateway_concurrency
+            if limit and gateway._handshake_slots is None:
+                gateway._handshake_slots = BoundedSemaphore(limit)
+        if gateway._handshake_slots is not None:
+            gateway._handshake_slots.acquire()
+            self._held_slots = gateway._handshake_slots
         # TODO: expose the opened channel itself as an attribute? (another
         # possible argument for separating the two gateway types...) e.g. if
         # someone wanted to piggyback on it for other same-interpreter socket
@@ -697,14 +824,21 @@ class Connection(Context):
         # object they got via $WHEREEVER?
         # TODO: how best to expose timeout param? reuse general connection
         # timeout from config?
-        return self.gateway.transport.open_channel(
-            kind="direct-tcpip",
-            dest_addr=(self.host, int(self.port)),
-            # NOTE: src_addr needs to be 'empty but not None' values to
-            # correctly encode into a network message. Theoretically Paramiko
-            # could auto-interpret None sometime & save us the trouble.
-            src_addr=("", 0),
-        )
+        try:
+            return gateway.transport.open_channel(
+                kind="direct-tcpip",
+                dest_addr=(self.host, int(self.port)),
+                # NOTE: src_addr needs to be 'empty but not None' values to
+                # correctly encode into a network message. Theoretically
+                # Paramiko could auto-interpret None sometime & save us the
+                # trouble.
+                src_addr=("", 0),
+            )
+        except BaseException:
+            if self._held_slots is not None:
+                self._held_slots.release()
+                self._held_slots = None
+            raise
 
     def close(self):
         """
@@ -714,14 +848,41 @@ class Connection(Context):
 
         If no connection or SFTP session is open, this method does nothing.
 
+        If the connection came from (or was registered with) the connection
+        pool, it's handed back to the pool instead of being closed, and this
+        object gets a fresh, unconnected client. The ``connection_pool``
+        settings ``idle_timeout`` and ``max_size`` then determine how long the
+        pooled client lingers.
+
         .. versionadded:: 2.0
         .. versionchanged:: 3.0
             Now closes SFTP sessions too (2.x required manually doing so).
+        .. versionchanged:: 3.3
+            Added connection pooling.
         """
         if self._sftp is not None:
             self._sftp.close()
             self._sftp = None
 
+        if self._pooled:
+            settings = self.config.connection_pool
+            pool.release(
+                self._identity(),
+                self.client,
+                idle_timeout=settings.idle_timeout,
+                max_size=settings.max_size,
+            )
+            self._pooled = False
+            # Detach from the now-shared client so that any reopening goes
+            # back through the pool (or connects anew).
+            client = SSHClient()
+            client.set_missing_host_key_policy(AutoAddPolicy())
+            self.client = client
+            self.transport = None
+            if self.forward_agent and self._agent_handler is not None:
+                self._agent_handler.close()
+            return
+
         if self.is_connected:
             self.client.close()
             if self.forward_agent and self._agent_handler is not None:
@@ -907,6 +1068,50 @@ class Connection(Context):
         """
         return Transfer(self).put(*args, **kwargs)
 
+    def copy(self, *args, **kwargs):
+        """
+        Copy a remote file from this connection's host to another's.
+
+        Simply a wrapper for `.Transfer.copy`. Please see its documentation for
+        all details.
+
+        .. versionadded:: 3.3
+        """
+        return Transfer(self).copy(*args, **kwargs)
+
+    def get_dir(self, *args, **kwargs):
+        """
+        Get a remote directory tree to the local filesystem.
+
+        Simply a wrapper for `.Transfer.get_dir`. Please see its documentation
+        for all details.
+
+        .. versionadded:: 3.3
+        """
+        return Transfer(self).get_dir(*args, **kwargs)
+
+    def put_dir(self, *args, **kwargs):
+        """
+        Put a local directory tree to the remote filesystem.
+
+        Simply a wrapper for `.Transfer.put_dir`. Please see its documentation
+        for all details.
+
+        .. versionadded:: 3.3
+        """
+        return Transfer(self).put_dir(*args, **kwargs)
+
+    def sync(self, *args, **kwargs):
+        """
+        Bring a remote directory tree up to date with a local one.
+
+        Simply a wrapper for `.Transfer.sync`. Please see its documentation for
+        all details.
+
+        .. versionadded:: 3.3
+        """
+        return Transfer(self).sync(*args, **kwargs)
+
     # TODO: yield the socket for advanced users? Other advanced use cases
     # (perhaps factor out socket creation itself)?
     # TODO: probably push some of this down into Paramiko
@@ -954,18 +1159,27 @@ class Connection(Context):
             ``localhost`` (i.e., the host this `.Connection` is connected to.)
 
         :returns:
-            Nothing; this method is only useful as a context manager affecting
-            local operating system state.
+            When used as a context manager, yields the `.TunnelManager` doing
+            the forwarding, whose ``bytes_sent`` and ``bytes_received``
+            attributes track traffic through the tunnel. Data is read in
+            chunks sized by the ``tunnels.socket_chunk_size`` and
+            ``tunnels.channel_chunk_size`` :ref:`config settings
+            <default-values>`.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            All forwarded connections are now serviced by a single background
+            thread, and the local port is listening by the time the ``with``
+            block is entered.
+        .. versionchanged:: 3.3
+            Yield the `.TunnelManager` (previously yielded nothing) and honor
+            the ``tunnels`` config settings.
         """
         if not remote_port:
             remote_port = local_port
 
         # TunnelManager does all of the work, sitting in the background (so we
-        # can yield) and spawning threads every time somebody connects to our
-        # local port.
-        finished = Event()
+        # can yield) and forwarding every connection made to our local port.
         manager = TunnelManager(
             local_port=local_port,
             local_host=local_host,
@@ -973,37 +1187,18 @@ class Connection(Context):
             remote_host=remote_host,
             # TODO: not a huge fan of handing in our transport, but...?
             transport=self.transport,
-            finished=finished,
+            **self._tunnel_kwargs()
         )
         manager.start()
+        # Don't hand control back until we're actually listening.
+        manager.ready.wait()
 
         # Return control to caller now that things ought to be operational
         try:
-            yield
+            yield manager
         # Teardown once user exits block
         finally:
-            # Signal to manager that it should close all open tunnels
-            finished.set()
-            # Then wait for it to do so
-            manager.join()
-            # Raise threading errors from within the manager, which would be
-            # one of:
-            # - an inner ThreadException, which was created by the manager on
-            # behalf of its Tunnels; this gets directly raised.
-            # - some other exception, which would thus have occurred in the
-            # manager itself; we wrap this in a new ThreadException.
-            # NOTE: in these cases, some of the metadata tracking in
-            # ExceptionHandlingThread/ExceptionWrapper/ThreadException (which
-            # is useful when dealing with multiple nearly-identical sibling IO
-            # threads) is superfluous, but it doesn't feel worth breaking
-            # things up further; we just ignore it for now.
-            wrapper = manager.exception()
-            if wrapper is not None:
-                if wrapper.type is ThreadException:
-                    raise wrapper.value
-                else:
-                    raise ThreadException([wrapper])
-
+            self._stop_tunnels(manager)
             # TODO: cancel port forward on transport? Does that even make sense
             # here (where we used direct-tcpip) vs the opposite method (which
             # is what uses forward-tcpip)?
@@ -1057,10 +1252,22 @@ class Connection(Context):
             localhost).
 
         :returns:
-            Nothing; this method is only useful as a context manager affecting
-            local operating system state.
+            When used as a context manager, yields the `.TunnelManager` doing
+            the forwarding, whose ``bytes_sent`` and ``bytes_received``
+            attributes track traffic through the tunnel. Data is read in
+            chunks sized by the ``tunnels.socket_chunk_size`` and
+            ``tunnels.channel_chunk_size`` :ref:`config settings
+            <default-values>`.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            All forwarded connections are now serviced by a single background
+            thread, and errors within them are raised (as a
+            `~invoke.exceptions.ThreadException`) on exit, as with
+            `forward_local`.
+        .. versionchanged:: 3.3
+            Yield the `.TunnelManager` (previously yielded nothing) and honor
+            the ``tunnels`` config settings.
         """
         if not local_port:
             local_port = remote_port
@@ -1069,29 +1276,27 @@ class Connection(Context):
         # source/dest host/port pairs at all; only whether the channel has data
         # to read and suchlike.)
         # We then pair that channel with a new 'outbound' socket connection to
-        # the local host/port being forwarded, in a new Tunnel.
-        # That Tunnel is then added to a shared data structure so we can track
-        # & close them during shutdown.
+        # the local host/port being forwarded, in a new Tunnel, and hand that
+        # to a TunnelManager which forwards traffic for all of them.
         #
-        # TODO: this approach is less than ideal because we have to share state
-        # between ourselves & the callback handed into the transport's own
-        # thread handling (which is roughly analogous to our self-controlled
-        # TunnelManager for local forwarding). See if we can use more of
-        # Paramiko's API (or improve it and then do so) so that isn't
-        # necessary.
-        tunnels = []
+        # TODO: the callback runs in the transport's own thread, so a slow
+        # local connect() holds up that thread. See if we can use more of
+        # Paramiko's API (or improve it and then do so) to avoid that.
+        tunnel_kwargs = self._tunnel_kwargs()
+        manager = TunnelManager(transport=self.transport, **tunnel_kwargs)
+        manager.start()
 
         def callback(channel, src_addr_tup, dst_addr_tup):
             sock = socket.socket()
-            # TODO: handle connection failure such that channel, etc get closed
-            sock.connect((local_host, local_port))
-            # TODO: we don't actually need to generate the Events at our level,
-            # do we? Just let Tunnel.__init__ do it; all we do is "press its
-            # button" on shutdown...
-            tunnel = Tunnel(channel=channel, sock=sock, finished=Event())
-            tunnel.start()
-            # Communication between ourselves & the Paramiko handling subthread
-            tunnels.append(tunnel)
+            try:
+                sock.connect((local_host, local_port))
+            except BaseException:
+                sock.close()
+                channel.close()
+                raise
+            manager.add_tunnel(
+                Tunnel(channel=channel, sock=sock, **tunnel_kwargs)
+            )
 
         # Ask Paramiko (really, the remote sshd) to call our callback whenever
         # connections are established on the remote iface/port.
@@ -1100,16 +1305,42 @@ class Connection(Context):
             self.transport.request_port_forward(
                 address=remote_host, port=remote_port, handler=callback
             )
-            yield
+            yield manager
         finally:
-            # TODO: see above re: lack of a TunnelManager
-            # TODO: and/or also refactor with TunnelManager re: shutdown logic.
-            # E.g. maybe have a non-thread TunnelManager-alike with a method
-            # that acts as the callback? At least then there's a tiny bit more
-            # encapsulation...meh.
-            for tunnel in tunnels:
-                tunnel.finished.set()
-                tunnel.join()
-            self.transport.cancel_port_forward(
-                address=remote_host, port=remote_port
-            )
+            # Stop new connections arriving before shutting down the tunnels
+            # we already have.
+            try:
+                self.transport.cancel_port_forward(
+                    address=remote_host, port=remote_port
+                )
+            finally:
+                self._stop_tunnels(manager)
+
+    def _tunnel_kwargs(self):
+        return dict(
+            socket_chunk_size=self.config.tunnels.socket_chunk_size,
+            channel_chunk_size=self.config.tunnels.channel_chunk_size,
+        )
+
+    def _stop_tunnels(self, manager):
+        # Signal to manager that it should close all open tunnels
+        manager.stop()
+        # Then wait for it to do so
+        manager.join()
+        # Raise threading errors from within the manager, which would be
+        # one of:
+        # - an inner ThreadException, which was created by the manager on
+        # behalf of its Tunnels; this gets directly raised.
+        # - some other exception, which would thus have occurred in the
+        # manager itself; we wrap this in a new ThreadException.
+        # NOTE: in these cases, some of the metadata tracking in
+        # ExceptionHandlingThread/ExceptionWrapper/ThreadException (which
+        # is useful when dealing with multiple nearly-identical sibling IO
+        # threads) is superfluous, but it doesn't feel worth breaking
+        # things up further; we just ignore it for now.
+        wrapper = manager.exception()
+        if wrapper is not None:
+            if wrapper.type is ThreadException:
+                raise wrapper.value
+            else:
+                raise ThreadException([wrapper])
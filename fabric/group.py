@@ -1,9 +1,25 @@
-from queue import Queue
-
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+import hashlib
+import mmap
+import os
+import pickle
+import shlex
+import stat
+import time
+from queue import Empty, Queue
+from threading import Lock, local as thread_local
+
+from invoke.exceptions import ThreadException
 from invoke.util import ExceptionHandlingThread
 
+from .config import Config
 from .connection import Connection
 from .exceptions import GroupException
+from .transfer import Result
 
 
 class Group(list):
@@ -79,20 +95,37 @@ class Group(list):
 
         .. versionchanged:: 2.3
             Added ``**kwargs`` (was previously only ``*hosts``).
+        .. versionchanged:: 3.3
+            When no ``config`` kwarg is given, members' configs are now clones
+            of one another, so that ssh_config files are only loaded once and
+            ProxyJump gateways are shared instead of per-host.
         """
         # TODO: #563, #388 (could be here or higher up in Program area)
-        self.extend([Connection(host, **kwargs) for host in hosts])
+        if hosts and kwargs.get("config") is None:
+            kwargs.pop("config", None)
+            self.extend(
+                Connection(host, config=config, **kwargs)
+                for host, config in zip(hosts, _member_configs(len(hosts)))
+            )
+        else:
+            self.extend([Connection(host, **kwargs) for host in hosts])
 
     @classmethod
-    def from_connections(cls, connections):
+    def from_connections(cls, connections, **kwargs):
         """
         Alternate constructor accepting `.Connection` objects.
 
+        Any keyword arguments are handed to the class constructor, which is
+        useful for subclass-specific options such as `.ThreadingGroup`'s
+        ``max_workers``.
+
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            Added ``**kwargs``.
         """
         # TODO: *args here too; or maybe just fold into __init__ and type
         # check?
-        group = cls()
+        group = cls(**kwargs)
         group.extend(connections)
         return group
 
@@ -101,6 +134,11 @@ class Group(list):
         # subclasses
         raise NotImplementedError
 
+    def _iter_do(self, method, *args, **kwargs):
+        # Streaming counterpart to _do: must return an iterable of (cxn,
+        # result-or-exception) pairs, in order of completion.
+        raise NotImplementedError
+
     def run(self, *args, **kwargs):
         """
         Executes `.Connection.run` on all member `Connections <.Connection>`.
@@ -126,6 +164,42 @@ class Group(list):
         # TODO: see run() TODOs
         return self._do("sudo", *args, **kwargs)
 
+    def run_iter(self, *args, **kwargs):
+        """
+        Like `run`, but yields per-connection results as they become available.
+
+        Instead of blocking until every member has finished, this returns a
+        `.GroupResultIterator` yielding ``(connection, value)`` tuples in the
+        order the connections complete, where ``value`` is the
+        `.runners.Result` or the exception that was raised. This allows acting
+        on fast hosts while slow ones are still working::
+
+            results = group.run_iter("uptime", hide=True)
+            for cxn, value in results:
+                if isinstance(value, Exception):
+                    print("{} failed: {!r}".format(cxn.host, value))
+            # Aggregate GroupResult of everything seen above
+            print(results.result.failed)
+
+        Exceptions are never raised (i.e. there is no `.GroupException`);
+        they're yielded like any other value.
+
+        :returns: a `.GroupResultIterator`.
+
+        .. versionadded:: 3.3
+        """
+        return GroupResultIterator(self._iter_do("run", *args, **kwargs))
+
+    def sudo_iter(self, *args, **kwargs):
+        """
+        Like `sudo`, but streaming results as with `run_iter`.
+
+        :returns: a `.GroupResultIterator`.
+
+        .. versionadded:: 3.3
+        """
+        return GroupResultIterator(self._iter_do("sudo", *args, **kwargs))
+
     # TODO: this all needs to mesh well with similar strategies applied to
     # entire tasks - so that may still end up factored out into Executors or
     # something lower level than both those and these?
@@ -145,6 +219,10 @@ class Group(list):
         result is like running a loop over the connections and calling their
         ``put`` method.
 
+        A ``callback`` (see `.Transfer.put`) is shared by every member; tell
+        their reports apart via each `.Progress` object's ``connection``.
+        Under `.ThreadingGroup` it may be called from several threads at once.
+
         :returns:
             a `.GroupResult` whose values are `.transfer.Result` instances.
 
@@ -172,6 +250,8 @@ class Group(list):
             supported, as it would be equivalent to supplying that same object
             to a series of individual ``get()`` calls.
 
+        As with `put`, any ``callback`` is shared by every member.
+
         :returns:
             a `.GroupResult` whose values are `.transfer.Result` instances.
 
@@ -185,6 +265,224 @@ class Group(list):
             kwargs["local"] = "{host}/"
         return self._do("get", *args, **kwargs)
 
+    def put_iter(self, *args, **kwargs):
+        """
+        Like `put`, but streaming results as with `run_iter`.
+
+        :returns: a `.GroupResultIterator`.
+
+        .. versionadded:: 3.3
+        """
+        return GroupResultIterator(self._iter_do("put", *args, **kwargs))
+
+    def get_iter(self, *args, **kwargs):
+        """
+        Like `get`, but streaming results as with `run_iter`.
+
+        The same ``"{host}/"`` default for ``local`` applies as in `get`.
+
+        :returns: a `.GroupResultIterator`.
+
+        .. versionadded:: 3.3
+        """
+        if len(args) < 2 and "local" not in kwargs:
+            kwargs["local"] = "{host}/"
+        return GroupResultIterator(self._iter_do("get", *args, **kwargs))
+
+    def put_broadcast(self, local, remote=None, preserve_mode=True):
+        """
+        Upload one local file to every member, reading it only once.
+
+        Unlike `put` (where each member opens and reads ``local`` for itself)
+        the file is memory-mapped a single time and every member uploads from
+        that one shared, read-only buffer, handing slices of it straight to
+        its own SFTP session. Members upload concurrently or not depending on
+        the concrete group class, exactly as with `put`.
+
+        :param local:
+            Local path of the file to upload, or a file-like object (which is
+            read once, into memory).
+
+        :param str remote:
+            Remote path to upload to, as with `.Transfer.put`; defaults to the
+            local file's basename, in each member's remote working directory.
+
+        :param bool preserve_mode:
+            Whether to ``chmod`` each remote copy to match the local file's
+            mode (default: ``True``; ignored for file-like objects).
+
+        :returns:
+            a `.GroupResult` whose values are `.transfer.Result` instances,
+            each recording that member's ``size``, ``elapsed`` time and
+            ``throughput``. Failures are reported as with any other method.
+
+        .. versionadded:: 3.3
+        """
+        with _SharedSource(local) as source:
+            return self._do(_put_shared, source, remote, preserve_mode)
+
+    def put_relay(
+        self,
+        local,
+        remote,
+        fanout=2,
+        preserve_mode=True,
+        ssh_command="ssh -o BatchMode=yes",
+    ):
+        """
+        Distribute one local file to every member by relaying it host to host.
+
+        Rather than uploading a copy to each member (which is bound by the
+        local machine's uplink) the file is streamed to just ``fanout`` seed
+        members; each of those saves it while simultaneously streaming it on,
+        over SSH, to up to ``fanout`` further members, and so on, forming a
+        tree in member order (member ``i``'s children are members
+        ``fanout * (i + 1)`` onwards). As every hop is a pipe rather than a
+        store-and-forward copy, total time stays close to that of a single
+        upload as the group grows, rising only with tree depth.
+
+        Once streaming ends, every member checksums its copy (via `run`) and
+        the result is compared against the local file's.
+
+        .. note::
+            Relaying members connect to their children by running
+            ``ssh_command`` on the *remote* end, so they must be able to reach
+            and authenticate to them non-interactively (e.g. via
+            ``forward_agent=True`` or host-based auth). Remote ends also need a
+            POSIX shell with ``tee``, ``mkfifo``, ``mktemp`` and
+            ``sha256sum``.
+
+        :param str local: Local path of the file to distribute.
+
+        :param str remote:
+            Remote file path to write on every member; relative paths are
+            relative to each login directory.
+
+        :param int fanout:
+            Maximum number of hosts each host (including the local one) sends
+            to. ``1`` yields a simple pipeline. Default: ``2``.
+
+        :param bool preserve_mode:
+            Whether to ``chmod`` each copy to match the local file's mode
+            (default: ``True``).
+
+        :param str ssh_command:
+            Command members use to reach each other; the target
+            (``-p <port> <user>@<host>``) and the remote command are appended.
+            Default: ``"ssh -o BatchMode=yes"``.
+
+        :returns:
+            a `.GroupResult` mapping members to `.transfer.Result` objects,
+            whose ``elapsed`` covers the whole relay. Members whose copy is
+            missing or fails verification map to an exception instead (and a
+            `.GroupException` is raised), as with other methods.
+
+        .. versionadded:: 3.3
+        """
+        if fanout < 1:
+            raise ValueError("fanout must be at least 1!")
+        start = time.monotonic()
+        with _SharedSource(local) as source:
+            digest = hashlib.sha256(source.view).hexdigest()
+            mode = source.mode if preserve_mode else None
+            seeds = list(self[:fanout])
+            with ThreadPoolExecutor(max(len(seeds), 1)) as pool:
+                futures = [
+                    pool.submit(
+                        _relay_to,
+                        cxn,
+                        self._relay_header(i, remote, fanout, ssh_command),
+                        source.view,
+                    )
+                    for i, cxn in enumerate(seeds)
+                ]
+            # Stream failures only matter insofar as they leave bad copies,
+            # which verification reports per host.
+            for future in futures:
+                future.exception()
+            return self._do(
+                _verify_relay,
+                remote,
+                digest,
+                len(source.view),
+                mode,
+                source.path,
+                start,
+            )
+
+    def _relay_header(self, index, path, fanout, ssh_command):
+        # Stdin preamble for member 'index' (whose command is always
+        # _RELAY_COMMAND): the relay script itself, then the settings and
+        # member list it works out its children from. Sent as data, so that
+        # neither commands nor headers nest as the tree deepens.
+        fields = [path, ssh_command]
+        if any("\n" in x for x in fields):
+            raise ValueError(
+                "Relay paths & commands may not contain newlines!"
+            )
+        fields += [fanout, index, len(self)]
+        fields += ["-p {} {}@{}".format(x.port, x.user, x.host) for x in self]
+        lines = [_RELAY_SCRIPT] + [str(x) for x in fields]
+        return "".join(x + "\n" for x in lines).encode()
+
+    def open(self, concurrency=None, rate=None):
+        """
+        Connect every member ahead of time, optionally throttling handshakes.
+
+        Members otherwise connect lazily, inside whichever method is called
+        first -- so for large groups, a storm of simultaneous handshakes lands
+        at the same moment as the real work, which can overwhelm bastions and
+        servers' ``MaxStartups``. Calling this first separates the two, and
+        surfaces unreachable hosts before anything has been run anywhere::
+
+            group = ThreadingGroup(*hosts)
+            group.open(concurrency=20, rate=10)
+            group.run("uptime")
+
+        Members which are already connected are left alone.
+
+        :param int concurrency:
+            Maximum number of members connecting at once. Default: ``None``
+            (all of them).
+
+        :param float rate:
+            Maximum number of new handshakes to start per second, enforced via
+            a token bucket shared by all members. Default: ``None`` (no
+            limit).
+
+        :returns:
+            a `.GroupResult` mapping each member to the number of seconds it
+            took to connect (not counting time spent waiting its turn), or to
+            the exception raised trying. As with other methods, a
+            `.GroupException` is raised if any member failed.
+
+        .. versionadded:: 3.3
+        """
+        bucket = _TokenBucket(rate) if rate else None
+
+        def connect(cxn):
+            if cxn.is_connected:
+                return 0.0
+            if bucket is not None:
+                bucket.acquire()
+            start = time.monotonic()
+            cxn.open()
+            return time.monotonic() - start
+
+        results = GroupResult()
+        workers = min(concurrency or len(self), len(self))
+        if workers:
+            with ThreadPoolExecutor(workers) as pool:
+                futures = {pool.submit(connect, cxn): cxn for cxn in self}
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        results[futures[future]] = e
+        if results.failed:
+            raise GroupException(results)
+        return results
+
     def close(self):
         """
         Executes `.Connection.close` on all member `Connections <.Connection>`.
@@ -213,7 +511,7 @@ class SerialGroup(Group):
         excepted = False
         for cxn in self:
             try:
-                results[cxn] = getattr(cxn, method)(*args, **kwargs)
+                results[cxn] = _call(cxn, method, args, kwargs)
             except Exception as e:
                 results[cxn] = e
                 excepted = True
@@ -221,21 +519,84 @@ class SerialGroup(Group):
             raise GroupException(results)
         return results
 
+    def _iter_do(self, method, *args, **kwargs):
+        for cxn in self:
+            try:
+                yield cxn, _call(cxn, method, args, kwargs)
+            except Exception as e:
+                yield cxn, e
+
+
+def _call(cxn, method, args, kwargs):
+    # Methods are usually Connection method names, but may also be callables
+    # taking the connection as their first argument.
+    if callable(method):
+        return method(cxn, *args, **kwargs)
+    return getattr(cxn, method)(*args, **kwargs)
+
 
 def thread_worker(cxn, queue, method, args, kwargs):
-    result = getattr(cxn, method)(*args, **kwargs)
+    result = _call(cxn, method, args, kwargs)
     # TODO: namedtuple or attrs object?
     queue.put((cxn, result))
 
 
+def pool_worker(cxns, queue, method, args, kwargs):
+    # Keep pulling connections until there are none left; this is what bounds
+    # the number of in-flight connections to the number of pool workers.
+    while True:
+        try:
+            cxn = cxns.get(block=False)
+        except Empty:
+            return
+        # A single worker services many connections, so exceptions can't be
+        # left to the thread wrapper; they travel back via the queue instead.
+        try:
+            result = _call(cxn, method, args, kwargs)
+        except Exception as e:
+            result = e
+        queue.put((cxn, result))
+
+
 class ThreadingGroup(Group):
     """
     Subclass of `.Group` which uses threading to execute concurrently.
 
+    By default, one thread is spawned per member connection, all at once. For
+    large groups this means an equally large number of simultaneous SSH
+    handshakes; give ``max_workers`` to instead run members through a
+    fixed-size pool of worker threads, each of which only picks up a new
+    connection once it has finished with its previous one::
+
+        group = ThreadingGroup(*hosts, max_workers=50)
+
+    The return value (and `.GroupException` behavior) is identical either
+    way.
+
+    .. note::
+        Connections are left open after use, as with every other `.Group`
+        method; ``max_workers`` bounds how many are being *worked on* at any
+        one time, not how many are open. Use `~.Group.close` (or the group as
+        a context manager) to tear them down.
+
     .. versionadded:: 2.0
+    .. versionchanged:: 3.3
+        Added the ``max_workers`` keyword argument.
     """
 
+    #: How long (in seconds) streaming methods such as `~.Group.run_iter`
+    #: block on their result queue before checking worker thread health.
+    poll_interval = 0.1
+
+    def __init__(self, *hosts, max_workers=None, **kwargs):
+        #: Maximum number of worker threads to use; ``None`` (the default)
+        #: means one thread per member connection.
+        self.max_workers = max_workers
+        super().__init__(*hosts, **kwargs)
+
     def _do(self, method, *args, **kwargs):
+        if self.max_workers:
+            return self._do_pooled(method, *args, **kwargs)
         results = GroupResult()
         queue = Queue()
         threads = []
@@ -282,6 +643,397 @@ class ThreadingGroup(Group):
             raise GroupException(results)
         return results
 
+    def _do_pooled(self, method, *args, **kwargs):
+        results = GroupResult(self._iter_do(method, *args, **kwargs))
+        if results.failed:
+            raise GroupException(results)
+        return results
+
+    def _iter_do(self, method, *args, **kwargs):
+        cxns = Queue()
+        for cxn in self:
+            cxns.put(cxn)
+        queue = Queue()
+        threads = []
+        for _ in range(min(self.max_workers or len(self), len(self))):
+            thread = ExceptionHandlingThread(
+                target=pool_worker,
+                kwargs=dict(
+                    cxns=cxns,
+                    queue=queue,
+                    method=method,
+                    args=args,
+                    kwargs=kwargs,
+                ),
+            )
+            threads.append(thread)
+        for thread in threads:
+            thread.start()
+        pending = len(self)
+        while pending:
+            try:
+                cxn, result = queue.get(timeout=self.poll_interval)
+            except Empty:
+                # Workers trap per-connection errors themselves, so if they've
+                # all exited with results still outstanding, something went
+                # wrong with the pool machinery and not a host.
+                if queue.empty() and not any(x.is_alive() for x in threads):
+                    wrappers = [x.exception() for x in threads]
+                    raise ThreadException([x for x in wrappers if x])
+                continue
+            pending -= 1
+            yield cxn, result
+        for thread in threads:
+            thread.join()
+
+
+def process_worker(cxns, method, args, kwargs, threads):
+    # Runs inside a worker process: drive our shard of (index, Connection)
+    # pairs via threads, then hand back picklable (index, value) pairs.
+    by_cxn = {}
+    for index, cxn in cxns:
+        by_cxn.setdefault(id(cxn), index)
+    group = ThreadingGroup.from_connections(
+        [cxn for _, cxn in cxns], max_workers=threads
+    )
+    pairs = []
+    try:
+        for cxn, value in group._iter_do(method, *args, **kwargs):
+            pairs.append((by_cxn[id(cxn)], _picklable(value)))
+    finally:
+        group.close()
+    return pairs
+
+
+class _SharedSource:
+    """
+    A file's contents, read (or mapped) once and shared by many uploads.
+
+    Each thread reading from it via `_put_shared` gets its own position, so
+    one instance may back concurrent uploads to many hosts.
+    """
+
+    def __init__(self, local):
+        self.mode = None
+        self._mmap = None
+        if hasattr(local, "read"):
+            self.path = local
+            self.name = getattr(local, "name", None)
+            local.seek(0)
+            data = local.read()
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+        else:
+            self.path = os.path.abspath(local)
+            self.name = os.path.basename(self.path)
+            with open(self.path, "rb") as fd:
+                self.mode = stat.S_IMODE(os.fstat(fd.fileno()).st_mode)
+                try:
+                    data = self._mmap = mmap.mmap(
+                        fd.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+                except ValueError:
+                    # Empty files can't be mapped.
+                    data = b""
+        self.view = memoryview(data)
+        self._local = thread_local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self.view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # Slices still alive somewhere (e.g. in a traceback); the mapping
+            # is unmapped once they're garbage collected instead.
+            pass
+
+    # Just enough of the file-like protocol for Transfer.put (which treats
+    # anything with a 'write' as file-like) & SFTPClient.putfo.
+
+    def write(self, data):
+        raise OSError("{!r} is read-only".format(self))
+
+    def tell(self):
+        return getattr(self._local, "pos", 0)
+
+    def seek(self, pos):
+        self._local.pos = pos
+
+    def read(self, size=-1):
+        start = self.tell()
+        end = len(self.view) if size < 0 else start + size
+        chunk = self.view[start:end]
+        self._local.pos = start + len(chunk)
+        return chunk
+
+
+def _put_shared(cxn, source, remote, preserve_mode):
+    result = cxn.put(source, remote=remote or source.name)
+    if preserve_mode and source.mode is not None:
+        cxn.sftp().chmod(result.remote, source.mode)
+    result.local = result.orig_local = source.path
+    return result
+
+
+# What every member of a relay runs: read the one-line relay script from
+# stdin, and run it on the rest (see Group._relay_header).
+_RELAY_COMMAND = 'IFS= read -r s && eval "$s"'
+
+# The relay script, as a single line. It reads its settings and the member
+# list (targets for ssh, one per line) from stdin, then saves the remaining
+# data to the path while tee-ing it on to its children, each of which gets
+# the same script & member list followed by the data. Should a child fail,
+# its pipe is drained regardless, lest tee die of SIGPIPE and take this host
+# & its siblings down with it.
+_RELAY_SCRIPT = " ".join(
+    [
+        "set -f;",
+        "R='IFS= read -r s && eval \"$s\"';",
+        "IFS= read -r path; IFS= read -r ssh;",
+        "read -r fanout; read -r me; read -r n; i=0;",
+        "while [ $i -lt $n ]; do",
+        'IFS= read -r t; eval "h_$i=\\$t"; i=$((i + 1));',
+        "done;",
+        "first=$((fanout * (me + 1))); last=$((first + fanout));",
+        "[ $last -gt $n ] && last=$n;",
+        '[ $first -ge $last ] && { cat > "$path"; exit; };',
+        'd=$(mktemp -d) || exit 1; st=0; pids=""; fifos=""; c=$first;',
+        "while [ $c -lt $last ]; do",
+        'mkfifo "$d/$c"; fifos="$fifos $d/$c"; eval "t=\\$h_$c";',
+        '({ printf \'%s\\n\' "$s" "$path" "$ssh" $fanout $c $n; j=0;',
+        "while [ $j -lt $n ]; do",
+        'eval "printf \'%s\\\\n\' \\"\\$h_$j\\""; j=$((j + 1));',
+        'done; cat; } | $ssh $t "$R"',
+        '|| { r=$?; cat > /dev/null; exit $r; }) < "$d/$c" &',
+        'pids="$pids $!"; c=$((c + 1));',
+        "done;",
+        'tee "$path" $fifos > /dev/null || st=1;',
+        "for p in $pids; do wait $p || st=1; done;",
+        'rm -rf "$d"; exit $st',
+    ]
+)
+
+
+def _relay_to(cxn, header, view, chunk_size=32768):
+    # Stream header, then view, into a relay command on cxn, raising if it
+    # fails.
+    cxn.open()
+    channel = cxn.create_session()
+    try:
+        channel.exec_command(_RELAY_COMMAND)
+        channel.sendall(header)
+        for offset in range(0, len(view), chunk_size):
+            end = offset + chunk_size
+            channel.sendall(view[offset:end])
+        channel.shutdown_write()
+        status = channel.recv_exit_status()
+        if status:
+            error = channel.recv_stderr(65536).decode("utf-8", "replace")
+            raise IOError(
+                "Relay via {!r} exited {}: {}".format(
+                    cxn.host, status, error.strip()
+                )
+            )
+    finally:
+        channel.close()
+
+
+def _verify_relay(cxn, remote, digest, size, mode, local, start):
+    # Module level, so that it pickles.
+    command = "sha256sum {}".format(shlex.quote(remote))
+    if mode is not None:
+        command = "chmod {:o} {} && {}".format(
+            mode, shlex.quote(remote), command
+        )
+    result = cxn.run(command, hide=True, in_stream=False)
+    found = (result.stdout.split() or [""])[0]
+    if found != digest:
+        raise IOError(
+            "Checksum mismatch for {!r} on {!r}: expected {}, got {}".format(
+                remote, cxn.host, digest, found
+            )
+        )
+    return Result(
+        local=local,
+        orig_local=local,
+        remote=remote,
+        orig_remote=remote,
+        connection=cxn,
+        size=size,
+        elapsed=time.monotonic() - start,
+    )
+
+
+def _put_path(cxn, local, remote, preserve_mode):
+    # Module level, so that it pickles.
+    return cxn.put(local, remote=remote, preserve_mode=preserve_mode)
+
+
+def _picklable(value):
+    # Exceptions in particular may hold unpicklable objects (e.g. keys, in
+    # paramiko's BadHostKeyException); degrade those to a plain Exception
+    # rather than losing the whole shard's results.
+    try:
+        pickle.dumps(value)
+    except Exception:
+        if isinstance(value, BaseException):
+            msg = "{!r} (raised in worker process {})"
+            return Exception(msg.format(value, os.getpid()))
+        raise
+    return value
+
+
+class ProcessPoolGroup(Group):
+    """
+    Subclass of `.Group` which shards its members across worker processes.
+
+    Much of an SSH session's CPU cost (key exchange, ciphers, MACs) is pure
+    Python within Paramiko, so a `.ThreadingGroup` driving hundreds of busy
+    hosts is ultimately limited by the GIL. This class instead splits its
+    members across ``processes`` worker processes, each of which drives its
+    share of the hosts with a `.ThreadingGroup` (of up to ``threads`` worker
+    threads) and its own connections.
+
+    Results are marshalled back to the parent, where their ``connection``
+    attributes are pointed back at this group's own members, so the returned
+    `.GroupResult` looks exactly like one from any other group.
+
+    .. note::
+        Everything handed to a method of this class -- arguments, connection
+        parameters and `.Config` data -- must be picklable. In particular,
+        file-like objects cannot be given to ``put``/``get``, and any progress
+        ``callback`` runs (and must be picklable, so no lambdas) inside the
+        worker processes. Exceptions which cannot be pickled are replaced by
+        a plain `Exception` holding their ``repr``.
+
+    .. note::
+        Connections are opened and closed inside the worker processes on
+        every call; this group's own member objects are never connected.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, *hosts, processes=None, threads=None, **kwargs):
+        #: Number of worker processes; ``None`` means `os.cpu_count`.
+        self.processes = processes
+        #: Maximum number of threads per worker process, as with
+        #: `.ThreadingGroup`'s ``max_workers``; ``None`` means one per host.
+        self.threads = threads
+        super().__init__(*hosts, **kwargs)
+
+    def open(self, concurrency=None, rate=None):
+        """
+        Like `.Group.open`, but does nothing.
+
+        This group's own members are never connected: each call connects
+        afresh inside the worker processes, so there is nothing to open ahead
+        of time. (To throttle those handshakes, limit ``processes`` and
+        ``threads`` instead.) Provided so that code calling ``open`` on any
+        `.Group` keeps working.
+
+        :returns:
+            a `.GroupResult` mapping every member to ``0.0``, as if all were
+            already connected.
+
+        .. versionadded:: 3.3
+        """
+        return GroupResult((cxn, 0.0) for cxn in self)
+
+    def put_broadcast(self, local, remote=None, preserve_mode=True):
+        """
+        Like `.Group.put_broadcast`, but with a caveat.
+
+        Memory maps can't be shared with worker processes, so each worker
+        reads ``local`` itself (once per process, not per host, when the file
+        is in the OS page cache). Only paths, not file-like objects, may be
+        given.
+
+        .. versionadded:: 3.3
+        """
+        return self._do(_put_path, local, remote, preserve_mode)
+
+    def _do(self, method, *args, **kwargs):
+        results = GroupResult(self._iter_do(method, *args, **kwargs))
+        if results.failed:
+            raise GroupException(results)
+        return results
+
+    def _iter_do(self, method, *args, **kwargs):
+        processes = min(self.processes or os.cpu_count() or 1, len(self))
+        if not processes:
+            return
+        # Round-robin so slow hosts clumped together in the member list don't
+        # all land in one shard.
+        members = list(enumerate(self))
+        shards = [members[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(
+                    process_worker, shard, method, args, kwargs, self.threads
+                )
+                for shard in shards
+            ]
+            for future in as_completed(futures):
+                for index, value in future.result():
+                    cxn = self[index]
+                    # Results (and exceptions wrapping them, such as
+                    # UnexpectedExit) refer to the worker's copy of the
+                    # connection; point them at ours instead.
+                    target = getattr(value, "result", value)
+                    if hasattr(target, "connection"):
+                        target.connection = cxn
+                    yield cxn, value
+
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket: `acquire` hands out at most ``rate`` tokens per
+    second on average, and at most ``capacity`` at once.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._stamp) * self.rate,
+                )
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _member_configs(count):
+    # Configs for the members of a new group: each its own (so changing one
+    # member's config doesn't affect the others), but clones of one another,
+    # thus sharing loaded ssh_config data and the like -- plus, unlike most
+    # clones, ProxyJump gateways.
+    shared = Config()
+    configs = []
+    for _ in range(count):
+        config = shared.clone()
+        config._set(_gateways=shared._gateways)
+        configs.append(config)
+    return configs
+
 
 class GroupResult(dict):
     """
@@ -340,3 +1092,45 @@ class GroupResult(dict):
         """
         self._bifurcate()
         return self._failures
+
+
+class GroupResultIterator:
+    """
+    Iterator over results from streaming `.Group` methods such as
+    `~.Group.run_iter`.
+
+    Yields ``(connection, value)`` tuples as each member connection finishes,
+    where ``value`` is whatever the underlying method returned, or the
+    exception it raised.
+
+    Everything yielded is also recorded into a `.GroupResult`, available as
+    `result`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, pairs):
+        self._pairs = iter(pairs)
+        self._result = GroupResult()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cxn, value = next(self._pairs)
+        self._result[cxn] = value
+        return cxn, value
+
+    @property
+    def result(self):
+        """
+        The aggregate `.GroupResult` for every member connection.
+
+        If iteration has not yet completed, accessing this blocks until all
+        remaining results have arrived.
+
+        .. versionadded:: 3.3
+        """
+        for _ in self:
+            pass
+        return self._result
@@ -0,0 +1,186 @@
+"""
+Name resolution caching and multi-address connection racing.
+
+When a hostname resolves to several addresses, `.Connection.open` may -- if
+the ``address_racing.enabled`` :ref:`config setting <default-values>` is true
+-- race connection attempts across them in the style of RFC 8305 ("Happy
+Eyeballs v2") via `connect`, instead of leaving Paramiko to try them one at a
+time (so that a dead first address costs up to a whole ``connect_timeout``
+every time). The winning socket is then handed to Paramiko.
+
+Resolution results are cached by a `DNSCache`, shared by every `.Connection`
+using the same `.Config` or a clone of it (e.g. all members of a `.Group`).
+
+.. versionadded:: 3.3
+"""
+
+import errno
+import os
+import selectors
+import socket
+import time
+from threading import Lock
+
+from .util import debug
+
+
+class DNSCache:
+    """
+    Thread-safe cache of `socket.getaddrinfo` results for TCP connections.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getstate__(self):
+        # Locks don't pickle (e.g. for ProcessPoolGroup); cached results are
+        # cheap to recompute on the other side.
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def resolve(self, host, port, family=socket.AF_UNSPEC, ttl=60):
+        """
+        Return the ``getaddrinfo`` results for connecting to ``host:port``.
+
+        Results are reused for up to ``ttl`` seconds (``None`` means forever,
+        ``0`` means never). Resolution errors are not cached.
+
+        :raises: `socket.gaierror`, if resolution fails.
+        """
+        key = (host, port, family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and (entry[0] is None or now < entry[0]):
+            return entry[1]
+        infos = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        if ttl != 0:
+            expires = None if ttl is None else now + ttl
+            with self._lock:
+                self._entries[key] = (expires, infos)
+        return infos
+
+    def clear(self):
+        """
+        Forget every cached result.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+def interleave(infos):
+    """
+    Reorder ``getaddrinfo`` results so that address families alternate,
+    starting with the first result's family, per RFC 8305 section 4.
+
+    .. versionadded:: 3.3
+    """
+    by_family = {}
+    for info in infos:
+        by_family.setdefault(info[0], []).append(info)
+    queues = list(by_family.values())
+    ordered = []
+    while queues:
+        for queue in list(queues):
+            ordered.append(queue.pop(0))
+            if not queue:
+                queues.remove(queue)
+    return ordered
+
+
+# connect_ex() results meaning "in progress" rather than failure.
+_IN_PROGRESS = {
+    errno.EINPROGRESS,
+    errno.EWOULDBLOCK,
+    errno.EAGAIN,
+    getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK),
+}
+
+
+def connect(infos, timeout=None, delay=0.25):
+    """
+    Race connections to ``infos`` (``getaddrinfo`` results), returning the
+    first socket to connect.
+
+    Attempts start in `interleave` order, each ``delay`` seconds after the
+    previous one -- or straight away, if all previous ones have failed --
+    while earlier ones remain in flight. The losers are closed.
+
+    :param float timeout:
+        Overall time limit, in seconds (``None`` means no limit).
+
+    :returns: A connected, blocking `socket.socket`.
+
+    :raises:
+        `socket.timeout` if ``timeout`` expires first; otherwise, if every
+        attempt fails, the last attempt's `OSError`.
+
+    .. versionadded:: 3.3
+    """
+    queue = interleave(infos)
+    if not queue:
+        raise OSError("No addresses to connect to")
+    deadline = None if timeout is None else time.monotonic() + timeout
+    selector = selectors.DefaultSelector()
+    pending = set()
+    error = None
+    winner = None
+    next_start = time.monotonic()
+    try:
+        while winner is None:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                raise socket.timeout("timed out")
+            if queue and (not pending or now >= next_start):
+                family, type_, proto, _, address = queue.pop(0)
+                debug("Connecting to {!r}".format(address))
+                sock = socket.socket(family, type_, proto)
+                sock.setblocking(False)
+                result = sock.connect_ex(address)
+                if result == 0:
+                    winner = sock
+                elif result in _IN_PROGRESS:
+                    pending.add(sock)
+                    selector.register(sock, selectors.EVENT_WRITE, address)
+                    next_start = now + delay
+                else:
+                    error = OSError(result, os.strerror(result), address)
+                    sock.close()
+                continue
+            if not pending:
+                raise error
+            waits = []
+            if queue:
+                waits.append(next_start - now)
+            if deadline is not None:
+                waits.append(deadline - now)
+            for key, _ in selector.select(
+                max(min(waits), 0) if waits else None
+            ):
+                sock = key.fileobj
+                selector.unregister(sock)
+                pending.discard(sock)
+                result = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if result == 0:
+                    winner = sock
+                    break
+                error = OSError(result, os.strerror(result), key.data)
+                debug("Connecting to {!r} failed: {}".format(key.data, error))
+                sock.close()
+                # Don't wait out the delay once an attempt has failed.
+                next_start = now
+    finally:
+        for sock in pending:
+            if sock is not winner:
+                sock.close()
+        selector.close()
+    winner.setblocking(True)
+    return winner
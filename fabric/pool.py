@@ -0,0 +1,202 @@
+"""
+Process-wide registry of open SSH clients, allowing connection reuse.
+
+Much like OpenSSH's ``ControlMaster``, this lets many `.Connection` objects
+targeting the same host share a single authenticated transport (each getting
+their own channels on it) instead of each paying for a full TCP handshake, key
+exchange and authentication.
+
+Pooling is opt-in, via the ``connection_pool.enabled`` :ref:`config setting
+<default-values>`; see `.Connection.open` and `.Connection.close` for how it
+is used.
+
+.. versionadded:: 3.3
+"""
+
+import time
+from threading import Lock
+
+from .util import debug
+
+
+class PoolEntry:
+    """
+    Bookkeeping for a single pooled `~paramiko.client.SSHClient`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self, client):
+        #: The pooled client.
+        self.client = client
+        #: Number of `.Connection` objects currently using `client`.
+        self.refs = 1
+        #: `time.monotonic` timestamp of when `refs` last dropped to zero.
+        self.idle_since = None
+        #: Seconds `client` may sit unused before being closed (``None``
+        #: means forever).
+        self.idle_timeout = None
+
+    @property
+    def expired(self):
+        if self.refs or self.idle_since is None or self.idle_timeout is None:
+            return False
+        return time.monotonic() - self.idle_since >= self.idle_timeout
+
+    @property
+    def alive(self):
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        # Cheap liveness probe: no round trip, but will error out if the
+        # underlying socket has gone away since we last looked.
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+
+class ConnectionPool:
+    """
+    Thread-safe mapping of connection identities to shared, open clients.
+
+    Keys are typically the result of `.Connection._identity` (i.e. host, user
+    and port); values are reference-counted so a client is only considered
+    idle -- and thus eligible for expiry or eviction -- once every
+    `.Connection` using it has been closed.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def acquire(self, key):
+        """
+        Obtain a live, pooled client for ``key``, if there is one.
+
+        Dead clients found along the way are discarded.
+
+        :returns:
+            An open `~paramiko.client.SSHClient` (whose reference count has
+            been incremented), or ``None``.
+        """
+        # Our lock only guards our bookkeeping; liveness probes and closing
+        # clients may block on the network, so happen outside of it, lest one
+        # unresponsive host hold up every other thread using the pool.
+        with self._lock:
+            stale = self._prune()
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Claim it up front, so nobody evicts it while we probe it.
+                entry.refs += 1
+                entry.idle_since = None
+        self._close(stale)
+        if entry is None:
+            return None
+        if not entry.alive:
+            debug("Discarding dead pooled client for {!r}".format(key))
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            self._close([entry.client])
+            return None
+        debug("Reusing pooled client for {!r}".format(key))
+        return entry.client
+
+    def register(self, key, client):
+        """
+        Add a freshly connected ``client`` to the pool under ``key``.
+
+        :returns:
+            ``True`` if the client was pooled (and should later be handed to
+            `release`), ``False`` if a live client was already pooled for
+            that key -- in which case the caller retains sole ownership.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = PoolEntry(client)
+                    return True
+            # (Probed outside the lock, as in acquire.)
+            alive = entry.alive
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    # Changed while we weren't looking; start over.
+                    continue
+                if alive:
+                    return False
+                self._entries[key] = PoolEntry(client)
+            self._close([entry.client])
+            return True
+
+    def release(self, key, client, idle_timeout=None, max_size=None):
+        """
+        Signal that one user of the pooled ``client`` is done with it.
+
+        :param idle_timeout:
+            Seconds the client may remain open once unused. ``0`` closes it as
+            soon as it's unused; ``None`` keeps it open indefinitely.
+        :param max_size:
+            If given, idle clients are closed, least recently used first,
+            until at most this many clients remain pooled.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.client is not client:
+                # Pool was cleared (or the entry replaced) out from under us;
+                # nobody else can be relying on this client, so close it.
+                stale = [client]
+            else:
+                entry.refs = max(entry.refs - 1, 0)
+                if not entry.refs:
+                    entry.idle_since = time.monotonic()
+                    entry.idle_timeout = idle_timeout
+                stale = self._prune(max_size=max_size)
+        self._close(stale)
+
+    def clear(self):
+        """
+        Close and forget every pooled client, in use or not.
+        """
+        with self._lock:
+            stale = [x.client for x in self._entries.values()]
+            self._entries.clear()
+        self._close(stale)
+
+    def _prune(self, max_size=None):
+        # Forget expired (and, given max_size, excess idle) entries, returning
+        # their clients for the caller to close once it drops the lock.
+        stale = []
+        for key, entry in list(self._entries.items()):
+            if entry.expired:
+                debug("Closing expired pooled client for {!r}".format(key))
+                stale.append(self._entries.pop(key).client)
+        if max_size is None:
+            return stale
+        idle = sorted(
+            (x for x in self._entries.items() if not x[1].refs),
+            key=lambda x: x[1].idle_since,
+        )
+        while len(self._entries) > max_size and idle:
+            key, _ = idle.pop(0)
+            debug("Evicting idle pooled client for {!r}".format(key))
+            stale.append(self._entries.pop(key).client)
+        return stale
+
+    def _close(self, clients):
+        for client in clients:
+            client.close()
+
+
+#: The process-wide `.ConnectionPool` used by `.Connection`.
+pool = ConnectionPool()
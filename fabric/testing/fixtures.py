@@ -121,7 +121,7 @@ def sftp():
     # Regular ol transfer to save some time
     transfer = Transfer(Connection("host"))
     yield transfer, client, mock_os
-    # TODO: old mock_sftp() lacked any 'stop'...why? feels bad man
+    mock.stop()
 
 
 @fixture
@@ -2,20 +2,43 @@
 File transfer via SFTP and/or SCP.
 """
 
+import hashlib
 import os
 import posixpath
+import shlex
 import stat
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Empty, Queue
+from threading import Event, Lock, Thread
 
 from pathlib import Path
 
+from paramiko.sftp_file import SFTPFile
+
 from .util import debug  # TODO: actual logging! LOL
 
-# TODO: figure out best way to direct folks seeking rsync, to patchwork's rsync
-# call (which needs updating to use invoke.run() & fab 2 connection methods,
-# but is otherwise suitable).
-# UNLESS we want to try and shoehorn it into this module after all? Delegate
-# any recursive get/put to it? Requires users to have rsync available of
-# course.
+#: How many files' block checksums `.Transfer.sync` asks for per remote
+#: command.
+CHECKSUM_BATCH_SIZE = 100
+
+#: Remote (compress, decompress) commands for each supported ``compress``
+#: value of `.Transfer.get` / `.Transfer.put`; each filters stdin to stdout.
+COMPRESSION_COMMANDS = {
+    "gzip": ("gzip -c", "gzip -dc"),
+    "zstd": ("zstd -qc", "zstd -qdc"),
+}
+
+#: Number of SFTP read requests (of up to 32 KiB each) a chunked
+#: `.Transfer.get` worker prefetches at once when ``transfers.pipeline_depth``
+#: is unset, bounding how much it buffers in memory.
+DEFAULT_PREFETCH_DEPTH = 64
+
+#: Suffix of the temporary file a resumable `.Transfer.get` / `.Transfer.put`
+#: writes to (alongside its destination) before renaming it into place.
+PARTIAL_SUFFIX = ".part"
 
 
 class Transfer:
@@ -40,7 +63,16 @@ class Transfer:
         except IOError:
             return False
 
-    def get(self, remote, local=None, preserve_mode=True):
+    def get(
+        self,
+        remote,
+        local=None,
+        preserve_mode=True,
+        chunked=None,
+        compress=None,
+        resume=None,
+        callback=None,
+    ):
         """
         Copy a file from wrapped connection's host to the local filesystem.
 
@@ -100,6 +132,34 @@ class Transfer:
             Whether to `os.chmod` the local file so it matches the remote
             file's mode (default: ``True``).
 
+        :param bool chunked:
+            Whether to download in parallel byte ranges (see
+            :ref:`chunked-transfers`) instead of as a single sequential stream.
+            Only applies when ``local`` is a path, not a file-like object.
+            Default: the ``transfers.chunked`` :ref:`config setting
+            <default-values>`.
+
+        :param str compress:
+            Compress the file on the fly while downloading: ``"gzip"`` or
+            ``"zstd"`` (see :ref:`compressed-transfers`). Takes precedence over
+            ``chunked``. Default: the ``transfers.compress`` :ref:`config
+            setting <default-values>` (``None``, meaning no compression).
+
+        :param bool resume:
+            Whether to download into a partial file (``local`` plus
+            ``".part"``) which is renamed into place once complete, picking up
+            where any previous, interrupted attempt left off (see
+            :ref:`resumable-transfers`). Takes precedence over ``chunked``;
+            ignored when ``local`` is a file-like object or ``compress`` is
+            given. Default: the ``transfers.resume`` :ref:`config setting
+            <default-values>` (``False``).
+
+        :param callback:
+            Callable to report progress to, given a `.Progress` object at most
+            every ``transfers.progress_interval`` seconds while the download
+            runs, and once more when it completes (see
+            :ref:`transfer-progress`). Default: ``None``.
+
         :returns: A `.Result` object.
 
         .. versionadded:: 2.0
@@ -108,10 +168,9 @@ class Transfer:
             attributes.
         .. versionchanged:: 2.6
             Create missing ``local`` directories automatically.
+        .. versionchanged:: 3.3
+            Added ``chunked``, ``compress``, ``resume`` and ``callback``.
         """
-        # TODO: how does this API change if we want to implement
-        # remote-to-remote file transfer? (Is that even realistic?)
-        # TODO: callback support
         # TODO: how best to allow changing the behavior/semantics of
         # remote/local (e.g. users might want 'safer' behavior that complains
         # instead of overwriting existing files) - this likely ties into the
@@ -154,8 +213,6 @@ class Transfer:
             # TODO: reimplement mkdir (or otherwise write a testing function)
             # allowing us to track what was created so we can revert if
             # transfer fails.
-            # TODO: Alternately, transfer to temp location and then move, but
-            # that's basically inverse of v1's sudo-put which gets messy
 
         # Run Paramiko-level .get() (side-effects only. womp.)
         # TODO: push some of the path handling into Paramiko; it should be
@@ -164,10 +221,33 @@ class Transfer:
         # existing files. Use logging for that obviously.
         #
         # If local appears to be a file-like object, use sftp.getfo, not get
-        if is_file_like:
-            self.sftp.getfo(remotepath=remote, fl=local)
+        if chunked is None:
+            chunked = self.connection.config.transfers.chunked
+        if compress is None:
+            compress = self.connection.config.transfers.compress
+        if resume is None:
+            resume = self.connection.config.transfers.resume
+        start = time.monotonic()
+        resumed_from = 0
+        tracker = self._tracker(callback, local, remote)
+        if compress:
+            size = self._get_compressed(remote, local, compress, tracker)
+            if preserve_mode and not is_file_like:
+                remote_mode = self.sftp.stat(remote).st_mode
+                os.chmod(local, stat.S_IMODE(remote_mode))
+        elif is_file_like:
+            size = self.sftp.getfo(
+                remotepath=remote, fl=local, **tracker.kwargs
+            )
+        elif resume:
+            size, resumed_from = self._get_resumable(
+                remote, local, preserve_mode, tracker
+            )
+        elif chunked:
+            size = self._get_chunked(remote, local, preserve_mode, tracker)
         else:
-            self.sftp.get(remotepath=remote, localpath=local)
+            self.sftp.get(remotepath=remote, localpath=local, **tracker.kwargs)
+            size = os.path.getsize(local)
             # Set mode to same as remote end
             # TODO: Push this down into SFTPClient sometime (requires backwards
             # incompat release.)
@@ -175,6 +255,7 @@ class Transfer:
                 remote_mode = self.sftp.stat(remote).st_mode
                 mode = stat.S_IMODE(remote_mode)
                 os.chmod(local, mode)
+        tracker.finish()
         # Return something useful
         return Result(
             orig_remote=orig_remote,
@@ -182,9 +263,336 @@ class Transfer:
             orig_local=orig_local,
             local=local,
             connection=self.connection,
+            size=size,
+            elapsed=time.monotonic() - start,
+            resumed_from=resumed_from,
+        )
+
+    def _tracker(self, callback, local, remote):
+        return _Tracker(
+            callback,
+            self.connection.config.transfers.progress_interval,
+            self.connection,
+            local,
+            remote,
+        )
+
+    def _get_resumable(self, remote, local, preserve_mode, tracker):
+        attrs = self.sftp.stat(remote)
+        partial = local + PARTIAL_SUFFIX
+        try:
+            partial_size = os.path.getsize(partial)
+        except OSError:
+            partial_size = 0
+        offset = self._resume_offset(
+            partial, partial, remote, partial_size, attrs.st_size
+        )
+        debug(
+            "Downloading {!r} to {!r} from offset {}".format(
+                remote, partial, offset
+            )
+        )
+        tracker.start(attrs.st_size, offset)
+        chunk_size = self.connection.config.transfers.chunk_size
+        with self.sftp.open(remote, "rb") as rfile, open(
+            partial, "ab" if offset else "wb"
+        ) as lfile:
+            rfile.seek(offset)
+            rfile.prefetch(attrs.st_size)
+            for data in iter(lambda: rfile.read(chunk_size), b""):
+                lfile.write(data)
+                tracker.advance(len(data))
+        if preserve_mode:
+            os.chmod(partial, stat.S_IMODE(attrs.st_mode))
+        os.replace(partial, local)
+        return attrs.st_size - offset, offset
+
+    def _put_resumable(self, local, remote, preserve_mode, tracker):
+        local_stat = os.stat(local)
+        partial = remote + PARTIAL_SUFFIX
+        try:
+            partial_size = self.sftp.stat(partial).st_size
+        except IOError:
+            partial_size = 0
+        offset = self._resume_offset(
+            local, partial, partial, partial_size, local_stat.st_size
         )
+        debug(
+            "Uploading {!r} to {!r} from offset {}".format(
+                local, partial, offset
+            )
+        )
+        tracker.start(local_stat.st_size, offset)
+        chunk_size = self.connection.config.transfers.chunk_size
+        with self.sftp.open(partial, "r+b" if offset else "wb") as rfile, open(
+            local, "rb"
+        ) as lfile:
+            rfile.set_pipelined(True)
+            rfile.seek(offset)
+            lfile.seek(offset)
+            for data in iter(lambda: lfile.read(chunk_size), b""):
+                rfile.write(data)
+                tracker.advance(len(data))
+            if preserve_mode:
+                rfile.chmod(stat.S_IMODE(local_stat.st_mode))
+        # Unlike plain rename, this may replace an existing file.
+        self.sftp.posix_rename(partial, remote)
+        return local_stat.st_size - offset, offset
 
-    def put(self, local, remote=None, preserve_mode=True):
+    def _resume_offset(self, local, partial, remote, partial_size, size):
+        """
+        Decide where an interrupted transfer may safely pick up again.
+
+        ``partial_size`` bytes of a ``size`` byte file are already present in
+        the partial file; they're only trusted if the checksum of ``local``'s
+        first ``partial_size`` bytes matches that of ``remote``'s (one of
+        those being the partial file itself). Otherwise, start from scratch.
+        """
+        if not partial_size or partial_size > size:
+            return 0
+        expected = _prefix_checksum(local, partial_size)
+        actual = self._remote_prefix_checksum(remote, partial_size)
+        if expected != actual:
+            msg = "Partial file {!r} doesn't match; starting over"
+            debug(msg.format(partial))
+            return 0
+        return partial_size
+
+    def _remote_prefix_checksum(self, path, size):
+        # MD5 of a remote file's first size bytes, or None if unobtainable.
+        command = "head -c {} {} | md5sum".format(size, shlex.quote(path))
+        result = self.connection.run(
+            command, hide=True, warn=True, in_stream=False
+        )
+        parts = result.stdout.split()
+        if result.failed or not parts:
+            return None
+        return parts[0]
+
+    def _get_compressed(self, remote, local, compress, tracker):
+        command, _ = _compression_commands(compress)
+        decompressor = _compressor(compress, decompress=True)
+        debug(
+            "Downloading {!r} to {!r} via {}".format(remote, local, compress)
+        )
+        command = "{} < {}".format(command, shlex.quote(remote))
+        size = 0
+        fd = local if hasattr(local, "write") else open(local, "wb")
+        try:
+            with self._exec(command) as channel:
+                for data in iter(lambda: channel.recv(32768), b""):
+                    data = decompressor.decompress(data)
+                    fd.write(data)
+                    size += len(data)
+                    tracker.advance(len(data))
+                data = decompressor.flush()
+                fd.write(data)
+                size += len(data)
+        finally:
+            if fd is not local:
+                fd.close()
+        return size
+
+    def _put_compressed(self, local, remote, compress, mode, tracker):
+        _, command = _compression_commands(compress)
+        compressor = _compressor(compress)
+        command = "{} > {}".format(command, shlex.quote(remote))
+        # Set the mode as part of the same command; no extra round trip.
+        if mode is not None:
+            command += " && chmod {:o} {}".format(mode, shlex.quote(remote))
+        debug("Uploading {!r} to {!r} via {}".format(local, remote, compress))
+        size = 0
+        fd = local if hasattr(local, "read") else open(local, "rb")
+        try:
+            with self._exec(command) as channel:
+                chunk_size = self.connection.config.transfers.chunk_size
+                for data in iter(lambda: fd.read(chunk_size), b""):
+                    size += len(data)
+                    channel.sendall(compressor.compress(data))
+                    tracker.advance(len(data))
+                channel.sendall(compressor.flush())
+                channel.shutdown_write()
+        finally:
+            if fd is not local:
+                fd.close()
+        return size
+
+    @contextmanager
+    def _exec(self, command):
+        """
+        Run ``command`` remotely on a raw channel, for streaming its I/O.
+
+        Yields the channel; raises `IOError` (including the command's stderr)
+        afterwards if the command failed.
+        """
+        self.connection.open()
+        channel = self.connection.create_session()
+        try:
+            channel.exec_command(command)
+            yield channel
+            status = channel.recv_exit_status()
+            if status:
+                error = channel.recv_stderr(65536).decode("utf-8", "replace")
+                raise IOError(
+                    "{!r} exited {}: {}".format(command, status, error.strip())
+                )
+        finally:
+            channel.close()
+
+    def _get_chunked(self, remote, local, preserve_mode, tracker):
+        # One stat serves for sizing, preallocation & mode preservation.
+        attrs = self.sftp.stat(remote)
+        size = attrs.st_size
+        tracker.start(size)
+        depth = self.connection.config.transfers.pipeline_depth
+        # Only Paramiko 3.3+ knows this kwarg, so don't always send it.
+        kwargs = {}
+        if depth is not None:
+            kwargs["max_concurrent_prefetch_requests"] = depth
+        # readv() prefetches all the ranges it's given at once, buffering
+        # whatever arrives before we write it out; so hand it a window's worth
+        # at a time (or a single range, if larger).
+        window = (depth or DEFAULT_PREFETCH_DEPTH) * SFTPFile.MAX_REQUEST_SIZE
+
+        def batches(ranges):
+            batch, total = [], 0
+            for offset, length in ranges:
+                if batch and total + length > window:
+                    yield batch
+                    batch, total = [], 0
+                batch.append((offset, length))
+                total += length
+            if batch:
+                yield batch
+
+        def fetch(sftp, ranges):
+            with sftp.open(remote, "rb") as rfile, open(local, "r+b") as lfile:
+                for batch in batches(ranges):
+                    blocks = rfile.readv(batch, **kwargs)
+                    for (offset, length), data in zip(batch, blocks):
+                        if len(data) != length:
+                            raise IOError(
+                                "Short read of {!r} at offset {}: expected {} bytes, got {}".format(  # noqa
+                                    remote, offset, length, len(data)
+                                )
+                            )
+                        lfile.seek(offset)
+                        lfile.write(data)
+                        tracker.advance(length)
+
+        debug("Downloading {!r} to {!r} in chunks".format(remote, local))
+        fd = open(local, "wb")
+        try:
+            with fd:
+                _preallocate(fd, size)
+            self._in_parallel(fetch, size)
+        except BaseException:
+            # A preallocated, full size file would pass for a whole download.
+            try:
+                os.remove(local)
+            except OSError:
+                pass
+            raise
+        if preserve_mode:
+            os.chmod(local, stat.S_IMODE(attrs.st_mode))
+        return size
+
+    def _put_chunked(self, local, remote, preserve_mode, tracker):
+        local_stat = os.stat(local)
+        size = local_stat.st_size
+        tracker.start(size)
+        depth = self.connection.config.transfers.pipeline_depth
+        # Paramiko splits writes into requests of at most this size.
+        window = None
+        if depth is not None:
+            window = depth * SFTPFile.MAX_REQUEST_SIZE
+
+        def send(sftp, ranges):
+            with sftp.open(remote, "r+b") as rfile, open(local, "rb") as lfile:
+                # Don't wait for each write to be acknowledged...
+                rfile.set_pipelined(True)
+                unacked = 0
+                for offset, length in ranges:
+                    lfile.seek(offset)
+                    rfile.seek(offset)
+                    rfile.write(lfile.read(length))
+                    tracker.advance(length)
+                    unacked += length
+                    # ...but if asked to, bound how many are in flight, using
+                    # a cheap request whose reply (the server answering in
+                    # order) implies all earlier writes have landed.
+                    if window is not None and unacked >= window:
+                        rfile.stat()
+                        unacked = 0
+
+        debug("Uploading {!r} to {!r} in chunks".format(local, remote))
+        # Create (or truncate) the file up front, so workers can all open it
+        # without clobbering each other's writes.
+        with self.sftp.open(remote, "wb") as rfile:
+            self._in_parallel(send, size)
+            # Setting the mode on our still-open handle avoids another path
+            # lookup and, being queued behind the writes, costs no round trip
+            # beyond the one close() would wait for anyway.
+            if preserve_mode:
+                rfile.chmod(stat.S_IMODE(local_stat.st_mode))
+        return size
+
+    def _in_parallel(self, func, size):
+        """
+        Call ``func(sftp, ranges)`` concurrently to cover ``size`` bytes.
+
+        The file is split into ``transfers.chunk_size`` byte ranges, which are
+        dealt out round-robin to up to ``transfers.channels`` workers, each
+        with its own SFTP session (the first reusing our main one).
+        """
+        config = self.connection.config.transfers
+        chunk_size = config.chunk_size
+        ranges = [
+            (offset, min(chunk_size, size - offset))
+            for offset in range(0, size, chunk_size)
+        ]
+        if not ranges:
+            return
+        workers = max(1, min(config.channels, len(ranges)))
+        if workers == 1:
+            func(self.sftp, ranges)
+            return
+        with self._sessions(workers) as sessions:
+            _run_all(
+                workers,
+                [
+                    (func, sftp, ranges[i::workers])
+                    for i, sftp in enumerate(sessions)
+                ],
+            )
+
+    @contextmanager
+    def _sessions(self, count):
+        """
+        Yield a list of ``count`` SFTP sessions, the first being our main one.
+
+        The others are opened on the same SSH connection, and closed again
+        afterwards.
+        """
+        sessions = [self.sftp]
+        try:
+            for _ in range(count - 1):
+                sessions.append(self.connection.client.open_sftp())
+            yield sessions
+        finally:
+            for sftp in sessions[1:]:
+                sftp.close()
+
+    def put(
+        self,
+        local,
+        remote=None,
+        preserve_mode=True,
+        chunked=None,
+        compress=None,
+        resume=None,
+        callback=None,
+    ):
         """
         Upload a file from the local filesystem to the current connection.
 
@@ -226,9 +634,39 @@ class Transfer:
             Whether to ``chmod`` the remote file so it matches the local file's
             mode (default: ``True``).
 
+        :param bool chunked:
+            Whether to upload in parallel, pipelined byte ranges (see
+            :ref:`chunked-transfers`) instead of as a single sequential stream.
+            Only applies when ``local`` is a path, not a file-like object.
+            Default: the ``transfers.chunked`` :ref:`config setting
+            <default-values>`.
+
+        :param str compress:
+            Compress the file on the fly while uploading: ``"gzip"`` or
+            ``"zstd"`` (see :ref:`compressed-transfers`). Takes precedence over
+            ``chunked``. Default: the ``transfers.compress`` :ref:`config
+            setting <default-values>` (``None``, meaning no compression).
+
+        :param bool resume:
+            Whether to upload into a partial file (``remote`` plus
+            ``".part"``) which is renamed into place once complete, picking up
+            where any previous, interrupted attempt left off (see
+            :ref:`resumable-transfers`). Takes precedence over ``chunked``;
+            ignored when ``local`` is a file-like object or ``compress`` is
+            given. Default: the ``transfers.resume`` :ref:`config setting
+            <default-values>`.
+
+        :param callback:
+            Callable to report progress to, given a `.Progress` object at most
+            every ``transfers.progress_interval`` seconds while the upload
+            runs, and once more when it completes (see
+            :ref:`transfer-progress`). Default: ``None``.
+
         :returns: A `.Result` object.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            Added ``chunked``, ``compress``, ``resume`` and ``callback``.
         """
         if not local:
             raise ValueError("Local path must not be empty!")
@@ -294,18 +732,56 @@ class Transfer:
         # existing files. Use logging for that obviously.
         #
         # If local appears to be a file-like object, use sftp.putfo, not put
-        if is_file_like:
+        if chunked is None:
+            chunked = self.connection.config.transfers.chunked
+        if compress is None:
+            compress = self.connection.config.transfers.compress
+        if resume is None:
+            resume = self.connection.config.transfers.resume
+        start = time.monotonic()
+        resumed_from = 0
+        tracker = self._tracker(callback, local, remote)
+        if compress:
+            mode = None
+            if not is_file_like:
+                local_stat = os.stat(local)
+                tracker.start(local_stat.st_size)
+                if preserve_mode:
+                    mode = stat.S_IMODE(local_stat.st_mode)
+            if is_file_like:
+                pointer = local.tell()
+                local.seek(0)
+            try:
+                size = self._put_compressed(
+                    local, remote, compress, mode, tracker
+                )
+            finally:
+                if is_file_like:
+                    local.seek(pointer)
+        elif is_file_like:
             msg = "Uploading file-like object {!r} to {!r}"
             debug(msg.format(local, remote))
             pointer = local.tell()
             try:
                 local.seek(0)
-                self.sftp.putfo(fl=local, remotepath=remote)
+                attrs = self.sftp.putfo(
+                    fl=local, remotepath=remote, **tracker.kwargs
+                )
             finally:
                 local.seek(pointer)
+            size = attrs.st_size
+        elif resume:
+            size, resumed_from = self._put_resumable(
+                local, remote, preserve_mode, tracker
+            )
+        elif chunked:
+            size = self._put_chunked(local, remote, preserve_mode, tracker)
         else:
             debug("Uploading {!r} to {!r}".format(local, remote))
-            self.sftp.put(localpath=local, remotepath=remote)
+            attrs = self.sftp.put(
+                localpath=local, remotepath=remote, **tracker.kwargs
+            )
+            size = attrs.st_size
             # Set mode to same as local end
             # TODO: Push this down into SFTPClient sometime (requires backwards
             # incompat release.)
@@ -313,6 +789,7 @@ class Transfer:
                 local_mode = os.stat(local).st_mode
                 mode = stat.S_IMODE(local_mode)
                 self.sftp.chmod(remote, mode)
+        tracker.finish()
         # Return something useful
         return Result(
             orig_remote=orig_remote,
@@ -320,8 +797,838 @@ class Transfer:
             orig_local=orig_local,
             local=local,
             connection=self.connection,
+            size=size,
+            elapsed=time.monotonic() - start,
+            resumed_from=resumed_from,
         )
 
+    def copy(
+        self,
+        remote,
+        dst_connection,
+        dst_remote=None,
+        preserve_mode=True,
+        direct=False,
+        ssh_command="ssh -o BatchMode=yes",
+        callback=None,
+    ):
+        """
+        Copy a file from the wrapped connection's host to another host.
+
+        Bytes are pumped straight from one SFTP session to the other, via a
+        bounded in-memory buffer (a reading thread keeps up to
+        ``transfers.copy_buffer`` chunks of ``transfers.chunk_size`` bytes
+        ready for the writing one), so nothing touches local disk and memory
+        use doesn't grow with file size.
+
+        Alternatively, with ``direct=True``, the source host is first asked to
+        push the file to the destination itself, over its own SSH connection,
+        so the data never passes through the local machine at all. Should
+        that fail (e.g. the hosts can't reach or authenticate to each other)
+        the copy falls back to pumping.
+
+        :param str remote:
+            Path of the file to copy, on this connection's host; may be
+            relative to its remote working directory.
+
+        :param dst_connection:
+            `.Connection` for the host to copy to.
+
+        :param str dst_remote:
+            Destination path on ``dst_connection``'s host. As with `put`,
+            relative paths are relative to its remote working directory,
+            existing directories have the source's basename appended, and the
+            default (``None``) means that basename, in that directory.
+
+        :param bool preserve_mode:
+            Whether to ``chmod`` the copy so it matches the source file's mode
+            (default: ``True``).
+
+        :param bool direct:
+            Whether to try having the source host push the file itself (see
+            above). Default: ``False``.
+
+        :param str ssh_command:
+            With ``direct=True``, the command the source host runs to reach the
+            destination; the target (``-p <port> <user>@<host>``) and the
+            remote command are appended. Its credentials must be available
+            non-interactively on the source host (e.g. via
+            ``forward_agent=True``). Default: ``"ssh -o BatchMode=yes"``.
+
+        :param callback:
+            Progress callback, as with `get` (only invoked while pumping).
+
+        :returns: A `.CopyResult` object.
+
+        .. versionadded:: 3.3
+        """
+        if not remote:
+            raise ValueError("Remote path must not be empty!")
+        orig_remote = remote
+        remote = posixpath.join(
+            self.sftp.getcwd() or self.sftp.normalize("."), remote
+        )
+        destination = Transfer(dst_connection)
+        orig_dst_remote = dst_remote
+        basename = posixpath.basename(remote)
+        if not dst_remote:
+            dst_remote = basename
+        elif destination.is_remote_dir(dst_remote):
+            dst_remote = posixpath.join(dst_remote, basename)
+        dst_sftp = destination.sftp
+        dst_remote = posixpath.join(
+            dst_sftp.getcwd() or dst_sftp.normalize("."), dst_remote
+        )
+        start = time.monotonic()
+        attrs = self.sftp.stat(remote)
+        mode = stat.S_IMODE(attrs.st_mode) if preserve_mode else None
+        pushed = direct and self._push(
+            remote,
+            dst_connection,
+            dst_remote,
+            attrs.st_size,
+            mode,
+            ssh_command,
+        )
+        if not pushed:
+            tracker = self._tracker(callback, None, remote)
+            tracker.start(attrs.st_size)
+            self._pump(
+                remote, dst_sftp, dst_remote, attrs.st_size, mode, tracker
+            )
+            tracker.finish()
+        return CopyResult(
+            orig_remote=orig_remote,
+            remote=remote,
+            connection=self.connection,
+            orig_dst_remote=orig_dst_remote,
+            dst_remote=dst_remote,
+            dst_connection=dst_connection,
+            direct=pushed,
+            size=attrs.st_size,
+            elapsed=time.monotonic() - start,
+        )
+
+    def _push(self, remote, dst_connection, dst_remote, size, mode, command):
+        # Have our host send remote straight to dst_connection's host.
+        # Returns whether that worked.
+        target = shlex.quote(dst_remote)
+        write = "cat > {}".format(target)
+        if mode is not None:
+            write += " && chmod {:o} {}".format(mode, target)
+        command = "{} -p {} {} {} < {}".format(
+            command,
+            dst_connection.port,
+            shlex.quote(
+                "{}@{}".format(dst_connection.user, dst_connection.host)
+            ),
+            shlex.quote(write),
+            shlex.quote(remote),
+        )
+        debug("Pushing {!r} to {!r} directly".format(remote, dst_connection))
+        result = self.connection.run(
+            command, hide=True, warn=True, in_stream=False
+        )
+        if result.failed:
+            msg = "Direct push to {!r} failed ({}); falling back to pumping"
+            debug(msg.format(dst_connection.host, result.stderr.strip()))
+            return False
+        # Belt and suspenders: a truncated copy means trying again.
+        try:
+            return dst_connection.sftp().stat(dst_remote).st_size == size
+        except IOError:
+            return False
+
+    def _pump(self, remote, dst_sftp, dst_remote, size, mode, tracker):
+        """
+        Stream ``remote`` into ``dst_remote`` on ``dst_sftp``.
+
+        A reader thread fetches chunks (each pipelined via ``readv``) into a
+        bounded queue, which we drain into pipelined writes. When copying
+        within one connection, the reader gets an SFTP session of its own, as
+        Paramiko's `.SFTPClient` can't safely be used by two threads at once.
+        """
+        config = self.connection.config.transfers
+        chunk_size = config.chunk_size
+        chunks = Queue(maxsize=max(1, config.copy_buffer))
+        stop = Event()
+        extra = None
+        src_sftp = self.sftp
+        if dst_sftp is src_sftp:
+            extra = src_sftp = self.connection.client.open_sftp()
+
+        def read():
+            try:
+                with src_sftp.open(remote, "rb") as rfile:
+                    for offset in range(0, size, chunk_size):
+                        length = min(chunk_size, size - offset)
+                        data = next(rfile.readv([(offset, length)]))
+                        if stop.is_set():
+                            return
+                        chunks.put(data)
+                chunks.put(None)
+            except Exception as e:
+                chunks.put(e)
+
+        debug("Copying {!r} to {!r}".format(remote, dst_remote))
+        reader = Thread(target=read, daemon=True)
+        reader.start()
+        try:
+            with dst_sftp.open(dst_remote, "wb") as wfile:
+                wfile.set_pipelined(True)
+                for data in iter(chunks.get, None):
+                    if isinstance(data, Exception):
+                        raise data
+                    wfile.write(data)
+                    tracker.advance(len(data))
+                if mode is not None:
+                    wfile.chmod(mode)
+        finally:
+            # Unblock (and then reap) the reader, should we have bailed early.
+            stop.set()
+            while reader.is_alive():
+                try:
+                    chunks.get(timeout=0.1)
+                except Empty:
+                    pass
+            if extra is not None:
+                extra.close()
+
+    def put_dir(self, local, remote=None, preserve_mode=True):
+        """
+        Upload a local directory tree to the current connection.
+
+        The contents of ``local`` are mirrored into ``remote``: missing
+        remote directories are created (each exactly once, parents first,
+        with every level's directories created concurrently) and then files
+        are uploaded concurrently, each thread using its own SFTP session
+        (up to ``transfers.file_workers`` threads and ``transfers.channels``
+        sessions). Existing remote files are overwritten; remote files absent
+        locally are left alone.
+
+        As with `os.walk`, symbolic links to directories are not followed;
+        symbolic links to files are uploaded as regular files.
+
+        :param str local: Local directory to upload.
+
+        :param str remote:
+            Remote directory to upload into; it is created if necessary.
+            Relative paths are relative to the remote working directory.
+            Default: the basename of ``local``.
+
+        :param bool preserve_mode:
+            Whether to give remote files and directories the same mode as
+            their local counterparts (default: ``True``). Modes are sent along
+            with the ``mkdir`` requests and set via the still-open remote file
+            handles, so this costs no extra round trips.
+
+        :returns: A `.DirectoryResult` holding one `.Result` per file.
+
+        :raises:
+            `ValueError` if ``local`` is not a directory. If any file fails to
+            upload, the remaining files are still attempted and the first
+            error is then raised.
+
+        .. versionadded:: 3.3
+        """
+        if not local or not os.path.isdir(local):
+            raise ValueError(
+                "Local path must be a directory: {!r}".format(local)
+            )
+        orig_local, orig_remote = local, remote
+        local = os.path.abspath(local)
+        if not remote:
+            remote = os.path.basename(local.rstrip(os.sep))
+        remote = posixpath.join(
+            self.sftp.getcwd() or self.sftp.normalize("."), remote
+        )
+        start = time.monotonic()
+        dirs, files = _walk_local(local)
+
+        def mkdir(sftp, path, relative):
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+            target = posixpath.join(remote, *relative)
+            self._mkdir(sftp, target, mode, preserve_mode)
+
+        def send(sftp, path, relative):
+            target = posixpath.join(remote, *relative)
+            return self._put_file(sftp, path, target, preserve_mode)
+
+        with self._file_pool(len(files)) as run:
+            # Parents must exist before their children, so go level by level.
+            run(mkdir, dirs, grouped=True)
+            results = run(send, files)
+        return DirectoryResult(
+            results,
+            local=local,
+            orig_local=orig_local,
+            remote=remote,
+            orig_remote=orig_remote,
+            connection=self.connection,
+            elapsed=time.monotonic() - start,
+        )
+
+    def sync(
+        self,
+        local,
+        remote=None,
+        dry_run=False,
+        checksum=True,
+        preserve_mode=True,
+    ):
+        """
+        Bring a remote directory tree up to date with a local one, rsync-style.
+
+        Only what changed is sent:
+
+        - Files missing remotely are uploaded whole.
+        - Files whose size and modification time (to the second) match are
+          skipped without further ado.
+        - For the rest, per-block checksums (of ``transfers.sync_block_size``
+          bytes each) are computed *remotely* -- via `.Connection.run`, many
+          files per command -- and compared against local ones, so that only
+          differing blocks are written. Files found to be identical merely
+          have their modification time updated, so later syncs skip them
+          outright.
+
+        Every file written or touched gets its local modification time (and,
+        if ``preserve_mode`` is true, its mode) applied remotely. Remote files
+        absent locally are left alone.
+
+        .. note::
+            Remote checksumming needs a POSIX shell with ``dd`` and
+            ``md5sum`` on the remote end. If that fails, affected files are
+            simply sent whole.
+
+        :param str local: Local directory to sync from.
+
+        :param str remote:
+            Remote directory to sync into; it is created if necessary.
+            Relative paths are relative to the remote working directory.
+            Default: the basename of ``local``.
+
+        :param bool dry_run:
+            If ``True``, work out (and report) what would be sent, but don't
+            change anything remotely. Default: ``False``.
+
+        :param bool checksum:
+            Whether to compare block checksums of files whose size or
+            modification time differ; if ``False``, such files are sent whole.
+            Default: ``True``.
+
+        :param bool preserve_mode:
+            Whether to give remote files and directories the same mode as
+            their local counterparts (default: ``True``).
+
+        :returns: A `.SyncResult`.
+
+        .. versionadded:: 3.3
+        """
+        if not local or not os.path.isdir(local):
+            raise ValueError(
+                "Local path must be a directory: {!r}".format(local)
+            )
+        orig_local, orig_remote = local, remote
+        local = os.path.abspath(local)
+        if not remote:
+            remote = os.path.basename(local.rstrip(os.sep))
+        remote = posixpath.join(
+            self.sftp.getcwd() or self.sftp.normalize("."), remote
+        )
+        start = time.monotonic()
+        block_size = self.connection.config.transfers.sync_block_size
+        dirs, files = _walk_local(local)
+        try:
+            remote_dirs, remote_files = self._walk_remote(remote)
+            existing = {()} | {x[1] for x in remote_dirs}
+        except IOError:
+            remote_files, existing = [], set()
+        remote_attrs = {x[1]: x[2] for x in remote_files}
+        created, updated, unchanged = [], [], []
+        # (local path, remote path, local stat, remote size, blocks to send
+        # or None for the whole file)
+        jobs, candidates = [], []
+        total_size = 0
+        for path, relative in files:
+            local_stat = os.stat(path)
+            total_size += local_stat.st_size
+            target = posixpath.join(remote, *relative)
+            attrs = remote_attrs.get(relative)
+            if attrs is None:
+                created.append(target)
+                jobs.append((path, target, local_stat, 0, None))
+            elif attrs.st_size == local_stat.st_size and attrs.st_mtime == int(
+                local_stat.st_mtime
+            ):
+                unchanged.append(target)
+            elif checksum:
+                candidates.append((path, target, local_stat, attrs.st_size))
+            else:
+                updated.append(target)
+                jobs.append((path, target, local_stat, attrs.st_size, None))
+        remote_sums = self._remote_checksums(
+            [(x[1], x[3]) for x in candidates], block_size
+        )
+        for path, target, local_stat, remote_size in candidates:
+            theirs = remote_sums.get(target)
+            blocks = None
+            if theirs is not None:
+                ours = _block_checksums(path, block_size)
+                blocks = [
+                    i
+                    for i, digest in enumerate(ours)
+                    if i >= len(theirs) or theirs[i] != digest
+                ]
+            if blocks or remote_size != local_stat.st_size or blocks is None:
+                updated.append(target)
+            else:
+                unchanged.append(target)
+            jobs.append((path, target, local_stat, remote_size, blocks))
+        if dry_run:
+            results = [
+                Result(
+                    orig_remote=target,
+                    remote=target,
+                    orig_local=path,
+                    local=path,
+                    connection=self.connection,
+                    size=_sync_size(local_stat.st_size, blocks, block_size),
+                )
+                for path, target, local_stat, _, blocks in jobs
+            ]
+        else:
+            missing = [
+                [x for x in level if x[1] not in existing] for level in dirs
+            ]
+
+            def mkdir(sftp, path, relative):
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+                target = posixpath.join(remote, *relative)
+                self._mkdir(sftp, target, mode, preserve_mode)
+
+            def send(sftp, *job):
+                return self._sync_file(sftp, *job, block_size, preserve_mode)
+
+            with self._file_pool(len(jobs)) as run:
+                run(mkdir, missing, grouped=True)
+                results = run(send, jobs)
+        return SyncResult(
+            results,
+            local=local,
+            orig_local=orig_local,
+            remote=remote,
+            orig_remote=orig_remote,
+            connection=self.connection,
+            elapsed=time.monotonic() - start,
+            created=created,
+            updated=updated,
+            unchanged=unchanged,
+            total_size=total_size,
+            dry_run=dry_run,
+        )
+
+    def _remote_checksums(self, files, block_size):
+        """
+        Checksum ``(path, size)`` remote files block by block, remotely.
+
+        :returns:
+            A dict mapping paths to lists of hex digests, one per block. Files
+            whose checksums couldn't be obtained are omitted.
+        """
+        sums = {}
+        for offset in range(0, len(files), CHECKSUM_BATCH_SIZE):
+            batch = files[offset : offset + CHECKSUM_BATCH_SIZE]  # noqa
+            script = "\n".join(
+                _checksum_script(index, path, size, block_size)
+                for index, (path, size) in enumerate(batch)
+            )
+            result = self.connection.run(
+                script, hide=True, warn=True, in_stream=False
+            )
+            found = {}
+            for line in result.stdout.splitlines():
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].isdigit():
+                    found.setdefault(int(parts[0]), []).append(parts[1])
+            for index, (path, size) in enumerate(batch):
+                digests = found.get(index, [])
+                # Anything short of a full set is untrustworthy.
+                if len(digests) == _block_count(size, block_size):
+                    sums[path] = digests
+        return sums
+
+    def _sync_file(
+        self,
+        sftp,
+        local,
+        remote,
+        local_stat,
+        remote_size,
+        blocks,
+        block_size,
+        preserve_mode,
+    ):
+        start = time.monotonic()
+        sent = 0
+        whole = blocks is None
+        with sftp.open(remote, "wb" if whole else "r+b") as rfile, open(
+            local, "rb"
+        ) as lfile:
+            rfile.set_pipelined(True)
+            if whole:
+                debug("Uploading {!r} to {!r}".format(local, remote))
+                for data in iter(lambda: lfile.read(block_size), b""):
+                    rfile.write(data)
+                    sent += len(data)
+            else:
+                msg = "Updating {} block(s) of {!r} from {!r}"
+                debug(msg.format(len(blocks), remote, local))
+                for index in blocks:
+                    lfile.seek(index * block_size)
+                    rfile.seek(index * block_size)
+                    data = lfile.read(block_size)
+                    rfile.write(data)
+                    sent += len(data)
+                if remote_size > local_stat.st_size:
+                    rfile.truncate(local_stat.st_size)
+            if preserve_mode:
+                rfile.chmod(stat.S_IMODE(local_stat.st_mode))
+            rfile.utime((local_stat.st_atime, local_stat.st_mtime))
+        return Result(
+            orig_remote=remote,
+            remote=remote,
+            orig_local=local,
+            local=local,
+            connection=self.connection,
+            size=sent,
+            elapsed=time.monotonic() - start,
+        )
+
+    @contextmanager
+    def _file_pool(self, count):
+        """
+        Yield a ``run(func, items)`` callable for transferring ``count`` files.
+
+        ``run`` calls ``func(sftp, *item)`` for every item, using one thread
+        per SFTP session (up to ``transfers.file_workers`` threads and
+        ``transfers.channels`` sessions), and returns the results in
+        order. With ``grouped=True``, ``items`` is a list of lists, each
+        group being run to completion before the next starts (e.g. parent
+        directories before their children).
+
+        Each call checks a session out for its whole duration, so no two
+        threads ever use one at once: Paramiko's `.SFTPClient` doesn't lock
+        around its requests, and threads sharing one would read each other's
+        responses.
+        """
+        config = self.connection.config.transfers
+        workers = max(1, config.file_workers)
+        channels = max(1, min(config.channels, workers, count or 1))
+        with self._sessions(channels) as sessions:
+            idle = Queue()
+            for sftp in sessions:
+                idle.put(sftp)
+
+            def checkout(func, *args):
+                sftp = idle.get()
+                try:
+                    return func(sftp, *args)
+                finally:
+                    idle.put(sftp)
+
+            def run(func, items, grouped=False):
+                results = []
+                for group in items if grouped else [items]:
+                    results.extend(
+                        _run_all(
+                            # (More threads than sessions would only queue.)
+                            channels,
+                            [(checkout, func) + tuple(item) for item in group],
+                        )
+                    )
+                return results
+
+            yield run
+
+    def _walk_remote(self, remote):
+        """
+        List the remote tree under ``remote``, one directory at a time.
+
+        :returns:
+            A ``(dirs, files)`` tuple of lists of ``(path, relative, attrs)``,
+            where ``relative`` is a tuple of path components beneath
+            ``remote``. Symlinks to directories are skipped; symlinks to files
+            are reported as the files they point to.
+        """
+        dirs, files = [], []
+        pending = [(remote, ())]
+        while pending:
+            source, relative = pending.pop(0)
+            for attrs in sorted(
+                self.sftp.listdir_attr(source), key=lambda x: x.filename
+            ):
+                path = posixpath.join(source, attrs.filename)
+                entry = relative + (attrs.filename,)
+                if stat.S_ISLNK(attrs.st_mode):
+                    attrs = self.sftp.stat(path)
+                    if stat.S_ISDIR(attrs.st_mode):
+                        continue
+                if stat.S_ISDIR(attrs.st_mode):
+                    pending.append((path, entry))
+                    dirs.append((path, entry, attrs))
+                elif stat.S_ISREG(attrs.st_mode):
+                    files.append((path, entry, attrs))
+        return dirs, files
+
+    def _mkdir(self, sftp, path, mode, preserve_mode):
+        try:
+            if preserve_mode:
+                sftp.mkdir(path, mode)
+            else:
+                sftp.mkdir(path)
+            debug("Created remote directory {!r}".format(path))
+        except IOError:
+            # Most likely it already exists; only complain if it's not a dir.
+            attrs = sftp.stat(path)
+            if not stat.S_ISDIR(attrs.st_mode):
+                raise
+            if preserve_mode and stat.S_IMODE(attrs.st_mode) != mode:
+                sftp.chmod(path, mode)
+
+    def _put_file(self, sftp, local, remote, preserve_mode):
+        start = time.monotonic()
+        local_stat = os.stat(local)
+        chunk_size = self.connection.config.transfers.chunk_size
+        debug("Uploading {!r} to {!r}".format(local, remote))
+        with sftp.open(remote, "wb") as rfile, open(local, "rb") as lfile:
+            rfile.set_pipelined(True)
+            for data in iter(lambda: lfile.read(chunk_size), b""):
+                rfile.write(data)
+            if preserve_mode:
+                rfile.chmod(stat.S_IMODE(local_stat.st_mode))
+        return Result(
+            orig_remote=remote,
+            remote=remote,
+            orig_local=local,
+            local=local,
+            connection=self.connection,
+            size=local_stat.st_size,
+            elapsed=time.monotonic() - start,
+        )
+
+    def get_dir(self, remote, local=None, preserve_mode=True):
+        """
+        Download a remote directory tree to the local filesystem.
+
+        The contents of ``remote`` are mirrored into ``local``. The remote tree
+        is listed one directory at a time (each listing also yielding every
+        entry's size and mode, so no per-file ``stat`` is needed); files are
+        then downloaded concurrently, each thread using its own SFTP session
+        (up to ``transfers.file_workers`` threads and ``transfers.channels``
+        sessions).
+
+        Symbolic links to directories are not followed; symbolic links to
+        files are downloaded as regular files.
+
+        :param str remote:
+            Remote directory to download. Relative paths are relative to the
+            remote working directory.
+
+        :param str local:
+            Local directory to download into; it is created if necessary. It
+            is interpolated as with `get`'s ``local`` argument (so e.g.
+            ``"{host}/"`` works). Default: the basename of ``remote``.
+
+        :param bool preserve_mode:
+            Whether to `os.chmod` local files and directories so they match
+            their remote counterparts (default: ``True``).
+
+        :returns: A `.DirectoryResult` holding one `.Result` per file.
+
+        :raises:
+            If any file fails to download, the remaining files are still
+            attempted and the first error is then raised.
+
+        .. versionadded:: 3.3
+        """
+        if not remote:
+            raise ValueError("Remote path must not be empty!")
+        orig_remote, orig_local = remote, local
+        remote = posixpath.join(
+            self.sftp.getcwd() or self.sftp.normalize("."), remote
+        )
+        basename = posixpath.basename(remote.rstrip("/"))
+        local = (local or basename).format(
+            host=self.connection.host,
+            user=self.connection.user,
+            port=self.connection.port,
+            dirname=posixpath.dirname(remote.rstrip("/")),
+            basename=basename,
+        )
+        local = os.path.abspath(local)
+        start = time.monotonic()
+        dirs, files = self._walk_remote(remote)
+        os.makedirs(local, exist_ok=True)
+        for _, relative, _ in dirs:
+            os.makedirs(os.path.join(local, *relative), exist_ok=True)
+
+        def fetch(sftp, path, relative, attrs):
+            dest = os.path.join(local, *relative)
+            return self._get_file(sftp, path, dest, attrs, preserve_mode)
+
+        with self._file_pool(len(files)) as run:
+            results = run(fetch, files)
+        # Directory modes last, lest a read-only one block its own contents.
+        if preserve_mode:
+            for _, relative, attrs in reversed(dirs):
+                dest = os.path.join(local, *relative)
+                os.chmod(dest, stat.S_IMODE(attrs.st_mode))
+        return DirectoryResult(
+            results,
+            local=local,
+            orig_local=orig_local,
+            remote=remote,
+            orig_remote=orig_remote,
+            connection=self.connection,
+            elapsed=time.monotonic() - start,
+        )
+
+    def _get_file(self, sftp, remote, local, attrs, preserve_mode):
+        start = time.monotonic()
+        chunk_size = self.connection.config.transfers.chunk_size
+        debug("Downloading {!r} to {!r}".format(remote, local))
+        with sftp.open(remote, "rb") as rfile, open(local, "wb") as lfile:
+            rfile.prefetch(attrs.st_size)
+            for data in iter(lambda: rfile.read(chunk_size), b""):
+                lfile.write(data)
+        if preserve_mode:
+            os.chmod(local, stat.S_IMODE(attrs.st_mode))
+        return Result(
+            orig_remote=remote,
+            remote=remote,
+            orig_local=local,
+            local=local,
+            connection=self.connection,
+            size=attrs.st_size,
+            elapsed=time.monotonic() - start,
+        )
+
+
+def _walk_local(local):
+    # Walk a local tree once, returning its directories grouped by depth
+    # (shallowest first, the root included) and its files, as lists of
+    # (path, relative) where relative is a tuple of components below local.
+    levels, files = {}, []
+    for root, dirnames, filenames in os.walk(local):
+        relative = os.path.relpath(root, local)
+        parts = () if relative == os.curdir else tuple(relative.split(os.sep))
+        levels.setdefault(len(parts), []).append((root, parts))
+        files.extend(
+            (os.path.join(root, x), parts + (x,)) for x in sorted(filenames)
+        )
+        dirnames.sort()
+    return [levels[x] for x in sorted(levels)], files
+
+
+def _compression_commands(compress):
+    try:
+        return COMPRESSION_COMMANDS[compress]
+    except KeyError:
+        raise ValueError(
+            "Unknown compression {!r}; expected one of: {}".format(
+                compress, ", ".join(sorted(COMPRESSION_COMMANDS))
+            )
+        )
+
+
+def _compressor(compress, decompress=False):
+    # Streaming (de)compression object for the given format, with zlib-style
+    # compress()/decompress() and flush() methods.
+    if compress == "gzip":
+        # wbits of 16 + MAX_WBITS selects the gzip container format.
+        wbits = 16 + zlib.MAX_WBITS
+        if decompress:
+            return zlib.decompressobj(wbits)
+        return zlib.compressobj(wbits=wbits)
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "zstd compression requires the 'zstandard' package; try 'pip install fabric[zstd]'"  # noqa
+        )
+    if decompress:
+        return zstandard.ZstdDecompressor().decompressobj()
+    return zstandard.ZstdCompressor().compressobj()
+
+
+def _block_count(size, block_size):
+    return -(-size // block_size)
+
+
+def _block_checksums(path, block_size):
+    with open(path, "rb") as fd:
+        return [
+            hashlib.md5(data).hexdigest()
+            for data in iter(lambda: fd.read(block_size), b"")
+        ]
+
+
+def _checksum_script(index, path, size, block_size):
+    # Emit "<index> <md5> -" for each block of a remote file, in order.
+    return " ".join(
+        [
+            "i=0; while [ $i -lt {} ]; do".format(
+                _block_count(size, block_size)
+            ),
+            "printf '{} %s\\n' \"$(dd if={} bs={} skip=$i count=1".format(
+                index, shlex.quote(path), block_size
+            ),
+            '2>/dev/null | md5sum)"; i=$((i+1)); done',
+        ]
+    )
+
+
+def _prefix_checksum(path, size, chunk_size=1048576):
+    # MD5 of a local file's first size bytes.
+    digest = hashlib.md5()
+    with open(path, "rb") as fd:
+        while size > 0:
+            data = fd.read(min(chunk_size, size))
+            if not data:
+                break
+            digest.update(data)
+            size -= len(data)
+    return digest.hexdigest()
+
+
+def _sync_size(size, blocks, block_size):
+    # Bytes sync would send for a file of this size: all of it, or just the
+    # given blocks.
+    if blocks is None:
+        return size
+    return sum(min(block_size, size - i * block_size) for i in blocks)
+
+
+def _run_all(workers, calls):
+    # Run each (func, *args) on a pool of workers, raising the first failure
+    # (if any) once all have finished.
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(*call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def _preallocate(fd, size):
+    # Reserve the whole file up front, so ranges can be written at their
+    # offsets in any order (and, where supported, get contiguous blocks).
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd.fileno(), 0, size)
+            return
+        except OSError:
+            # E.g. filesystems which don't support it
+            pass
+    fd.truncate(size)
+
 
 class Result:
     """
@@ -337,11 +1644,23 @@ class Result:
         or an error from within Paramiko.
 
     .. versionadded:: 2.0
+    .. versionchanged:: 3.3
+        Added `size`, `elapsed`, `throughput` and `resumed_from`.
     """
 
     # TODO: how does this differ from put vs get? field stating which? (feels
     # meh) distinct classes differing, for now, solely by name? (also meh)
-    def __init__(self, local, orig_local, remote, orig_remote, connection):
+    def __init__(
+        self,
+        local,
+        orig_local,
+        remote,
+        orig_remote,
+        connection,
+        size=None,
+        elapsed=None,
+        resumed_from=0,
+    ):
         #: The local path the file was saved as, or the object it was saved
         #: into if a file-like object was given instead.
         #:
@@ -359,6 +1678,281 @@ class Result:
         self.orig_remote = orig_remote
         #: The `.Connection` object this result was obtained from.
         self.connection = connection
+        #: Number of bytes transferred (``None`` if unknown).
+        self.size = size
+        #: Wall-clock seconds the transfer itself took (``None`` if unknown).
+        self.elapsed = elapsed
+        #: Offset a resumed transfer picked up from, i.e. bytes already
+        #: present from an earlier attempt (and not counted in `size`).
+        self.resumed_from = resumed_from
+
+    @property
+    def throughput(self):
+        """
+        Achieved transfer rate, in bytes per second (``None`` if unknown).
+
+        .. versionadded:: 3.3
+        """
+        if self.size is None or not self.elapsed:
+            return None
+        return self.size / self.elapsed
 
     # TODO: ensure str/repr makes it easily differentiable from run() or
     # local() result objects (and vice versa).
+
+
+class Progress:
+    """
+    A snapshot of an in-flight transfer, as handed to progress callbacks.
+
+    See the ``callback`` argument of `.Transfer.get` and `.Transfer.put`, and
+    :ref:`transfer-progress`.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(
+        self,
+        connection,
+        local,
+        remote,
+        transferred,
+        total,
+        elapsed,
+        rate,
+        done=False,
+    ):
+        #: The `.Connection` the transfer is happening over.
+        self.connection = connection
+        #: The local path (or file-like object) involved.
+        self.local = local
+        #: The (absolute) remote path involved.
+        self.remote = remote
+        #: Bytes transferred so far. For resumed transfers, this includes the
+        #: bytes present beforehand.
+        self.transferred = transferred
+        #: Total size of the file, in bytes (``None`` if unknown, e.g. for
+        #: compressed downloads).
+        self.total = total
+        #: Seconds since the transfer started.
+        self.elapsed = elapsed
+        #: Instantaneous transfer rate, in bytes per second, over the time
+        #: since the previous report.
+        self.rate = rate
+        #: Whether this is the final report for a completed transfer.
+        self.done = done
+
+    def __repr__(self):
+        return "<Progress {!r}: {}/{} bytes, {:.0f} B/s{}>".format(
+            self.remote,
+            self.transferred,
+            "?" if self.total is None else self.total,
+            self.rate,
+            " (done)" if self.done else "",
+        )
+
+    @property
+    def fraction(self):
+        """
+        Portion of the file transferred so far, from 0 to 1 (``None`` if the
+        total is unknown).
+        """
+        if not self.total:
+            return None
+        return self.transferred / self.total
+
+
+class _Tracker:
+    """
+    Accumulate transfer progress, reporting it to a callback (if any) at most
+    every ``interval`` seconds.
+
+    Thread-safe, so that chunked transfer workers may share one.
+    """
+
+    def __init__(self, callback, interval, connection, local, remote):
+        self.callback = callback
+        self.interval = interval or 0
+        self.connection = connection
+        self.local = local
+        self.remote = remote
+        self.total = None
+        self.transferred = 0
+        self.started = self.reported = time.monotonic()
+        self.last = 0
+        self.lock = Lock()
+
+    @property
+    def kwargs(self):
+        # For Paramiko's own get/put methods, which take cumulative callbacks.
+        if self.callback is None:
+            return {}
+        return {"callback": self._paramiko_callback}
+
+    def start(self, total, offset=0):
+        self.total = total
+        self.transferred = self.last = offset
+
+    def advance(self, size):
+        if self.callback is None:
+            return
+        with self.lock:
+            self.transferred += size
+            now = time.monotonic()
+            if now - self.reported >= self.interval:
+                self._report(now)
+
+    def finish(self):
+        if self.callback is None:
+            return
+        with self.lock:
+            if self.total is None:
+                self.total = self.transferred
+            self._report(time.monotonic(), done=True)
+
+    def _paramiko_callback(self, transferred, total):
+        # putfo() reports a total of 0 unless told the size up front.
+        self.total = total or None
+        self.advance(transferred - self.transferred)
+
+    def _report(self, now, done=False):
+        window = now - self.reported
+        rate = (self.transferred - self.last) / window if window else 0.0
+        self.reported, self.last = now, self.transferred
+        self.callback(
+            Progress(
+                connection=self.connection,
+                local=self.local,
+                remote=self.remote,
+                transferred=self.transferred,
+                total=self.total,
+                elapsed=now - self.started,
+                rate=rate,
+                done=done,
+            )
+        )
+
+
+class CopyResult(Result):
+    """
+    The result of `.Transfer.copy`.
+
+    A `Result` whose ``remote``, ``orig_remote`` and ``connection`` describe
+    the source (``local`` and ``orig_local`` are always ``None``) and whose
+    ``dst_*`` attributes describe the destination.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(
+        self,
+        dst_remote,
+        orig_dst_remote,
+        dst_connection,
+        direct=False,
+        local=None,
+        orig_local=None,
+        **kwargs
+    ):
+        super().__init__(local=local, orig_local=orig_local, **kwargs)
+        #: The destination path, massaged to be absolute.
+        self.dst_remote = dst_remote
+        #: The original value given as the ``dst_remote`` argument.
+        self.orig_dst_remote = orig_dst_remote
+        #: The destination `.Connection`.
+        self.dst_connection = dst_connection
+        #: Whether the source host pushed the file to the destination itself
+        #: (as opposed to it being pumped through the local machine).
+        self.direct = direct
+
+
+class DirectoryResult(list):
+    """
+    The result of a directory transfer: a list of per-file `Result` objects.
+
+    Also records the directory-level paths involved and totals across every
+    file.
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(
+        self,
+        results=(),
+        local=None,
+        orig_local=None,
+        remote=None,
+        orig_remote=None,
+        connection=None,
+        elapsed=None,
+    ):
+        super().__init__(results)
+        #: The local directory, massaged to be absolute.
+        self.local = local
+        #: The original value given as the ``local`` argument.
+        self.orig_local = orig_local
+        #: The remote directory, massaged to be absolute.
+        self.remote = remote
+        #: The original value given as the ``remote`` argument.
+        self.orig_remote = orig_remote
+        #: The `.Connection` object this result was obtained from.
+        self.connection = connection
+        #: Wall-clock seconds the whole transfer took (``None`` if unknown).
+        self.elapsed = elapsed
+
+    @property
+    def size(self):
+        """
+        Total number of bytes transferred, across all files.
+        """
+        return sum(x.size or 0 for x in self)
+
+    @property
+    def throughput(self):
+        """
+        Overall transfer rate, in bytes per second (``None`` if unknown).
+        """
+        if not self.elapsed:
+            return None
+        return self.size / self.elapsed
+
+
+class SyncResult(DirectoryResult):
+    """
+    The result of `.Transfer.sync`.
+
+    A `DirectoryResult` whose per-file `Result` objects cover every file
+    written or touched; their ``size`` is the number of bytes actually sent
+    (or, for a dry run, which would have been sent).
+
+    .. versionadded:: 3.3
+    """
+
+    def __init__(
+        self,
+        results=(),
+        created=(),
+        updated=(),
+        unchanged=(),
+        total_size=0,
+        dry_run=False,
+        **kwargs
+    ):
+        super().__init__(results, **kwargs)
+        #: Remote paths of files which didn't exist remotely.
+        self.created = list(created)
+        #: Remote paths of files whose contents differed.
+        self.updated = list(updated)
+        #: Remote paths of files found to be identical.
+        self.unchanged = list(unchanged)
+        #: Total size of all local files considered, in bytes.
+        self.total_size = total_size
+        #: Whether this was a dry run (i.e. nothing was actually changed).
+        self.dry_run = dry_run
+
+    @property
+    def bytes_saved(self):
+        """
+        Bytes not sent, compared to uploading every file in full.
+        """
+        return self.total_size - self.size
@@ -5,13 +5,21 @@ If you're looking for simple, end-user-focused connection forwarding, please
 see `.Connection`, e.g. `.Connection.forward_local`.
 """
 
-import select
+import selectors
 import socket
-import time
-from threading import Event
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 
 from invoke.exceptions import ThreadException
-from invoke.util import ExceptionHandlingThread
+from invoke.util import ExceptionHandlingThread, ExceptionWrapper
+
+
+# Errors meaning "nothing to read/no room to write right now" from nonblocking
+# sockets (BlockingIOError) or zero-timeout Paramiko channels (socket.timeout).
+WOULD_BLOCK = (BlockingIOError, socket.timeout)
+
+EMPTY = memoryview(b"")
 
 
 class TunnelManager(ExceptionHandlingThread):
@@ -23,132 +31,458 @@ class TunnelManager(ExceptionHandlingThread):
     tunnel or the other. If you need to forward connections between more than
     one set of ports, you'll end up instantiating multiple TunnelManagers.
 
+    All forwarding happens within this one thread: the local listening socket
+    (if any) and both ends of every `.Tunnel` are multiplexed via a `selectors`
+    selector, so an idle manager sleeps until there is actually something to
+    do, and new connections are accepted as soon as they arrive.
+
+    When ``local_port`` is given, the manager listens on ``local_host`` /
+    ``local_port`` and forwards each connection made there to ``remote_host``
+    / ``remote_port`` via a ``direct-tcpip`` channel (this is how
+    `.Connection.forward_local` works). Otherwise, it simply forwards whatever
+    tunnels are handed to `add_tunnel` (as in `.Connection.forward_remote`).
+
     Wraps a `~paramiko.transport.Transport`, which should already be connected
     to the remote server.
 
     .. versionadded:: 2.0
+    .. versionchanged:: 3.3
+        Forward all tunnels from a single selector-driven thread, instead of
+        busy-polling the listener and spawning a thread per tunnel. Added
+        `add_tunnel`, `stop` and `ready`; all constructor arguments are now
+        optional.
+    .. versionchanged:: 3.3
+        Added ``socket_chunk_size`` and ``channel_chunk_size`` (handed to each
+        `.Tunnel` the manager creates) and the `bytes_sent` and
+        `bytes_received` counters.
     """
 
+    #: Longest time, in seconds, the manager sleeps before noticing that
+    #: ``finished`` was set directly (instead of via `stop`).
+    select_timeout = 1
+    #: How often, in seconds, to retry writing to channels whose SSH send
+    #: window is full. (Paramiko offers no way to wait on window updates.)
+    send_retry_interval = 0.01
+    #: Number of helper threads used to open ``direct-tcpip`` channels for
+    #: newly accepted connections, so that the round trip involved never
+    #: stalls traffic on already-open tunnels.
+    channel_open_workers = 4
+
     def __init__(
         self,
-        local_host,
-        local_port,
-        remote_host,
-        remote_port,
-        transport,
-        finished,
+        local_host=None,
+        local_port=None,
+        remote_host=None,
+        remote_port=None,
+        transport=None,
+        finished=None,
+        socket_chunk_size=None,
+        channel_chunk_size=None,
     ):
         super().__init__()
         self.local_address = (local_host, local_port)
         self.remote_address = (remote_host, remote_port)
         self.transport = transport
-        self.finished = finished
+        self.finished = finished or Event()
+        #: Keyword arguments for the `.Tunnel` objects this manager creates.
+        self.tunnel_kwargs = {
+            key: value
+            for key, value in (
+                ("socket_chunk_size", socket_chunk_size),
+                ("channel_chunk_size", channel_chunk_size),
+            )
+            if value is not None
+        }
+        #: Total bytes forwarded from local sockets to the remote end, across
+        #: all tunnels (see `.Tunnel.bytes_sent`).
+        self.bytes_sent = 0
+        #: Total bytes forwarded from the remote end to local sockets, across
+        #: all tunnels (see `.Tunnel.bytes_received`).
+        self.bytes_received = 0
+        #: Set once the manager is ready to forward connections (or has
+        #: failed trying to get that far).
+        self.ready = Event()
+        self._lock = Lock()
+        self._new_tunnels = []
+        self._exceptions = []
+        # Self-pipe used to interrupt select() from other threads.
+        self._waker, self._wakee = socket.socketpair()
+        self._wakee.setblocking(False)
+
+    def add_tunnel(self, tunnel):
+        """
+        Start forwarding data for ``tunnel`` (a `.Tunnel`).
+
+        May be called from any thread.
+
+        .. versionadded:: 3.3
+        """
+        with self._lock:
+            self._new_tunnels.append(tunnel)
+        self._wake()
+
+    def stop(self):
+        """
+        Ask the manager to close all its tunnels and exit.
+
+        Equivalent to setting ``finished``, but takes effect immediately.
+
+        .. versionadded:: 3.3
+        """
+        self.finished.set()
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._waker.send(b"\0")
+        except OSError:
+            # Already shut down, or so many wakeups pending that the buffer
+            # is full; either way, we're covered.
+            pass
+
+    def _record(self, exc_info, **kwargs):
+        with self._lock:
+            self._exceptions.append(ExceptionWrapper(kwargs, *exc_info))
 
     def _run(self):
-        # Track each tunnel that gets opened during our lifetime
-        tunnels = []
+        selector = selectors.DefaultSelector()
+        selector.register(self._wakee, selectors.EVENT_READ)
+        tunnels = set()
+        listener, opener = None, None
+        try:
+            if self.local_address[1] is not None:
+                listener = self._listen()
+                selector.register(listener, selectors.EVENT_READ)
+                opener = ThreadPoolExecutor(self.channel_open_workers)
+            self.ready.set()
+            while not self.finished.is_set():
+                with self._lock:
+                    new, self._new_tunnels = self._new_tunnels, []
+                for tunnel in new:
+                    tunnels.add(tunnel)
+                    tunnel.update(selector)
+                touched = set()
+                timeout = self.select_timeout
+                if any(x.channel_blocked for x in tunnels):
+                    timeout = self.send_retry_interval
+                for key, events in selector.select(timeout):
+                    if key.fileobj is self._wakee:
+                        self._drain_wakeups()
+                    elif key.fileobj is listener:
+                        self._accept(listener, opener)
+                    else:
+                        self._service(key.data, key.fileobj, events)
+                        touched.add(key.data)
+                # Retry writes stalled on a full SSH window
+                for tunnel in tunnels:
+                    if tunnel.channel_blocked and tunnel not in touched:
+                        self._service(tunnel, None, 0)
+                        touched.add(tunnel)
+                # Bring selector registrations up to date, reaping tunnels
+                # which have finished.
+                for tunnel in touched:
+                    if tunnel.done:
+                        self._close(tunnel, tunnels, selector)
+                    else:
+                        tunnel.update(selector)
+        finally:
+            self.ready.set()
+            if listener is not None:
+                selector.unregister(listener)
+                listener.close()
+            if opener is not None:
+                # Let in-flight channel opens land, so we can close them too.
+                opener.shutdown(wait=True)
+            with self._lock:
+                tunnels.update(self._new_tunnels)
+                self._new_tunnels = []
+            # Propagate shutdown to all tunnels
+            # TODO: would be nice to have some output or at least logging
+            # here, especially for "sets up a handful of tunnels" use cases
+            # like forwarding nontrivial HTTP traffic.
+            for tunnel in list(tunnels):
+                self._close(tunnel, tunnels, selector)
+            selector.close()
+            self._waker.close()
+            self._wakee.close()
+        # Handle exceptions from individual tunnels
+        if self._exceptions:
+            raise ThreadException(self._exceptions)
 
+    def _listen(self):
         # Set up OS-level listener socket on forwarded port
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        # TODO: why do we want REUSEADDR exactly? and is it portable?
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        # NOTE: choosing to deal with nonblocking semantics and a fast loop,
-        # versus an older approach which blocks & expects outer scope to cause
-        # a socket exception by close()ing the socket.
-        sock.setblocking(0)
-        sock.bind(self.local_address)
-        sock.listen(1)
-
-        while not self.finished.is_set():
-            # Main loop-wait: accept connections on the local listener
-            # NOTE: EAGAIN means "you're nonblocking and nobody happened to
-            # connect at this point in time"
-            try:
-                tun_sock, local_addr = sock.accept()
-                # Set TCP_NODELAY to match OpenSSH's forwarding socket behavior
-                tun_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            except BlockingIOError:  # ie errno.EAGAIN
-                # TODO: make configurable
-                time.sleep(0.01)
-                continue
+        try:
+            # TODO: why do we want REUSEADDR exactly? and is it portable?
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.setblocking(0)
+            sock.bind(self.local_address)
+            sock.listen(socket.SOMAXCONN)
+        except BaseException:
+            sock.close()
+            raise
+        return sock
 
-            # Set up direct-tcpip channel on server end
-            # TODO: refactor w/ what's used for gateways
-            channel = self.transport.open_channel(
-                "direct-tcpip", self.remote_address, local_addr
+    def _accept(self, listener, opener):
+        # Drain the whole accept backlog, instead of taking one connection
+        # per trip through select().
+        while True:
+            try:
+                tun_sock, local_addr = listener.accept()
+            except WOULD_BLOCK:
+                return
+            # Set TCP_NODELAY to match OpenSSH's forwarding socket behavior
+            tun_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            future = opener.submit(self._open_channel, local_addr)
+            future.add_done_callback(
+                lambda f, sock=tun_sock: self._opened(f, sock)
             )
 
-            # Set up 'worker' thread for this specific connection to our
-            # tunnel, plus its dedicated signal event (which will appear as a
-            # public attr, no need to track both independently).
-            finished = Event()
-            tunnel = Tunnel(channel=channel, sock=tun_sock, finished=finished)
-            tunnel.start()
-            tunnels.append(tunnel)
-
-        exceptions = []
-        # Propogate shutdown signal to all tunnels & wait for closure
-        # TODO: would be nice to have some output or at least logging here,
-        # especially for "sets up a handful of tunnels" use cases like
-        # forwarding nontrivial HTTP traffic.
-        for tunnel in tunnels:
+    def _open_channel(self, local_addr):
+        # Set up direct-tcpip channel on server end
+        # TODO: refactor w/ what's used for gateways
+        return self.transport.open_channel(
+            "direct-tcpip", self.remote_address, local_addr
+        )
+
+    def _opened(self, future, sock):
+        try:
+            channel = future.result()
+        except BaseException:
+            # Only this one connection is affected; keep serving the rest.
+            sock.close()
+            self._record(sys.exc_info(), local_address=self.local_address)
+            return
+        self.add_tunnel(
+            Tunnel(channel=channel, sock=sock, **self.tunnel_kwargs)
+        )
+
+    def _drain_wakeups(self):
+        try:
+            while self._wakee.recv(4096):
+                pass
+        except WOULD_BLOCK:
+            pass
+
+    def _service(self, tunnel, fileobj, events):
+        sent, received = tunnel.bytes_sent, tunnel.bytes_received
+        try:
+            tunnel.handle(fileobj, events)
+        except BaseException:
+            # A broken tunnel must not take its siblings down with it.
+            self._record(sys.exc_info(), tunnel=tunnel)
             tunnel.finished.set()
-            tunnel.join()
-            wrapper = tunnel.exception()
-            if wrapper:
-                exceptions.append(wrapper)
-        # Handle exceptions
-        if exceptions:
-            raise ThreadException(exceptions)
+        finally:
+            self.bytes_sent += tunnel.bytes_sent - sent
+            self.bytes_received += tunnel.bytes_received - received
 
-        # All we have left to close is our own sock.
-        # TODO: use try/finally?
-        sock.close()
+    def _close(self, tunnel, tunnels, selector):
+        tunnels.discard(tunnel)
+        tunnel.finished.set()
+        tunnel.update(selector)
+        tunnel.close()
 
 
-class Tunnel(ExceptionHandlingThread):
+class Tunnel:
     """
     Bidirectionally forward data between an SSH channel and local socket.
 
+    Tunnels do no I/O of their own accord; a `.TunnelManager` calls `handle`
+    whenever either end is ready, and both ends are used in nonblocking mode.
+    Data read from one end is buffered until the other end accepts it, and
+    reading from that end is paused in the meantime, so a slow reader on one
+    side exerts backpressure on the other instead of blocking the manager.
+
+    Reads from the local socket go straight into a preallocated buffer (via
+    ``recv_into``), and unsent data is tracked as `memoryview` slices, so
+    partial writes never copy what remains. (Paramiko channels offer no
+    ``recv_into``, so data coming from them is allocated per read; raising
+    ``channel_chunk_size`` keeps those reads few and large.)
+
+    :param int socket_chunk_size:
+        Maximum number of bytes read from ``sock`` at a time (and thus size of
+        its read buffer).
+    :param int channel_chunk_size:
+        Maximum number of bytes read from ``channel`` at a time.
+
     .. versionadded:: 2.0
+    .. versionchanged:: 3.3
+        No longer a thread; driven by `.TunnelManager` instead. ``finished``
+        became optional.
+    .. versionchanged:: 3.3
+        Added ``socket_chunk_size`` and ``channel_chunk_size`` (which used to
+        be fixed at 1024 bytes), plus the `bytes_sent` and `bytes_received`
+        counters.
     """
 
-    def __init__(self, channel, sock, finished):
+    def __init__(
+        self,
+        channel,
+        sock,
+        finished=None,
+        socket_chunk_size=65536,
+        channel_chunk_size=65536,
+    ):
         self.channel = channel
         self.sock = sock
-        self.finished = finished
-        self.socket_chunk_size = 1024
-        self.channel_chunk_size = 1024
-        super().__init__()
+        #: Set once this tunnel has shut down.
+        self.finished = finished or Event()
+        self.socket_chunk_size = socket_chunk_size
+        self.channel_chunk_size = channel_chunk_size
+        #: Number of bytes forwarded from ``sock`` to ``channel`` so far.
+        self.bytes_sent = 0
+        #: Number of bytes forwarded from ``channel`` to ``sock`` so far.
+        self.bytes_received = 0
+        # Data read from one end but not yet accepted by the other, keyed by
+        # the end it's destined for.
+        self._pending = {sock: EMPTY, channel: EMPTY}
+        # Reusable read buffers, keyed by the end they're read from.
+        self._buffers = {}
+        self._eof = False
+        self._registered = {}
+        self.channel.settimeout(0.0)
+        self.sock.setblocking(False)
 
-    def _run(self):
-        try:
-            empty_sock, empty_chan = None, None
-            while not self.finished.is_set():
-                r, w, x = select.select([self.sock, self.channel], [], [], 1)
-                if self.sock in r:
-                    empty_sock = self.read_and_write(
-                        self.sock, self.channel, self.socket_chunk_size
-                    )
-                if self.channel in r:
-                    empty_chan = self.read_and_write(
-                        self.channel, self.sock, self.channel_chunk_size
-                    )
-                if empty_sock or empty_chan:
-                    break
-        finally:
-            self.channel.close()
-            self.sock.close()
+    def __repr__(self):
+        return "<Tunnel {!r} <-> {!r}>".format(self.sock, self.channel)
+
+    @property
+    def channel_blocked(self):
+        """
+        Whether data is waiting on the channel's SSH send window to open up.
+
+        .. versionadded:: 3.3
+        """
+        return bool(self._pending[self.channel])
+
+    @property
+    def done(self):
+        """
+        Whether either end has hung up and all buffered data has been sent.
+
+        .. versionadded:: 3.3
+        """
+        return self.finished.is_set() or (
+            self._eof and not any(self._pending.values())
+        )
+
+    def update(self, selector):
+        """
+        (Re)register our ends with ``selector`` according to current state.
+
+        .. versionadded:: 3.3
+        """
+        sock_events, channel_events = 0, 0
+        if not self.finished.is_set():
+            # Don't read more from one end while the other has yet to accept
+            # what we already have for it.
+            if not self._eof and not self._pending[self.channel]:
+                sock_events |= selectors.EVENT_READ
+            if not self._eof and not self._pending[self.sock]:
+                channel_events |= selectors.EVENT_READ
+            if self._pending[self.sock]:
+                sock_events |= selectors.EVENT_WRITE
+        for fileobj, events in (
+            (self.sock, sock_events),
+            (self.channel, channel_events),
+        ):
+            current = self._registered.get(fileobj, 0)
+            if events == current:
+                continue
+            if not events:
+                selector.unregister(fileobj)
+                del self._registered[fileobj]
+            elif not current:
+                selector.register(fileobj, events, self)
+                self._registered[fileobj] = events
+            else:
+                selector.modify(fileobj, events, self)
+                self._registered[fileobj] = events
+
+    def handle(self, fileobj, events):
+        """
+        Move data in response to ``events`` having occurred on ``fileobj``.
+
+        ``fileobj`` may be ``None`` to simply retry any pending writes.
+
+        .. versionadded:: 3.3
+        """
+        if events & selectors.EVENT_WRITE:
+            self.flush(fileobj)
+        if events & selectors.EVENT_READ:
+            if fileobj is self.sock:
+                empty = self.read_and_write(
+                    self.sock, self.channel, self.socket_chunk_size
+                )
+            else:
+                empty = self.read_and_write(
+                    self.channel, self.sock, self.channel_chunk_size
+                )
+            if empty:
+                self._eof = True
+        if fileobj is None:
+            self.flush(self.channel)
 
     def read_and_write(self, reader, writer, chunk_size):
         """
         Read ``chunk_size`` from ``reader``, writing result to ``writer``.
 
+        Whatever ``writer`` cannot immediately accept is buffered and sent by
+        a later `flush`.
+
         Returns ``None`` if successful, or ``True`` if the read was empty.
 
         .. versionadded:: 2.0
+        .. versionchanged:: 3.3
+            Writes no longer block, and readers supporting ``recv_into`` read
+            into a reusable buffer.
         """
-        data = reader.recv(chunk_size)
+        pending = self._pending[writer]
+        try:
+            # The read buffer may only be reused once everything previously
+            # read into it has been written out.
+            if pending or not hasattr(reader, "recv_into"):
+                data = reader.recv(chunk_size)
+            else:
+                buf = self._buffers.get(reader)
+                if buf is None or len(buf) < chunk_size:
+                    buf = self._buffers[reader] = bytearray(chunk_size)
+                view = memoryview(buf)
+                data = view[: reader.recv_into(view, chunk_size)]
+        except WOULD_BLOCK:
+            return None
         if len(data) == 0:
             return True
-        writer.sendall(data)
+        if pending:
+            data = bytes(pending) + data
+        self._pending[writer] = memoryview(data)
+        self.flush(writer)
+
+    def flush(self, writer):
+        """
+        Send as much buffered data to ``writer`` as it will accept.
+
+        .. versionadded:: 3.3
+        """
+        data = self._pending[writer]
+        while data:
+            try:
+                sent = writer.send(data)
+            except WOULD_BLOCK:
+                break
+            if writer is self.channel:
+                self.bytes_sent += sent
+            else:
+                self.bytes_received += sent
+            data = data[sent:]
+        self._pending[writer] = data
+
+    def close(self):
+        """
+        Close both ends of the tunnel.
+
+        .. versionadded:: 3.3
+        """
+        self.finished.set()
+        self.channel.close()
+        self.sock.close()
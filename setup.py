@@ -75,6 +75,8 @@ setuptools.setup(
         "testing": [],  # no longer (for now?) needs anything special
         # For folks who want to use fabric.testing.fixtures' pytest fixtures
         "pytest": ["pytest>=7"],
+        # For zstd-compressed transfers (Transfer.get/put's compress="zstd")
+        "zstd": ["zstandard>=0.15"],
     },
     packages=packages,
     entry_points={
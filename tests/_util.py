@@ -1,9 +1,16 @@
 from contextlib import contextmanager
 import os
+import posixpath
 import re
+import socket
+import stat
+import subprocess
 import sys
+import threading
+import time
 
 from invoke.vendor.lexicon import Lexicon
+from paramiko import SFTPAttributes
 from pytest_relaxed import trap
 
 from fabric.main import make_program
@@ -73,3 +80,369 @@ def faux_v1_env():
         user="localuser",
         warn_only=False,
     )
+
+
+def free_port():
+    """
+    Return a local TCP port number which was unused a moment ago.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def recv_exactly(sock, size, timeout=2):
+    """
+    Read exactly ``size`` bytes from ``sock``, waiting at most ``timeout``.
+    """
+    sock.settimeout(timeout)
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class FakeSFTPStore:
+    """
+    In-memory stand-in for a remote filesystem, served via `FakeSFTP`.
+
+    Hand ``store.session`` to a mocked ``SSHClient.open_sftp`` (as its
+    ``side_effect``) so every SFTP session a test opens shares these files;
+    ``sessions`` records each one.
+    """
+
+    def __init__(self, cwd="/remote", exclusive=False):
+        self.cwd = cwd
+        # Whether to hand out ExclusiveFakeSFTP sessions
+        self.exclusive = exclusive
+        self.collisions = 0
+        # path -> [bytearray contents, int mode]
+        self.files = {}
+        # path -> int mode
+        self.dirs = {"/": 0o40755, cwd: 0o40755}
+        # path -> int mtime
+        self.mtimes = {}
+        self.sessions = []
+
+    def session(self):
+        sftp = (ExclusiveFakeSFTP if self.exclusive else FakeSFTP)(self)
+        self.sessions.append(sftp)
+        return sftp
+
+    def add(self, path, data, mode=0o100644, mtime=0):
+        self.files[path] = [bytearray(data), mode]
+        self.mtimes[path] = mtime
+
+    def add_dir(self, path, mode=0o40755):
+        self.dirs[path] = mode
+
+    def data(self, path):
+        return bytes(self.files[path][0])
+
+    def mode(self, path):
+        return self.files[path][1]
+
+
+class FakeSFTP:
+    """
+    Just enough of `paramiko.sftp_client.SFTPClient` to exercise `.Transfer`.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.closed = False
+        self.calls = []
+
+    def getcwd(self):
+        return self.store.cwd
+
+    def normalize(self, path):
+        return self.store.cwd
+
+    def _entry(self, path):
+        try:
+            return self.store.files[path]
+        except KeyError:
+            raise FileNotFoundError(path)
+
+    def _attrs(self, path):
+        attrs = SFTPAttributes()
+        if path in self.store.dirs:
+            attrs.st_size = 0
+            attrs.st_mode = self.store.dirs[path]
+        else:
+            data, mode = self._entry(path)
+            attrs.st_size = len(data)
+            attrs.st_mode = mode
+        attrs.st_mtime = self.store.mtimes.get(path, 0)
+        attrs.filename = posixpath.basename(path)
+        return attrs
+
+    def stat(self, path):
+        self.calls.append(("stat", path))
+        return self._attrs(path)
+
+    def chmod(self, path, mode):
+        self.calls.append(("chmod", path, mode))
+        if path in self.store.dirs:
+            self.store.dirs[path] = (self.store.dirs[path] & ~0o7777) | mode
+            return
+        entry = self._entry(path)
+        entry[1] = (entry[1] & ~0o7777) | mode
+
+    def _check_parent(self, path):
+        if posixpath.dirname(path) not in self.store.dirs:
+            raise FileNotFoundError(path)
+
+    def mkdir(self, path, mode=0o777):
+        self.calls.append(("mkdir", path, mode))
+        self._check_parent(path)
+        if path in self.store.dirs or path in self.store.files:
+            raise OSError(path)
+        self.store.dirs[path] = stat.S_IFDIR | mode
+
+    def listdir_attr(self, path="."):
+        self.calls.append(("listdir_attr", path))
+        if path not in self.store.dirs:
+            raise FileNotFoundError(path)
+        children = set(self.store.dirs) | set(self.store.files)
+        return [
+            self._attrs(x)
+            for x in sorted(children)
+            if x != path and posixpath.dirname(x) == path
+        ]
+
+    def open(self, path, mode="r", bufsize=-1):
+        self.calls.append(("open", path, mode))
+        if "w" in mode:
+            self._check_parent(path)
+            self.store.files[path] = [bytearray(), 0o100644]
+        return self._file(path)
+
+    def _file(self, path):
+        return FakeSFTPFile(self, path)
+
+    def posix_rename(self, oldpath, newpath):
+        self.calls.append(("posix_rename", oldpath, newpath))
+        self.store.files[newpath] = self._entry(oldpath)
+        del self.store.files[oldpath]
+        if oldpath in self.store.mtimes:
+            self.store.mtimes[newpath] = self.store.mtimes.pop(oldpath)
+
+    def getfo(self, remotepath, fl, callback=None, prefetch=True):
+        self.calls.append(("getfo", remotepath))
+        data = bytes(self._entry(remotepath)[0])
+        fl.write(data)
+        if callback is not None:
+            callback(len(data), len(data))
+        return len(data)
+
+    def putfo(self, fl, remotepath, file_size=0, callback=None, confirm=True):
+        self.calls.append(("putfo", remotepath))
+        with self.open(remotepath, "wb") as fr:
+            for data in iter(lambda: fl.read(32768), b""):
+                fr.write(data)
+                if callback is not None:
+                    callback(fr.pos, file_size)
+        return self.stat(remotepath)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSFTPFile:
+    MAX_REQUEST_SIZE = 32768
+
+    def __init__(self, sftp, path):
+        self.sftp = sftp
+        self.path = path
+        self.pos = 0
+        self.readv_calls = []
+        self.pipelined = False
+
+    @property
+    def _data(self):
+        return self.sftp._entry(self.path)[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def stat(self):
+        return self.sftp.stat(self.path)
+
+    def chmod(self, mode):
+        self.sftp.calls.append(("fchmod", self.path, mode))
+        entry = self.sftp._entry(self.path)
+        entry[1] = (entry[1] & ~0o7777) | mode
+
+    def set_pipelined(self, pipelined=True):
+        self.pipelined = pipelined
+
+    def prefetch(self, file_size=None):
+        pass
+
+    def truncate(self, size):
+        self.sftp.calls.append(("truncate", self.path, size))
+        del self._data[size:]
+
+    def utime(self, times):
+        self.sftp.calls.append(("utime", self.path, times))
+        self.sftp.store.mtimes[self.path] = int(times[1])
+
+    def seek(self, offset):
+        self.pos = offset
+
+    def read(self, size=None):
+        data, start = self._data, self.pos
+        end = len(data) if size is None else start + size
+        chunk = bytes(data[start:end])
+        self.pos += len(chunk)
+        return chunk
+
+    def readv(self, chunks, max_concurrent_prefetch_requests=None):
+        self.readv_calls.append(
+            (list(chunks), max_concurrent_prefetch_requests)
+        )
+        for start, size in chunks:
+            end = start + size
+            yield bytes(self._data[start:end])
+
+    def write(self, data):
+        buf, start = self._data, self.pos
+        end = start + len(data)
+        if len(buf) < end:
+            buf.extend(b"\0" * (end - len(buf)))
+        buf[start:end] = data
+        self.pos = end
+        self.sftp.calls.append(("write", self.path, start, len(data)))
+
+
+def _exclusive(method):
+    # Guard a method of an ExclusiveFakeSFTP, or of a file it opened.
+    def guarded(self, *args, **kwargs):
+        sftp = getattr(self, "sftp", self)
+        me = threading.get_ident()
+        with sftp._owner_lock:
+            if sftp._owner not in (None, me):
+                sftp.store.collisions += 1
+                raise AssertionError("SFTP session used by two threads")
+            outermost = sftp._owner is None
+            sftp._owner = me
+        try:
+            # Widen the window for other threads to blunder in
+            time.sleep(0.002)
+            return method(self, *args, **kwargs)
+        finally:
+            if outermost:
+                with sftp._owner_lock:
+                    sftp._owner = None
+
+    return guarded
+
+
+class ExclusiveFakeSFTP(FakeSFTP):
+    """
+    `FakeSFTP` which fails if two threads ever use it at once.
+
+    Real `~paramiko.sftp_client.SFTPClient` objects don't lock around their
+    request/response cycles, so threads sharing one steal each other's
+    replies (and hang); this makes such sharing noisy instead. Failures are
+    also counted in ``store.collisions``, in case callers swallow errors.
+    """
+
+    def __init__(self, store):
+        super().__init__(store)
+        self._owner_lock = threading.Lock()
+        self._owner = None
+
+    stat = _exclusive(FakeSFTP.stat)
+    chmod = _exclusive(FakeSFTP.chmod)
+    mkdir = _exclusive(FakeSFTP.mkdir)
+    listdir_attr = _exclusive(FakeSFTP.listdir_attr)
+    open = _exclusive(FakeSFTP.open)
+    posix_rename = _exclusive(FakeSFTP.posix_rename)
+    getfo = _exclusive(FakeSFTP.getfo)
+    putfo = _exclusive(FakeSFTP.putfo)
+
+    def _file(self, path):
+        return ExclusiveFakeSFTPFile(self, path)
+
+
+class ExclusiveFakeSFTPFile(FakeSFTPFile):
+    """
+    File opened via an `ExclusiveFakeSFTP`, sharing its guard.
+    """
+
+    stat = _exclusive(FakeSFTPFile.stat)
+    chmod = _exclusive(FakeSFTPFile.chmod)
+    truncate = _exclusive(FakeSFTPFile.truncate)
+    utime = _exclusive(FakeSFTPFile.utime)
+    read = _exclusive(FakeSFTPFile.read)
+    write = _exclusive(FakeSFTPFile.write)
+
+    @_exclusive
+    def readv(self, chunks, max_concurrent_prefetch_requests=None):
+        # (Reading everything while guarded, as a generator would escape.)
+        return iter(
+            list(
+                FakeSFTPFile.readv(
+                    self, chunks, max_concurrent_prefetch_requests
+                )
+            )
+        )
+
+
+class LocalChannel:
+    """
+    Just enough of a Paramiko channel, running commands in a local shell.
+    """
+
+    def __init__(self, cwd):
+        self.cwd = cwd
+
+    def exec_command(self, command):
+        self.command = command
+        self.proc = subprocess.Popen(
+            command,
+            shell=True,
+            cwd=self.cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def sendall(self, data):
+        # Like a real channel, quietly take data the command exited before
+        # reading.
+        try:
+            self.proc.stdin.write(data)
+        except BrokenPipeError:
+            pass
+
+    def shutdown_write(self):
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def recv(self, size):
+        return self.proc.stdout.read(size)
+
+    def recv_exit_status(self):
+        return self.proc.wait()
+
+    def recv_stderr(self, size):
+        return self.proc.stderr.read(size)
+
+    def close(self):
+        for stream in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            stream.close()
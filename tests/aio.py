@@ -0,0 +1,172 @@
+import asyncio
+from contextlib import contextmanager
+from threading import current_thread, main_thread
+from unittest.mock import Mock
+
+from pytest import mark, raises
+
+from fabric import Config, Connection, GroupResult
+from fabric.aio import AsyncConnection, AsyncGroup
+from fabric.exceptions import GroupException
+
+
+METHODS = ("run", "sudo", "put", "get")
+
+
+def _run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class AsyncConnection_:
+    class init:
+        def wraps_a_new_Connection(self):
+            cxn = AsyncConnection("host", user="admin")
+            assert isinstance(cxn.connection, Connection)
+            assert cxn.connection.host == "host"
+            assert cxn.connection.user == "admin"
+            assert cxn.executor is None
+
+        def from_connection_wraps_existing_object(self):
+            inner = Connection("host")
+            cxn = AsyncConnection.from_connection(inner, executor="exe")
+            assert cxn.connection is inner
+            assert cxn.executor == "exe"
+
+    def proxies_unknown_attributes_to_Connection(self):
+        cxn = AsyncConnection("admin@host:2222")
+        assert cxn.host == "host"
+        assert cxn.user == "admin"
+        assert cxn.port == 2222
+
+    @mark.parametrize("method", METHODS)
+    def methods_run_wrapped_method_off_of_the_loop_thread(self, method):
+        inner = Mock()
+        threads = []
+
+        def record(*args, **kwargs):
+            threads.append(current_thread())
+            return "result"
+
+        getattr(inner, method).side_effect = record
+        cxn = AsyncConnection.from_connection(inner)
+        result = _run(getattr(cxn, method)("whatever", hide=True))
+        assert result == "result"
+        getattr(inner, method).assert_called_once_with("whatever", hide=True)
+        assert threads[0] is not main_thread()
+
+    def open_and_close_are_awaitable(self):
+        inner = Mock()
+        cxn = AsyncConnection.from_connection(inner)
+        _run(cxn.open())
+        _run(cxn.close())
+        inner.open.assert_called_once_with()
+        inner.close.assert_called_once_with()
+
+    def async_contextmanager_closes(self):
+        inner = Mock()
+
+        async def go():
+            async with AsyncConnection.from_connection(inner) as cxn:
+                assert cxn.connection is inner
+
+        _run(go())
+        inner.close.assert_called_once_with()
+
+    def forward_local_wraps_sync_contextmanager(self):
+        events = []
+
+        @contextmanager
+        def forward_local(*args, **kwargs):
+            events.append(("enter", args, kwargs))
+            yield
+            events.append("exit")
+
+        inner = Mock(forward_local=forward_local)
+
+        async def go():
+            cxn = AsyncConnection.from_connection(inner)
+            async with cxn.forward_local(5432, remote_port=6543):
+                events.append("body")
+
+        _run(go())
+        assert events == [
+            ("enter", (5432,), dict(remote_port=6543)),
+            "body",
+            "exit",
+        ]
+
+
+class AsyncGroup_:
+    def init_creates_AsyncConnections_sharing_an_executor(self):
+        g = AsyncGroup("host1", "host2", user="admin", max_workers=2)
+        assert len(g) == 2
+        assert all(isinstance(x, AsyncConnection) for x in g)
+        assert g[0].user == "admin"
+        assert g[0].executor is g.executor
+        assert g[1].executor is g.executor
+        assert g.executor._max_workers == 2
+
+    def pool_size_defaults_to_config_setting(self):
+        assert AsyncGroup("host1").executor._max_workers == 32
+        config = Config(overrides={"aio": {"max_workers": 5}})
+        g = AsyncGroup("host1", "host2", config=config)
+        assert g.executor._max_workers == 5
+        assert g[0].config is config
+        assert AsyncGroup().executor._max_workers == 32
+
+    def members_get_their_own_configs_by_default(self):
+        g = AsyncGroup("host1", "host2")
+        assert g[0].config is not g[1].config
+        assert g[0].config._gateways is g[1].config._gateways
+
+    def from_connections_wraps_given_Connections(self):
+        cxns = [Connection("host1"), Connection("host2")]
+        g = AsyncGroup.from_connections(cxns)
+        assert [x.connection for x in g] == cxns
+
+    @mark.parametrize("method", METHODS)
+    def returns_GroupResult_keyed_on_Connections(self, method):
+        cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+        g = AsyncGroup.from_connections(cxns)
+        result = _run(getattr(g, method)("whatever", hide=True))
+        assert isinstance(result, GroupResult)
+        expected = {x: getattr(x, method).return_value for x in cxns}
+        assert result == expected
+
+    @mark.parametrize("method", METHODS)
+    def raises_GroupException_on_any_failure(self, method):
+        cxns = [Mock(name=x) for x in ("host1", "host2")]
+        onoz = Exception("onoz")
+        getattr(cxns[0], method).side_effect = onoz
+        g = AsyncGroup.from_connections(cxns)
+        with raises(GroupException) as info:
+            _run(getattr(g, method)("whatever", hide=True))
+        assert info.value.result.failed == {cxns[0]: onoz}
+        assert list(info.value.result.succeeded) == [cxns[1]]
+
+    def get_defaults_local_to_host_interpolated_path(self):
+        cxn = Mock()
+        g = AsyncGroup.from_connections([cxn])
+        _run(g.get(remote="whatever"))
+        cxn.get.assert_called_once_with(remote="whatever", local="{host}/")
+
+    def close_closes_all_members(self):
+        cxns = [Mock(name=x) for x in ("host1", "host2")]
+
+        async def go():
+            async with AsyncGroup.from_connections(cxns):
+                pass
+
+        _run(go())
+        for cxn in cxns:
+            cxn.close.assert_called_once_with()
+
+    def close_shuts_down_the_thread_pool(self):
+        g = AsyncGroup.from_connections([Mock(), Mock()])
+        _run(g.run("whatever"))
+        threads = list(g.executor._threads)
+        assert threads
+        _run(g.close())
+        assert not any(x.is_alive() for x in threads)
+        with raises(RuntimeError):
+            g.executor.submit(print)
@@ -1,5 +1,7 @@
 from getpass import getpass
 from pathlib import Path
+from threading import Thread
+import time
 from unittest.mock import Mock, patch
 
 from invoke.vendor.lexicon import Lexicon
@@ -15,12 +17,24 @@ from paramiko import (
 )
 
 from fabric import Config, OpenSSHAuthStrategy
+from fabric.auth import (
+    AgentCache,
+    AuthMemo,
+    KeyCache,
+    agent_cache,
+    auth_memo,
+    key_cache,
+    source_id,
+)
 
 
 @fixture(autouse=True)  # under NO circumstances do we wanna talk to an agent
 def fake_agent():
     with patch("fabric.auth.Agent") as Agent:
         yield Agent
+    # Nor leak (fake) agents or keys between tests
+    agent_cache.clear()
+    key_cache.clear()
 
 
 @fixture
@@ -37,14 +51,20 @@ def fake(fake_agent):
         yield lex
 
 
-def _strategy(py_keys=None, ssh_keys=None):
+def _key(name):
+    key = Mock()
+    key.get_name.return_value = "ssh-ed25519"
+    key.fingerprint = "SHA256:" + name
+    return key
+
+
+def _strategy(py_keys=None, ssh_keys=None, **settings):
     conf = SSHConfig().lookup("host")
     conf["identityfile"] = ssh_keys or []
+    settings["identities"] = py_keys or []
     return OpenSSHAuthStrategy(
         ssh_config=conf,
-        fabric_config=Config(
-            overrides={"authentication": {"identities": py_keys or []}}
-        ),
+        fabric_config=Config(overrides={"authentication": settings}),
         username="whatever",
     )
 
@@ -56,7 +76,7 @@ class OpenSSHAuthStrategy_:
             OpenSSHAuthStrategy(None)
         with raises(TypeError):
             OpenSSHAuthStrategy(None, None)
-        ssh_config, fabric_config, username = object(), object(), "foo"
+        ssh_config, fabric_config, username = object(), Config(), "foo"
         strat = OpenSSHAuthStrategy(ssh_config, fabric_config, username)
         assert strat.ssh_config is ssh_config
         assert strat.config is fabric_config
@@ -99,11 +119,127 @@ class OpenSSHAuthStrategy_:
 
     def close_closes_agent(self):
         agent = Mock()
-        strat = _strategy()
+        strat = _strategy(agent_keys_ttl=None)
         strat.agent = agent
         strat.close()
         agent.close.assert_called_once_with()
 
+    def close_leaves_shared_agent_open(self, fake):
+        strat = _strategy()
+        strat.close()
+        assert not strat.agent.close.called
+
+    class agent_sharing:
+        def instances_share_one_agent(self, fake):
+            first, second = _strategy(), _strategy()
+            assert first.agent is second.agent
+            fake.Agent.assert_called_once_with()
+
+        def agent_is_replaced_after_ttl(self, fake):
+            fake.Agent.side_effect = lambda: Mock()
+            with patch("fabric.auth.time.monotonic", return_value=100):
+                first = _strategy(agent_keys_ttl=5)
+            with patch("fabric.auth.time.monotonic", return_value=104):
+                assert _strategy(agent_keys_ttl=5).agent is first.agent
+            with patch("fabric.auth.time.monotonic", return_value=105):
+                assert _strategy(agent_keys_ttl=5).agent is not first.agent
+            # The old one may still be in use elsewhere
+            assert not first.agent.close.called
+
+        def may_be_disabled(self, fake):
+            fake.Agent.side_effect = lambda: Mock()
+            first = _strategy(agent_keys_ttl=None)
+            second = _strategy(agent_keys_ttl=None)
+            assert first.agent is not second.agent
+            first.close()
+            first.agent.close.assert_called_once_with()
+
+        def is_not_shared_with_child_processes(self, fake):
+            fake.Agent.side_effect = lambda: Mock()
+            cache = AgentCache()
+            agent = cache.get(60)
+            with patch("fabric.auth.os.getpid", return_value=-1):
+                assert cache.get(60) is not agent
+
+        def serializes_agent_requests(self, fake):
+            active, overlaps = [], []
+
+            def send_message(msg):
+                active.append(msg)
+                overlaps.append(len(active) > 1)
+                time.sleep(0.01)
+                active.remove(msg)
+
+            fake.Agent.return_value._send_message = send_message
+            agent = AgentCache().get(60)
+            threads = [
+                Thread(target=agent._send_message, args=(x,)) for x in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert overlaps == [False] * 5
+
+    class key_caching:
+        def _key(self, tmp_path, name="id_ed25519"):
+            path = tmp_path / name
+            path.write_text("not really a key")
+            return str(path)
+
+        def reuses_keys_until_their_files_change(self, fake, tmp_path):
+            fake.PKey.from_path.side_effect = lambda path: Mock()
+            path = self._key(tmp_path)
+            cache = KeyCache()
+            key = cache.load(path)
+            assert cache.load(path) is key
+            assert fake.PKey.from_path.call_count == 1
+            with open(path, "a") as fd:
+                fd.write("!")
+            assert cache.load(path) is not key
+
+        def notices_new_certificates(self, fake, tmp_path):
+            fake.PKey.from_path.side_effect = lambda path: Mock()
+            path = self._key(tmp_path)
+            cache = KeyCache()
+            key = cache.load(path)
+            self._key(tmp_path, "id_ed25519-cert.pub")
+            assert cache.load(path) is not key
+
+        def does_not_cache_failures(self, fake, tmp_path):
+            fake.PKey.from_path.side_effect = [ValueError, Mock()]
+            path = self._key(tmp_path)
+            cache = KeyCache()
+            with raises(ValueError):
+                cache.load(path)
+            assert cache.load(path) is not None
+            assert len(cache) == 1
+
+        def missing_files_are_left_to_PKey(self, fake):
+            cache = KeyCache()
+            key = cache.load("nope.key")
+            fake.PKey.from_path.assert_called_once_with("nope.key")
+            assert key is fake.PKey.from_path.return_value
+            assert len(cache) == 0
+
+        def used_by_strategies(self, fake, tmp_path):
+            fake.PKey.from_path.side_effect = lambda path: Mock()
+            path = self._key(tmp_path)
+            first = list(_strategy(py_keys=[path]).get_pubkeys())
+            second = list(_strategy(py_keys=[path]).get_pubkeys())
+            assert first[0].pkey is second[0].pkey
+
+        def may_be_disabled(self, fake, tmp_path):
+            fake.PKey.from_path.side_effect = lambda path: Mock()
+            path = self._key(tmp_path)
+            first = list(
+                _strategy(py_keys=[path], cache_keys=False).get_pubkeys()
+            )
+            second = list(
+                _strategy(py_keys=[path], cache_keys=False).get_pubkeys()
+            )
+            assert first[0].pkey is not second[0].pkey
+
     class get_pubkeys:
         class fabric_config:
             def loads_identities_config_var(self, fake):
@@ -149,6 +285,8 @@ class OpenSSHAuthStrategy_:
 
         class implicit_user_home_locations:
             def loads_all_four_known_key_types(self, fake):
+                # (Distinct keys, lest they be deduplicated)
+                fake.PKey.from_path.side_effect = lambda path: _key(str(path))
                 strat = _strategy()
                 keys = list(strat.get_pubkeys())
                 assert [x.path for x in keys] == [
@@ -190,6 +328,8 @@ class OpenSSHAuthStrategy_:
 
             @patch("fabric.auth.win32", True)
             def uses_windows_style_ssh_dir_on_windows(self, fake):
+                # (Distinct keys, lest they be deduplicated)
+                fake.PKey.from_path.side_effect = lambda path: _key(str(path))
                 strat = _strategy()
                 keys = list(strat.get_pubkeys())
                 assert [x.path for x in keys] == [
@@ -218,6 +358,95 @@ class OpenSSHAuthStrategy_:
             assert all(isinstance(x, InMemoryPrivateKey) for x in keys)
             assert [x.pkey for x in keys] == agent_keys
 
+        class ordering:
+            def _strategy(self, fake, agent_keys=(), **kwargs):
+                fake.PKey.from_path.side_effect = lambda path: self.keys[path]
+                fake.Agent.return_value.get_keys.return_value = [
+                    self.keys[x] for x in agent_keys
+                ]
+                return _strategy(**kwargs)
+
+            def setup(self):
+                self.keys = {
+                    name: _key(name)
+                    for name in ("a.key", "b.key", "c.key", "d.key")
+                }
+                self.keys["b.copy"] = _key("b.key")
+                self.keys["rsa.key"] = _key("rsa.key")
+                self.keys["rsa.key"].get_name.return_value = "ssh-rsa"
+                for key in self.keys.values():
+                    key.public_blob = None
+
+            def _pkeys(self, strat):
+                return [x.pkey for x in strat.get_pubkeys()]
+
+            def skips_duplicate_keys(self, fake):
+                strat = self._strategy(
+                    fake,
+                    agent_keys=["b.key", "c.key"],
+                    py_keys=["a.key", "b.copy"],
+                    ssh_keys=["c.key", "a.key"],
+                )
+                assert self._pkeys(strat) == [
+                    # agent key also found in ssh config
+                    self.keys["c.key"],
+                    # agent key not in ssh config
+                    self.keys["b.key"],
+                    # CLI keys, sans the one the agent already offered
+                    self.keys["a.key"],
+                ]
+
+            def matches_agent_keys_against_first_config_key(self, fake):
+                strat = self._strategy(
+                    fake, agent_keys=["a.key", "b.key"], ssh_keys=["a.key"]
+                )
+                # Agent keys found in config come first, and only once.
+                assert self._pkeys(strat) == [
+                    self.keys["a.key"],
+                    self.keys["b.key"],
+                ]
+
+            def keeps_certs_and_their_keys_apart(self, fake):
+                cert = _key("a.key")
+                cert.public_blob = object()
+                self.keys["a.cert"] = cert
+                strat = self._strategy(fake, ssh_keys=["a.key", "a.cert"])
+                assert self._pkeys(strat) == [cert, self.keys["a.key"]]
+
+            def identities_only_skips_unlisted_agent_keys(self, fake):
+                strat = self._strategy(
+                    fake,
+                    agent_keys=["a.key", "b.key", "c.key"],
+                    py_keys=["c.key"],
+                    ssh_keys=["a.key"],
+                )
+                strat.ssh_config["identitiesonly"] = "yes"
+                assert self._pkeys(strat) == [
+                    self.keys["a.key"],
+                    self.keys["c.key"],
+                ]
+
+            def honors_pubkey_accepted_algorithms(self, fake):
+                self.keys["a.key"].get_name.return_value = "ssh-dss"
+                strat = self._strategy(fake, ssh_keys=["a.key", "b.key"])
+                strat.ssh_config["pubkeyacceptedalgorithms"] = "ssh-ed25519"
+                assert self._pkeys(strat) == [self.keys["b.key"]]
+
+            def accepts_rsa_keys_via_sha2_algorithms(self, fake):
+                strat = self._strategy(fake, ssh_keys=["rsa.key", "a.key"])
+                strat.ssh_config["pubkeyacceptedalgorithms"] = "rsa-sha2-*"
+                assert self._pkeys(strat) == [self.keys["rsa.key"]]
+
+            def honors_algorithm_removal(self, fake):
+                strat = self._strategy(fake, ssh_keys=["rsa.key", "a.key"])
+                strat.ssh_config["pubkeyacceptedkeytypes"] = "-ssh-ed25519"
+                assert self._pkeys(strat) == [self.keys["rsa.key"]]
+
+            def ignores_additions_to_defaults(self, fake):
+                strat = self._strategy(fake, ssh_keys=["rsa.key", "a.key"])
+                strat.ssh_config["pubkeyacceptedalgorithms"] = "+ssh-dss"
+                assert len(self._pkeys(strat)) == 2
+
         def yields_sources_in_specific_order(self, fake):
             # Set up fake-enough keys
             # Reminder: 'CLI' in our world generally means
@@ -275,3 +504,114 @@ class OpenSSHAuthStrategy_:
             keys = list(strat.get_pubkeys())
             # Order check!
             assert [x.pkey for x in keys] == expected_keys
+
+    class memoization:
+        def setup(self):
+            self.memo = AuthMemo()
+            self.keys = {name: _key(name) for name in ("one", "two", "three")}
+
+        def _strategy(self, fake, memoize=True):
+            fake.PKey.from_path.side_effect = self.keys.get
+            fake.Agent.return_value.get_keys.return_value = []
+            strat = _strategy(py_keys=list(self.keys), memoize=memoize)
+            if memoize:
+                strat.memo = self.memo
+            return strat
+
+        def is_off_by_default(self, fake):
+            assert self._strategy(fake, memoize=False).memo is None
+
+        def uses_shared_in_memory_memo_by_default(self, fake):
+            strat = _strategy(memoize=True)
+            assert strat.memo is auth_memo()
+
+        def may_use_on_disk_memo(self, fake, tmp_path):
+            path = tmp_path / "auth.json"
+            strat = _strategy(memoize=True, memo_file=str(path))
+            assert strat.memo is auth_memo(path)
+
+        def yields_usual_order_when_nothing_remembered(self, fake):
+            strat = self._strategy(fake)
+            sources = list(strat.get_sources())
+            assert [x.pkey for x in sources[:3]] == list(self.keys.values())
+            assert isinstance(sources[3], Password)
+
+        def tries_remembered_source_first_then_the_rest(self, fake):
+            self.memo.remember("host", "whatever", "ssh-ed25519 SHA256:three")
+            sources = list(self._strategy(fake).get_sources())
+            assert [getattr(x, "pkey", None) for x in sources] == [
+                self.keys["three"],
+                self.keys["one"],
+                self.keys["two"],
+                None,
+            ]
+
+        def remembered_password_goes_first(self, fake):
+            self.memo.remember("host", "whatever", "password")
+            sources = list(self._strategy(fake).get_sources())
+            assert isinstance(sources[0], Password)
+            assert len(sources) == 4
+
+        def stale_entries_are_harmless(self, fake):
+            self.memo.remember("host", "whatever", "ssh-rsa SHA256:gone")
+            sources = list(self._strategy(fake).get_sources())
+            assert [getattr(x, "pkey", None) for x in sources[:3]] == list(
+                self.keys.values()
+            )
+
+        def authenticate_remembers_what_worked(self, fake):
+            strat = self._strategy(fake)
+            failing = Mock(authenticate=Mock(side_effect=Exception("nope")))
+            working = InMemoryPrivateKey(username="whatever", pkey=_key("two"))
+            working.authenticate = Mock(return_value=[])
+            strat.get_sources = Mock(return_value=iter([failing, working]))
+            strat.authenticate(None)
+            assert (
+                self.memo.get("host", "whatever") == "ssh-ed25519 SHA256:two"
+            )
+
+        def authenticate_forgets_on_total_failure(self, fake):
+            self.memo.remember("host", "whatever", "password")
+            strat = self._strategy(fake)
+            failing = Mock(authenticate=Mock(side_effect=Exception("nope")))
+            strat.get_sources = Mock(return_value=iter([failing]))
+            with raises(AuthFailure):
+                strat.authenticate(None)
+            assert self.memo.get("host", "whatever") is None
+
+
+class AuthMemo_:
+    def remembers_per_host_and_user(self):
+        memo = AuthMemo()
+        memo.remember("host", "user", "password")
+        assert memo.get("host", "user") == "password"
+        assert memo.get("host", "other") is None
+        assert memo.get("other", "user") is None
+        memo.forget("host", "user")
+        assert memo.get("host", "user") is None
+
+    def persists_to_disk_if_given_path(self, tmp_path):
+        path = tmp_path / "auth.json"
+        AuthMemo(path).remember("host", "user", "ssh-ed25519 SHA256:abc")
+        assert AuthMemo(path).get("host", "user") == "ssh-ed25519 SHA256:abc"
+        assert path.stat().st_mode & 0o777 == 0o600
+
+    def ignores_unreadable_files(self, tmp_path):
+        path = tmp_path / "auth.json"
+        path.write_text("{nope")
+        memo = AuthMemo(path)
+        assert memo.get("host", "user") is None
+        memo.remember("host", "user", "password")
+        assert AuthMemo(path).get("host", "user") == "password"
+
+    def instances_are_shared_per_path(self, tmp_path):
+        assert auth_memo() is auth_memo()
+        path = tmp_path / "auth.json"
+        assert auth_memo(path) is auth_memo(str(path))
+        assert auth_memo(path) is not auth_memo()
+
+    def source_ids(self):
+        assert source_id(Password("user", None)) == "password"
+        source = InMemoryPrivateKey(username="user", pkey=_key("abc"))
+        assert source_id(source) == "ssh-ed25519 SHA256:abc"
+        assert source_id(Mock(spec=[])) is None
@@ -1,11 +1,12 @@
 import errno
 from os.path import join, expanduser
+import pickle
 
 from paramiko.config import SSHConfig
 from invoke import Local
 from invoke.vendor.lexicon import Lexicon
 
-from fabric import Config, Remote, RemoteShell
+from fabric import Config, Connection, Remote, RemoteShell
 from fabric.util import get_local_user
 
 from unittest.mock import patch, call
@@ -320,3 +321,231 @@ class ssh_config_loading:
             c.set_runtime_ssh_path(self._runtime_path)
             c.load_ssh_config()
             method.assert_called_once_with(self._runtime_path)
+
+    class caching:
+        def _config(self, **kwargs):
+            return Config(runtime_ssh_path=self._runtime_path, **kwargs)
+
+        def lookups_match_base_config(self):
+            c = self._config()
+            expected = c.base_ssh_config.lookup("runtime")
+            assert c.lookup_ssh_config("runtime") == expected
+
+        def lookups_are_memoized(self):
+            c = self._config()
+            with patch.object(
+                SSHConfig, "lookup", wraps=c.base_ssh_config.lookup
+            ) as lookup:
+                c.lookup_ssh_config("runtime")
+                c.lookup_ssh_config("runtime")
+                c.lookup_ssh_config("other")
+            assert lookup.call_args_list == [call("runtime"), call("other")]
+
+        def lookups_return_copies(self):
+            c = self._config()
+            first = c.lookup_ssh_config("runtime")
+            first["port"] = "1"
+            first["identityfile"].append("sneaky.key")
+            second = c.lookup_ssh_config("runtime")
+            assert second["port"] == "666"
+            assert second["identityfile"] == [
+                "whatever.key",
+                "some-other.key",
+            ]
+
+        @patch.object(Config, "_load_ssh_file")
+        def loading_again_is_a_no_op(self, method):
+            c = self._config()
+            c.load_ssh_config()
+            c.clone()
+            method.assert_called_once_with(self._runtime_path)
+
+        def clones_share_parsed_data_and_lookups(self):
+            c = self._config()
+            clone = c.clone()
+            assert clone.base_ssh_config is c.base_ssh_config
+            c.lookup_ssh_config("runtime")
+            with patch.object(SSHConfig, "lookup") as lookup:
+                assert clone.lookup_ssh_config("runtime")["port"] == "666"
+            assert not lookup.called
+
+        def loading_other_paths_replaces_data_and_lookups(self):
+            c = self._config()
+            assert c.lookup_ssh_config("user")["hostname"] == "user"
+            c.set_runtime_ssh_path(self._user_path)
+            c.load_ssh_config()
+            assert c.base_ssh_config.get_hostnames() == {
+                "user",
+                "shared",
+                "*",
+            }
+            assert c.lookup_ssh_config("user")["port"] == "321"
+
+        def parsing_directly_into_base_config_is_noticed(self):
+            sc = SSHConfig()
+            c = Config(ssh_config=sc)
+            assert "port" not in c.lookup_ssh_config("late")
+            sc.parse(["Host late", "    Port 2222"])
+            assert c.lookup_ssh_config("late")["port"] == "2222"
+
+        def survives_pickling(self):
+            c = self._config()
+            c.lookup_ssh_config("runtime")
+            clone = pickle.loads(pickle.dumps(c))
+            assert clone.lookup_ssh_config("runtime")["port"] == "666"
+
+        def connections_use_it(self):
+            c = self._config()
+            with patch.object(
+                SSHConfig, "lookup", wraps=c.base_ssh_config.lookup
+            ) as lookup:
+                for _ in range(3):
+                    Connection("runtime", config=c)
+            assert lookup.call_count == 1
+
+    class refreshing:
+        def _config(self, tmp_path, text="Host web\n    Port 2222\n"):
+            path = tmp_path / "ssh_config"
+            path.write_text(text)
+            return path, Config(runtime_ssh_path=str(path))
+
+        def _touch(self, path, text):
+            # Different size, so the change is seen regardless of mtime
+            # granularity.
+            path.write_text(text)
+
+        def returns_False_when_nothing_changed(self, tmp_path):
+            path, c = self._config(tmp_path)
+            with patch("fabric.config._parse_ssh_text") as parse:
+                assert c.refresh_ssh_config() is False
+                c.load_ssh_config()
+            assert not parse.called
+
+        def reloads_changed_files(self, tmp_path):
+            path, c = self._config(tmp_path)
+            assert c.lookup_ssh_config("web")["port"] == "2222"
+            self._touch(path, "Host web\n    Port 22222\n")
+            assert c.refresh_ssh_config() is True
+            assert c.lookup_ssh_config("web")["port"] == "22222"
+            assert c.refresh_ssh_config() is False
+
+        def notices_files_appearing_and_disappearing(self, tmp_path):
+            user = tmp_path / "config"
+            c = Config(
+                user_ssh_path=str(user),
+                system_ssh_path=str(tmp_path / "nope"),
+            )
+            assert c.refresh_ssh_config() is False
+            user.write_text("Host web\n    Port 2222\n")
+            assert c.refresh_ssh_config() is True
+            assert c.lookup_ssh_config("web")["port"] == "2222"
+            user.unlink()
+            assert c.refresh_ssh_config() is True
+            assert "port" not in c.lookup_ssh_config("web")
+
+        def clones_see_and_may_trigger_refreshes(self, tmp_path):
+            path, c = self._config(tmp_path)
+            clone = c.clone()
+            self._touch(path, "Host web\n    Port 22222\n")
+            assert clone.refresh_ssh_config() is True
+            assert c.lookup_ssh_config("web")["port"] == "22222"
+            assert c.refresh_ssh_config() is False
+
+        def is_a_no_op_for_explicit_objects(self):
+            assert Config(ssh_config=SSHConfig()).refresh_ssh_config() is False
+
+        def unchanged_files_are_parsed_once_per_process(self, tmp_path):
+            path, c = self._config(tmp_path)
+            with patch("fabric.config._parse_ssh_text") as parse:
+                Config(runtime_ssh_path=str(path))
+            assert not parse.called
+
+    class includes:
+        def _config(self, tmp_path, text):
+            path = tmp_path / "ssh_config"
+            path.write_text(text)
+            return Config(runtime_ssh_path=str(path))
+
+        def are_only_parsed_when_a_matching_host_is_looked_up(self, tmp_path):
+            (tmp_path / "web.conf").write_text("Host *\n    Port 2222\n")
+            c = self._config(
+                tmp_path,
+                "Host web*\n    Include {}/web.conf\n".format(tmp_path),
+            )
+            with patch("fabric.config._parse_ssh_file") as parse:
+                c.lookup_ssh_config("db1")
+            assert not parse.called
+            assert c.lookup_ssh_config("web1")["port"] == "2222"
+
+        def only_apply_where_enclosing_block_does(self, tmp_path):
+            (tmp_path / "extra.conf").write_text(
+                "User deploy\nHost *1\n    Port 2222\n"
+            )
+            c = self._config(
+                tmp_path,
+                "Host web*\n    Include {}/extra.conf\n".format(tmp_path),
+            )
+            assert c.lookup_ssh_config("web1")["port"] == "2222"
+            assert c.lookup_ssh_config("web2")["user"] == "deploy"
+            assert "port" not in c.lookup_ssh_config("web2")
+            db = c.lookup_ssh_config("db1")
+            assert "port" not in db and "user" not in db
+
+        def keep_their_place_within_files(self, tmp_path):
+            (tmp_path / "ports.conf").write_text("Port 2222\n")
+            c = self._config(
+                tmp_path,
+                "Host web\n    User first\n    Include {}/*.conf\n"
+                "    Port 1111\n    HostName web.example\n".format(tmp_path),
+            )
+            result = c.lookup_ssh_config("web")
+            assert result["user"] == "first"
+            assert result["port"] == "2222"
+            assert result["hostname"] == "web.example"
+
+        def relative_paths_are_relative_to_dot_ssh(self, tmp_path):
+            c = self._config(tmp_path, "Include nope.conf\n")
+            rule = c.base_ssh_config._config[1]
+            assert rule["include"] == ["nope.conf"]
+            assert rule["include_dir"] == expanduser("~/.ssh")
+            # And missing files are ignored
+            assert c.lookup_ssh_config("web")["hostname"] == "web"
+
+        def may_be_nested(self, tmp_path):
+            (tmp_path / "outer.conf").write_text(
+                "Include {}/inner.conf\n".format(tmp_path)
+            )
+            (tmp_path / "inner.conf").write_text("Port 2222\n")
+            c = self._config(
+                tmp_path,
+                "Host web\n    Include {}/outer.conf\n".format(tmp_path),
+            )
+            assert c.lookup_ssh_config("web")["port"] == "2222"
+            assert "port" not in c.lookup_ssh_config("db")
+
+        def changes_to_included_files_are_refreshed(self, tmp_path):
+            included = tmp_path / "web.conf"
+            included.write_text("Port 2222\n")
+            c = self._config(
+                tmp_path, "Host web\n    Include {}\n".format(included)
+            )
+            assert c.lookup_ssh_config("web")["port"] == "2222"
+            included.write_text("Port 22222\n")
+            assert c.refresh_ssh_config() is True
+            assert c.lookup_ssh_config("web")["port"] == "22222"
+
+        def new_glob_matches_are_refreshed(self, tmp_path):
+            c = self._config(tmp_path, "Include {}/*.conf\n".format(tmp_path))
+            assert "port" not in c.lookup_ssh_config("web")
+            (tmp_path / "web.conf").write_text("Port 2222\n")
+            assert c.refresh_ssh_config() is True
+            assert c.lookup_ssh_config("web")["port"] == "2222"
+
+        def keep_get_hostnames_working(self, tmp_path):
+            (tmp_path / "extra.conf").write_text("Host db\n    Port 1\n")
+            c = self._config(
+                tmp_path,
+                "Host web\n    Include {}/extra.conf\n".format(tmp_path),
+            )
+            c.lookup_ssh_config("web")
+            assert c.base_ssh_config.get_hostnames() == {"*", "web"}
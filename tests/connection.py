@@ -1,10 +1,8 @@
-from itertools import chain, repeat
-
 from io import StringIO
 
-import errno
 from os.path import join
 import socket
+import threading
 import time
 
 from unittest.mock import patch, Mock, call, ANY
@@ -19,10 +17,13 @@ from invoke.config import Config as InvokeConfig
 from invoke.exceptions import ThreadException
 
 from fabric import Config, Connection
+from fabric.config import GatewayCache
 from fabric.exceptions import InvalidV1Env
+from fabric.pool import ConnectionPool
+from fabric.tunnels import TunnelManager
 from fabric.util import get_local_user
 
-from _util import support, faux_v1_env
+from _util import faux_v1_env, free_port, recv_exactly, support
 
 
 # Remote is woven in as a config default, so must be patched there
@@ -30,27 +31,6 @@ remote_path = "fabric.config.Remote"
 remote_shell_path = "fabric.config.RemoteShell"
 
 
-def _select_result(obj):
-    """
-    Return iterator/generator suitable for mocking a select.select() call.
-
-    Specifically one that has a single initial return value of ``obj``, and
-    then empty results thereafter.
-
-    If ``obj`` is an exception, it will be used as the sole initial
-    ``side_effect`` (as opposed to a return value among tuples).
-    """
-    # select.select() returns three N-tuples. Have it just act like a single
-    # read event happened, then quiet after. So chain a single-item iterable to
-    # a repeat(). (Mock has no built-in way to do this apparently.)
-    initial = [(obj,), tuple(), tuple()]
-    if isinstance(obj, Exception) or (
-        isinstance(obj, type) and issubclass(obj, Exception)
-    ):
-        initial = obj
-    return chain([initial], repeat([tuple(), tuple(), tuple()]))
-
-
 class Connection_:
     class basic_attributes:
         def is_connected_defaults_to_False(self):
@@ -453,6 +433,50 @@ class Connection_:
                     # TODO: would we ever WANT a reference? can't imagine...
                     assert cxn.gateway.config is not conf
 
+                def gateway_Connections_shared_by_same_config(self):
+                    conf = self._runtime_config(basename="proxyjump_multi")
+                    one = Connection("runtime", config=conf)
+                    two = Connection("runtime", config=conf)
+                    assert one.gateway is two.gateway
+                    assert one.gateway.gateway is two.gateway.gateway
+
+                def gateway_Connections_not_shared_across_configs(self):
+                    one = self._runtime_cxn(basename="proxyjump")
+                    two = self._runtime_cxn(basename="proxyjump")
+                    assert one.gateway == two.gateway
+                    assert one.gateway is not two.gateway
+
+                def gateway_cache_not_inherited_by_clones(self):
+                    conf = self._runtime_config(basename="proxyjump")
+                    one = Connection("runtime", config=conf)
+                    two = Connection("runtime", config=conf.clone())
+                    assert one.gateway is not two.gateway
+
+                def gateway_Connections_created_once_under_concurrency(self):
+                    conf = self._runtime_config(basename="proxyjump")
+                    gateways = []
+                    real_get = GatewayCache.get
+
+                    def slow_get(cache, key):
+                        # Invite other threads in between lookup and creation
+                        time.sleep(0.05)
+                        return real_get(cache, key)
+
+                    def connect():
+                        cxn = Connection("runtime", config=conf)
+                        gateways.append(cxn.gateway)
+
+                    with patch.object(GatewayCache, "get", slow_get):
+                        threads = [
+                            threading.Thread(target=connect) for _ in range(4)
+                        ]
+                        for thread in threads:
+                            thread.start()
+                        for thread in threads:
+                            thread.join()
+                    assert len(gateways) == 4
+                    assert all(x is gateways[0] for x in gateways)
+
             class connect_timeout:
                 def wins_over_default(self):
                     assert self._runtime_cxn().connect_timeout == 15
@@ -708,6 +732,31 @@ class Connection_:
                 username=get_local_user(), hostname="host", port=22, timeout=27
             )
 
+        class compression:
+            def _cxn(self, value, **kwargs):
+                ssh_config = SSHConfig.from_text(
+                    "Host *\n    Compression {}\n".format(value)
+                )
+                config = Config(ssh_config=ssh_config)
+                return Connection("host", config=config, **kwargs)
+
+            def ssh_config_yes_enables_it(self, client):
+                self._cxn("yes").open()
+                assert client.connect.call_args[1]["compress"] is True
+
+            def ssh_config_no_disables_it(self, client):
+                self._cxn("no").open()
+                assert client.connect.call_args[1]["compress"] is False
+
+            def left_alone_without_ssh_config(self, client):
+                Connection("host").open()
+                assert "compress" not in client.connect.call_args[1]
+
+            def connect_kwargs_win_over_ssh_config(self, client):
+                cxn = self._cxn("yes", connect_kwargs={"compress": False})
+                cxn.open()
+                assert client.connect.call_args[1]["compress"] is False
+
         def is_connected_True_when_successful(self, client):
             c = Connection("host")
             c.open()
@@ -760,6 +809,66 @@ class Connection_:
             sock_arg = mock_main.connect.call_args[1]["sock"]
             assert sock_arg is open_channel.return_value
 
+        @patch("fabric.connection.SSHClient")
+        def shared_gateway_only_opened_once(self, Client):
+            Client.side_effect = lambda: Mock()
+            gw = Connection("otherhost")
+            Connection("host1", gateway=gw).open()
+            Connection("host2", gateway=gw).open()
+            assert gw.client.connect.call_count == 1
+            open_channel = gw.client.get_transport.return_value.open_channel
+            assert open_channel.call_count == 2
+
+        @patch("fabric.connection.SSHClient")
+        def gateway_concurrency_unset_means_no_limit(self, Client):
+            Client.side_effect = lambda: Mock()
+            gw = Connection("otherhost")
+            Connection("host", gateway=gw).open()
+            assert gw._handshake_slots is None
+
+        @patch("fabric.connection.SSHClient")
+        def gateway_concurrency_limits_inflight_handshakes(self, Client):
+            Client.side_effect = lambda: Mock()
+            config = Config(overrides={"gateway_concurrency": 2})
+            gw = Connection("otherhost", config=config)
+            main = Connection("host", config=config, gateway=gw)
+            slots = []
+
+            def connect(**kwargs):
+                # Snapshot remaining slots mid-handshake
+                slots.append(gw._handshake_slots._value)
+
+            main.client.connect.side_effect = connect
+            main.open()
+            assert slots == [1]
+            # Slot handed back afterwards
+            assert gw._handshake_slots._value == 2
+            assert main._held_slots is None
+
+        @patch("fabric.connection.SSHClient")
+        def gateway_slot_released_when_handshake_fails(self, Client):
+            Client.side_effect = lambda: Mock()
+            config = Config(overrides={"gateway_concurrency": 1})
+            gw = Connection("otherhost", config=config)
+            main = Connection("host", config=config, gateway=gw)
+            main.client.connect.side_effect = socket.error
+            with pytest.raises(socket.error):
+                main.open()
+            assert gw._handshake_slots._value == 1
+
+        @patch("fabric.connection.SSHClient")
+        def gateway_slot_released_when_channel_open_fails(self, Client):
+            Client.side_effect = lambda: Mock()
+            config = Config(overrides={"gateway_concurrency": 1})
+            gw = Connection("otherhost", config=config)
+            main = Connection("host", config=config, gateway=gw)
+            gw.open()
+            gw.transport.open_channel.side_effect = socket.error
+            with pytest.raises(socket.error):
+                main.open()
+            assert gw._handshake_slots._value == 1
+            assert main._held_slots is None
+
         @patch("fabric.connection.ProxyCommand")
         def uses_proxycommand_as_sock_for_Client_connect(self, moxy, client):
             "uses ProxyCommand from gateway as 'sock' arg to SSHClient.connect"
@@ -1001,6 +1110,138 @@ class Connection_:
                 c.open()
             client.close.assert_called_once_with()
 
+    class connection_pooling:
+        def setup(self):
+            self.config = Config(
+                overrides={"connection_pool": {"enabled": True}}
+            )
+
+        def _clients(self, SSHClient):
+            clients = []
+
+            def make():
+                client = Mock(name="client{}".format(len(clients)))
+                transport = client.get_transport.return_value
+                transport.is_active.return_value = True
+                transport.active = True
+                clients.append(client)
+                return client
+
+            SSHClient.side_effect = make
+            return clients
+
+        @patch("fabric.connection.pool", new_callable=ConnectionPool)
+        @patch("fabric.connection.SSHClient")
+        def disabled_by_default(self, SSHClient, pool):
+            clients = self._clients(SSHClient)
+            Connection("host").open()
+            Connection("host").open()
+            assert clients[0].connect.call_count == 1
+            assert clients[1].connect.call_count == 1
+            assert len(pool) == 0
+
+        @patch("fabric.connection.pool", new_callable=ConnectionPool)
+        @patch("fabric.connection.SSHClient")
+        def same_identity_shares_one_client(self, SSHClient, pool):
+            clients = self._clients(SSHClient)
+            first = Connection("host", config=self.config)
+            second = Connection("host", config=self.config)
+            first.open()
+            assert second.open() is None
+            assert clients[0].connect.call_count == 1
+            assert not clients[1].connect.called
+            assert second.client is first.client
+            assert second.transport is first.transport
+
+        @patch("fabric.connection.pool", new_callable=ConnectionPool)
+        @patch("fabric.connection.SSHClient")
+        def differing_identities_do_not_share(self, SSHClient, pool):
+            clients = self._clients(SSHClient)
+            Connection("host", config=self.config).open()
+            Connection("admin@host", config=self.config).open()
+            assert clients[0].connect.call_count == 1
+            assert clients[1].connect.call_count == 1
+
+        @patch("fabric.connection.pool", new_callable=ConnectionPool)
+        @patch("fabric.connection.SSHClient")
+        def close_releases_instead_of_closing(self, SSHClient, pool):
+            clients = self._clients(SSHClient)
+            cxn = Connection("host", config=self.config)
+            cxn.open()
+            cxn.close()
+            assert not clients[0].close.called
+            assert not cxn.is_connected
+            assert cxn.client is not clients[0]
+            # Reopening (even from another object) reuses the pooled client
+            other = Connection("host", config=self.config)
+            other.open()
+            assert other.client is clients[0]
+            assert clients[0].connect.call_count == 1
+
+        @patch("fabric.connection.pool", new_callable=ConnectionPool)
+        @patch("fabric.connection.SSHClient")
+        def honors_idle_timeout_setting(self, SSHClient, pool):
+            clients = self._clients(SSHClient)
+            self.config.connection_pool.idle_timeout = 0
+            cxn = Connection("host", config=self.config)
+            cxn.open()
+            cxn.close()
+            clients[0].close.assert_called_once_with()
+            assert len(pool) == 0
+
+    class address_racing:
+        def setup(self):
+            self.config = Config(
+                overrides={"address_racing": {"enabled": True}}
+            )
+
+        @patch("fabric.connection.SSHClient")
+        def disabled_by_default(self, SSHClient):
+            with patch.object(Connection, "open_socket") as open_socket:
+                Connection("host").open()
+            assert not open_socket.called
+            assert "sock" not in SSHClient.return_value.connect.call_args[1]
+
+        @patch("fabric.connection.SSHClient")
+        def hands_raced_socket_to_paramiko(self, SSHClient):
+            cxn = Connection("host", config=self.config, connect_timeout=7)
+            with patch.object(Connection, "open_socket") as open_socket:
+                cxn.open()
+            open_socket.assert_called_once_with(timeout=7)
+            kwargs = SSHClient.return_value.connect.call_args[1]
+            assert kwargs["sock"] is open_socket.return_value
+            assert kwargs["hostname"] == "host"
+
+        @patch("fabric.connection.SSHClient")
+        def not_used_with_gateways(self, SSHClient):
+            cxn = Connection("host", config=self.config, gateway="nc %h %p")
+            with patch.object(Connection, "open_socket") as open_socket:
+                with patch("fabric.connection.ProxyCommand"):
+                    cxn.open()
+            assert not open_socket.called
+
+        @patch("fabric.net.connect")
+        @patch("fabric.net.socket.getaddrinfo")
+        def open_socket_resolves_via_shared_cache(self, getaddrinfo, connect):
+            first = Connection("host", config=self.config, port=2222)
+            second = Connection("host", config=self.config, port=2222)
+            assert first.open_socket() is connect.return_value
+            second.open_socket(timeout=3)
+            getaddrinfo.assert_called_once_with(
+                "host", 2222, socket.AF_UNSPEC, socket.SOCK_STREAM
+            )
+            connect.assert_called_with(
+                getaddrinfo.return_value, timeout=3, delay=0.25
+            )
+
+        @patch("fabric.net.connect")
+        @patch("fabric.net.socket.getaddrinfo")
+        def open_socket_honors_AddressFamily(self, getaddrinfo, connect):
+            cxn = Connection("host", config=self.config)
+            cxn.ssh_config["addressfamily"] = "inet6"
+            cxn.open_socket()
+            assert getaddrinfo.call_args[0][2] == socket.AF_INET6
+
     class create_session:
         def calls_open_for_you(self, client):
             c = Connection("host")
@@ -1210,148 +1451,252 @@ class Connection_:
             Transfer.assert_called_with(c)
             Transfer.return_value.put.assert_called_with("meh")
 
+    class get_dir:
+        @patch("fabric.connection.Transfer")
+        def calls_Transfer_get_dir(self, Transfer):
+            c = Connection("host")
+            c.get_dir("meh")
+            Transfer.assert_called_with(c)
+            Transfer.return_value.get_dir.assert_called_with("meh")
+
+    class put_dir:
+        @patch("fabric.connection.Transfer")
+        def calls_Transfer_put_dir(self, Transfer):
+            c = Connection("host")
+            c.put_dir("meh")
+            Transfer.assert_called_with(c)
+            Transfer.return_value.put_dir.assert_called_with("meh")
+
     class forward_local:
-        @patch("fabric.tunnels.select")
-        @patch("fabric.tunnels.socket.socket")
+        def setup(self):
+            # Remote-server ends of the fake channels handed to tunnels
+            self.remote_ends = []
+            self.port = free_port()
+
+        def _open_channel(self, kind, dest_addr, src_addr):
+            ours, theirs = socket.socketpair()
+            self.remote_ends.append(theirs)
+            return ours
+
+        def _connect(self):
+            expected = len(self.remote_ends) + 1
+            sock = socket.create_connection(("127.0.0.1", self.port))
+            self._wait_for_tunnels(expected)
+            return sock
+
+        def _wait_for_tunnels(self, count):
+            for _ in range(200):
+                if len(self.remote_ends) >= count:
+                    return
+                time.sleep(0.01)
+            assert False, "Tunnel never opened"
+
         @patch("fabric.connection.SSHClient")
-        def _forward_local(self, kwargs, Client, mocket, select):
-            # Tease out bits of kwargs for use in the mocking/expecting.
-            # But leave it alone for raw passthru to the API call itself.
-            # TODO: unhappy with how much this apes the real code & its sig...
-            local_port = kwargs["local_port"]
-            remote_port = kwargs.get("remote_port", local_port)
-            local_host = kwargs.get("local_host", "localhost")
-            remote_host = kwargs.get("remote_host", "localhost")
-            # These aren't part of the real sig, but this is easier than trying
-            # to reconcile the mock decorators + optional-value kwargs. meh.
-            tunnel_exception = kwargs.pop("tunnel_exception", None)
-            listener_exception = kwargs.pop("listener_exception", False)
-            # Mock setup
-            client = Client.return_value
-            listener_sock = Mock(name="listener_sock")
-            if listener_exception:
-                listener_sock.bind.side_effect = listener_exception
-            data = "Some data".encode()
-            tunnel_sock = Mock(name="tunnel_sock", recv=lambda n: data)
-            local_addr = Mock()
-            transport = client.get_transport.return_value
-            channel = transport.open_channel.return_value
-            # socket.socket is only called once directly
-            mocket.return_value = listener_sock
-            # The 2nd socket is obtained via an accept() (which should only
-            # fire once & raise EAGAIN after)
-            listener_sock.accept.side_effect = chain(
-                [(tunnel_sock, local_addr)],
-                # TODO: should this become BlockingIOError too?
-                repeat(socket.error(errno.EAGAIN, "nothing yet")),
-            )
-            obj = tunnel_sock if tunnel_exception is None else tunnel_exception
-            select.select.side_effect = _select_result(obj)
-            with Connection("host").forward_local(**kwargs):
-                # Make sure we give listener thread enough time to boot up :(
-                # Otherwise we might assert before it does things. (NOTE:
-                # doesn't need to be much, even at 0.01s, 0/100 trials failed
-                # (vs 45/100 with no sleep)
-                time.sleep(0.015)
-                assert client.connect.call_args[1]["hostname"] == "host"
-                listener_sock.setsockopt.assert_called_once_with(
-                    socket.SOL_SOCKET, socket.SO_REUSEADDR, 1
-                )
-                listener_sock.setblocking.assert_called_once_with(0)
-                listener_sock.bind.assert_called_once_with(
-                    (local_host, local_port)
-                )
-                if not listener_exception:
-                    listener_sock.listen.assert_called_once_with(1)
-                    transport.open_channel.assert_called_once_with(
-                        "direct-tcpip", (remote_host, remote_port), local_addr
-                    )
-                # Local write to tunnel_sock is implied by its mocked-out
-                # recv() call above...
-                # NOTE: don't assert if explodey; we want to mimic "the only
-                # error that occurred was within the thread" behavior being
-                # tested by thread-exception-handling tests
-                if not (tunnel_exception or listener_exception):
-                    channel.sendall.assert_called_once_with(data)
-            # Shutdown, with another sleep because threads.
-            time.sleep(0.015)
-            if not listener_exception:
-                tunnel_sock.close.assert_called_once_with()
-                channel.close.assert_called_once_with()
-                listener_sock.close.assert_called_once_with()
+        def _forward_local(self, kwargs, Client):
+            kwargs.setdefault("local_host", "127.0.0.1")
+            transport = Client.return_value.get_transport.return_value
+            transport.open_channel.side_effect = self._open_channel
+            cxn = Connection("host")
+            with cxn.forward_local(self.port, **kwargs):
+                assert Client.return_value.connect.called
+                local = self._connect()
+                remote = self.remote_ends[0]
+                # Data flows both ways
+                local.sendall(b"request")
+                assert recv_exactly(remote, 7) == b"request"
+                remote.sendall(b"response")
+                assert recv_exactly(local, 8) == b"response"
+            # Everything got torn down on the way out
+            assert recv_exactly(remote, 1) == b""
+            assert recv_exactly(local, 1) == b""
+            with pytest.raises(ConnectionRefusedError):
+                socket.create_connection(("127.0.0.1", self.port))
+            return transport
 
         def forwards_local_port_to_remote_end(self):
-            self._forward_local({"local_port": 1234})
+            transport = self._forward_local({})
+            transport.open_channel.assert_called_once_with(
+                "direct-tcpip", ("localhost", self.port), ANY
+            )
 
         def distinct_remote_port(self):
-            self._forward_local({"local_port": 1234, "remote_port": 4321})
+            transport = self._forward_local({"remote_port": 4321})
+            transport.open_channel.assert_called_once_with(
+                "direct-tcpip", ("localhost", 4321), ANY
+            )
 
         def non_localhost_listener(self):
-            self._forward_local(
-                {"local_port": 1234, "local_host": "nearby_local_host"}
-            )
+            self._forward_local({"local_host": "0.0.0.0"})
 
         def non_remote_localhost_connection(self):
-            self._forward_local(
-                {"local_port": 1234, "remote_host": "nearby_remote_host"}
+            transport = self._forward_local(
+                {"remote_host": "nearby_remote_host"}
+            )
+            transport.open_channel.assert_called_once_with(
+                "direct-tcpip", ("nearby_remote_host", self.port), ANY
+            )
+
+        @patch("fabric.connection.SSHClient")
+        def yields_manager_with_byte_counts(self, Client):
+            transport = Client.return_value.get_transport.return_value
+            transport.open_channel.side_effect = self._open_channel
+            cxn = Connection("host")
+            with cxn.forward_local(self.port, local_host="127.0.0.1") as tun:
+                local = self._connect()
+                local.sendall(b"request")
+                recv_exactly(self.remote_ends[0], 7)
+            assert tun.bytes_sent == 7
+            assert tun.bytes_received == 0
+            local.close()
+
+        @patch("fabric.connection.SSHClient")
+        def honors_tunnels_config(self, Client):
+            config = Config(
+                overrides={
+                    "tunnels": {
+                        "socket_chunk_size": 3,
+                        "channel_chunk_size": 5,
+                    }
+                }
             )
+            cxn = Connection("host", config=config)
+            with cxn.forward_local(self.port, local_host="127.0.0.1") as tun:
+                assert tun.tunnel_kwargs == dict(
+                    socket_chunk_size=3, channel_chunk_size=5
+                )
+
+        def source_address_is_that_of_local_client(self):
+            transport = self._forward_local({})
+            src_addr = transport.open_channel.call_args[0][2]
+            assert src_addr[0] == "127.0.0.1"
+
+        @patch("fabric.connection.SSHClient")
+        def multiple_tunnels_can_be_open_at_once(self, Client):
+            transport = Client.return_value.get_transport.return_value
+            transport.open_channel.side_effect = self._open_channel
+            threads = threading.active_count()
+            with Connection("host").forward_local(
+                self.port, local_host="127.0.0.1"
+            ):
+                locals_ = [self._connect() for _ in range(8)]
+                # One forwarding thread total, not one per tunnel (plus the
+                # small, fixed pool of helpers for opening channels).
+                limit = 1 + TunnelManager.channel_open_workers
+                assert threading.active_count() <= threads + limit
+                for i, local in enumerate(locals_):
+                    local.sendall(str(i).encode())
+                received = [recv_exactly(x, 1) for x in self.remote_ends]
+                assert sorted(received) == [str(i).encode() for i in range(8)]
+            for local in locals_:
+                assert recv_exactly(local, 1) == b""
+                local.close()
 
         def _thread_error(self, which):
             class Sentinel(Exception):
                 pass
 
-            try:
-                self._forward_local(
-                    {
-                        "local_port": 1234,
-                        "{}_exception".format(which): Sentinel,
-                    }
+            first = threading.Event()
+
+            def open_channel(kind, dest_addr, src_addr):
+                # Only the first connection explodes
+                if first.is_set():
+                    return self._open_channel(kind, dest_addr, src_addr)
+                first.set()
+                if which == "channel_open":
+                    raise Sentinel
+                channel = self._open_channel(kind, dest_addr, src_addr)
+                # Tunnel blows up as soon as the channel is readable
+                return Mock(
+                    wraps=channel,
+                    fileno=channel.fileno,
+                    recv=Mock(side_effect=Sentinel),
+                    recv_into=Mock(side_effect=Sentinel),
                 )
-            except ThreadException as e:
-                # NOTE: ensures that we're getting what we expected and not
-                # some deeper, test-bug related error
-                assert len(e.exceptions) == 1
-                inner = e.exceptions[0]
-                err = "Expected wrapped exception to be Sentinel, was {}"
-                assert inner.type is Sentinel, err.format(inner.type.__name__)
-            else:
-                # no exception happened :( implies the thread went boom but
-                # nobody noticed
-                err = "Failed to get ThreadException on {} error"
-                assert False, err.format(which)
+
+            with patch("fabric.connection.SSHClient") as Client:
+                transport = Client.return_value.get_transport.return_value
+                transport.open_channel.side_effect = open_channel
+                cxn = Connection("host")
+                try:
+                    with cxn.forward_local(self.port, local_host="127.0.0.1"):
+                        local = socket.create_connection(
+                            ("127.0.0.1", self.port)
+                        )
+                        assert first.wait(2)
+                        if which == "tunnel":
+                            self._wait_for_tunnels(1)
+                            self.remote_ends[0].sendall(b"boom")
+                        # Other connections are unaffected
+                        other = self._connect()
+                        other.sendall(b"ok")
+                        assert recv_exactly(self.remote_ends[-1], 2) == b"ok"
+                        local.close()
+                        other.close()
+                except ThreadException as e:
+                    # NOTE: ensures that we're getting what we expected and
+                    # not some deeper, test-bug related error
+                    assert len(e.exceptions) == 1
+                    inner = e.exceptions[0]
+                    err = "Expected wrapped exception to be Sentinel, was {}"
+                    assert inner.type is Sentinel, err.format(
+                        inner.type.__name__
+                    )
+                else:
+                    # no exception happened :( implies the thread went boom
+                    # but nobody noticed
+                    err = "Failed to get ThreadException on {} error"
+                    assert False, err.format(which)
 
         def tunnel_errors_bubble_up(self):
             self._thread_error("tunnel")
 
-        def tunnel_manager_errors_bubble_up(self):
-            self._thread_error("listener")
+        def channel_open_errors_bubble_up(self):
+            self._thread_error("channel_open")
 
-        # TODO: these require additional refactoring of _forward_local to be
-        # more like the decorators in _util
-        def multiple_tunnels_can_be_open_at_once(self):
-            skip()
+        @patch("fabric.connection.SSHClient")
+        def tunnel_manager_errors_bubble_up(self, Client):
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", self.port))
+                sock.listen(1)
+                cxn = Connection("host")
+                try:
+                    with cxn.forward_local(self.port, local_host="127.0.0.1"):
+                        pass
+                except ThreadException as e:
+                    assert len(e.exceptions) == 1
+                    assert issubclass(e.exceptions[0].type, OSError)
+                else:
+                    assert False, "Failed to get ThreadException on bind!"
 
     class forward_remote:
-        @patch("fabric.connection.socket.socket")
-        @patch("fabric.tunnels.select")
+        def setup(self):
+            self.port = free_port()
+            # Stand-in for the local service being forwarded to
+            self.server = socket.socket()
+            self.server.bind(("127.0.0.1", self.port))
+            self.server.listen(5)
+
+        def teardown(self):
+            self.server.close()
+
+        def _remote_connection(self, cxn):
+            # Pretend the Transport called our callback with a Channel
+            call = cxn.transport.request_port_forward.call_args_list[0]
+            ours, theirs = socket.socketpair()
+            call[1]["handler"](ours, tuple(), tuple())
+            self.server.settimeout(2)
+            local, _ = self.server.accept()
+            return theirs, local
+
         @patch("fabric.connection.SSHClient")
-        def _forward_remote(self, kwargs, Client, select, mocket):
+        def _forward_remote(self, kwargs, Client):
             # TODO: unhappy with how much this duplicates of the code under
             # test, re: sig/default vals
-            # Set up parameter values/defaults
             remote_port = kwargs["remote_port"]
             remote_host = kwargs.get("remote_host", "127.0.0.1")
-            local_port = kwargs.get("local_port", remote_port)
-            local_host = kwargs.get("local_host", "localhost")
-            # Mock/etc setup, anything that can be prepped before the forward
-            # occurs (which is most things)
-            tun_socket = mocket.return_value
+            kwargs.setdefault("local_host", "127.0.0.1")
+            kwargs.setdefault("local_port", self.port)
             cxn = Connection("host")
-            # Channel that will yield data when read from
-            chan = Mock()
-            chan.recv.return_value = "data"
-            # And make select() yield it as being ready once, when called
-            select.select.side_effect = _select_result(chan)
             with cxn.forward_remote(**kwargs):
                 # At this point Connection.open() has run and generated a
                 # Transport mock for us (because SSHClient is mocked). Let's
@@ -1363,23 +1708,15 @@ class Connection_:
                 call = cxn.transport.request_port_forward.call_args_list[0]
                 assert call[1]["address"] == remote_host
                 assert call[1]["port"] == remote_port
-                # Pretend the Transport called our callback with mock Channel
-                call[1]["handler"](chan, tuple(), tuple())
-                # Then have to sleep a bit to make sure we give the tunnel
-                # created by that callback to spin up; otherwise ~5% of the
-                # time we exit the contextmanager so fast, the tunnel's "you're
-                # done!" flag is set before it even gets a chance to select()
-                # once.
-                time.sleep(0.01)
-                # And make sure we hooked up to the local socket OK
-                tup = (local_host, local_port)
-                tun_socket.connect.assert_called_once_with(tup)
-            # Expect that our socket got written to by the tunnel (due to the
-            # above-setup select() and channel mocking). Need to do this after
-            # tunnel shutdown or we risk thread ordering issues.
-            tun_socket.sendall.assert_called_once_with("data")
-            # Ensure we closed down the mock socket
-            mocket.return_value.close.assert_called_once_with()
+                # And make sure data flows to & from the local socket OK
+                remote, local = self._remote_connection(cxn)
+                remote.sendall(b"data")
+                assert recv_exactly(local, 4) == b"data"
+                local.sendall(b"reply")
+                assert recv_exactly(remote, 5) == b"reply"
+            # Ensure we closed down both ends
+            assert recv_exactly(local, 1) == b""
+            assert recv_exactly(remote, 1) == b""
             # And that the transport canceled the port forward on the remote
             # end.
             assert cxn.transport.cancel_port_forward.call_count == 1
@@ -1388,11 +1725,16 @@ class Connection_:
             self._forward_remote({"remote_port": 1234})
 
         def distinct_local_port(self):
-            self._forward_remote({"remote_port": 1234, "local_port": 4321})
+            self._forward_remote({"remote_port": 1234})
+
+        def defaults_local_port_to_remote_port(self):
+            self._forward_remote(
+                {"remote_port": self.port, "local_port": None}
+            )
 
         def non_localhost_connections(self):
             self._forward_remote(
-                {"remote_port": 1234, "local_host": "nearby_local_host"}
+                {"remote_port": 1234, "local_host": "0.0.0.0"}
             )
 
         def remote_non_localhost_listener(self):
@@ -1400,13 +1742,66 @@ class Connection_:
                 {"remote_port": 1234, "remote_host": "192.168.1.254"}
             )
 
-        # TODO: these require additional refactoring of _forward_remote to be
-        # more like the decorators in _util
-        def multiple_tunnels_can_be_open_at_once(self):
-            skip()
+        @patch("fabric.connection.SSHClient")
+        def multiple_tunnels_can_be_open_at_once(self, Client):
+            cxn = Connection("host")
+            with cxn.forward_remote(1234, local_port=self.port):
+                pairs = [self._remote_connection(cxn) for _ in range(3)]
+                for i, (remote, local) in enumerate(pairs):
+                    remote.sendall(str(i).encode())
+                for i, (remote, local) in enumerate(pairs):
+                    assert recv_exactly(local, 1) == str(i).encode()
+            for remote, local in pairs:
+                assert recv_exactly(remote, 1) == b""
+                local.close()
 
-        def tunnel_errors_bubble_up(self):
-            skip()
+        @patch("fabric.connection.SSHClient")
+        def yields_manager_with_config_and_byte_counts(self, Client):
+            config = Config(overrides={"tunnels": {"socket_chunk_size": 2}})
+            cxn = Connection("host", config=config)
+            with cxn.forward_remote(1234, local_port=self.port) as tun:
+                remote, local = self._remote_connection(cxn)
+                local.sendall(b"reply")
+                assert recv_exactly(remote, 5) == b"reply"
+            assert tun.tunnel_kwargs["socket_chunk_size"] == 2
+            assert tun.bytes_received == 0
+            assert tun.bytes_sent == 5
+            local.close()
+
+        @patch("fabric.connection.SSHClient")
+        def tunnel_errors_bubble_up(self, Client):
+            class Sentinel(Exception):
+                pass
+
+            cxn = Connection("host")
+            with pytest.raises(ThreadException) as info:
+                with cxn.forward_remote(1234, local_port=self.port):
+                    call = cxn.transport.request_port_forward.call_args[1]
+                    ours, theirs = socket.socketpair()
+                    channel = Mock(
+                        wraps=ours,
+                        fileno=ours.fileno,
+                        recv=Mock(side_effect=Sentinel),
+                        recv_into=Mock(side_effect=Sentinel),
+                    )
+                    call["handler"](channel, tuple(), tuple())
+                    theirs.sendall(b"boom")
+                    time.sleep(0.05)
+            assert info.value.exceptions[0].type is Sentinel
+            # Still canceled the forward
+            assert cxn.transport.cancel_port_forward.call_count == 1
+
+        @patch("fabric.connection.SSHClient")
+        def local_connect_errors_close_channel(self, Client):
+            self.server.close()
+            cxn = Connection("host")
+            with cxn.forward_remote(1234, local_port=self.port):
+                call = cxn.transport.request_port_forward.call_args[1]
+                channel = Mock()
+                with pytest.raises(ConnectionRefusedError):
+                    call["handler"](channel, tuple(), tuple())
+                channel.close.assert_called_once_with()
 
+        # TODO: this would require a much more involved fake sshd
         def listener_errors_bubble_up(self):
             skip()
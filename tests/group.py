@@ -1,14 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import os
+import pickle
+import shutil
+import stat
+import subprocess
+import tempfile
+from threading import Event, Lock
+import time
 from unittest.mock import Mock, patch, call
 from pytest import mark, raises
 
-from fabric import Connection, Group, SerialGroup, ThreadingGroup, GroupResult
-from fabric.group import thread_worker
+from invoke.exceptions import UnexpectedExit
+
+from fabric import (
+    Config,
+    Connection,
+    Group,
+    GroupResult,
+    ProcessPoolGroup,
+    SerialGroup,
+    ThreadingGroup,
+)
+from fabric.group import thread_worker, GroupResultIterator, _put_path
 from fabric.exceptions import GroupException
+from fabric.runners import Result
+
+from _util import FakeSFTPStore, LocalChannel
 
 
 RUNNER_METHODS = ("run", "sudo")
 TRANSFER_METHODS = ("put", "get")
 ALL_METHODS = RUNNER_METHODS + TRANSFER_METHODS
+ITER_METHODS = tuple("{}_iter".format(x) for x in ALL_METHODS)
 runner_args = ("command",)
 runner_kwargs = dict(hide=True, warn=True)
 transfer_args = tuple()
@@ -45,12 +69,37 @@ class Group_:
             assert g[1].user == "admin"
             assert g[1].forward_agent is True
 
+        def members_get_their_own_Config_by_default(self):
+            g = Group("foo", "bar")
+            assert isinstance(g[0].config, Config)
+            assert g[0].config is not g[1].config
+            g[0].config.run.echo = True
+            assert g[1].config.run.echo is False
+
+        def member_configs_share_ssh_config_and_gateways(self):
+            g = Group("foo", "bar", config=None)
+            assert g[0].config.base_ssh_config is g[1].config.base_ssh_config
+            assert g[0].config._gateways is g[1].config._gateways
+
+        def given_config_is_still_used_as_is(self):
+            config = Config()
+            g = Group("foo", "bar", config=config)
+            assert g[0].config is config
+            assert g[1].config is config
+
     class from_connections:
         def inits_from_iterable_of_Connections(self):
             g = Group.from_connections((Connection("foo"), Connection("bar")))
             assert len(g) == 2
             assert g[1].host == "bar"
 
+        def forwards_kwargs_to_constructor(self):
+            g = ThreadingGroup.from_connections(
+                (Connection("foo"), Connection("bar")), max_workers=1
+            )
+            assert len(g) == 2
+            assert g.max_workers == 1
+
     def acts_like_an_iterable_of_Connections(self):
         g = Group("foo", "bar", "biz")
         assert g[0].host == "foo"
@@ -65,6 +114,97 @@ class Group_:
         with raises(NotImplementedError):
             getattr(group, method)()
 
+    @mark.parametrize("method", ITER_METHODS)
+    def abstract_iter_methods_not_implemented(self, method):
+        group = Group()
+        with raises(NotImplementedError):
+            getattr(group, method)()
+
+    class get_iter:
+        def local_defaults_to_host_interpolated_path(self):
+            g = Group("host1", "host2")
+            g._iter_do = Mock(return_value=[])
+            g.get_iter(remote="whatever")
+            g._iter_do.assert_called_with(
+                "get", remote="whatever", local="{host}/"
+            )
+
+    class open:
+        def _cxns(self, count=3, delay=0):
+            self.opened = []
+            self.lock = Lock()
+            self.active = self.peak = 0
+
+            def opener(cxn):
+                def open_():
+                    with self.lock:
+                        self.opened.append((cxn, time.monotonic()))
+                        self.active += 1
+                        self.peak = max(self.peak, self.active)
+                    time.sleep(delay)
+                    with self.lock:
+                        self.active -= 1
+
+                return open_
+
+            cxns = []
+            for i in range(count):
+                cxn = Mock(name="host{}".format(i), is_connected=False)
+                cxn.open.side_effect = opener(cxn)
+                cxns.append(cxn)
+            return cxns
+
+        def opens_every_member_and_reports_latencies(self):
+            cxns = self._cxns()
+            results = Group.from_connections(cxns).open()
+            assert isinstance(results, GroupResult)
+            assert set(results) == set(cxns)
+            assert all(isinstance(x, float) for x in results.values())
+            for cxn in cxns:
+                cxn.open.assert_called_once_with()
+
+        def skips_connected_members(self):
+            cxns = self._cxns()
+            cxns[0].is_connected = True
+            results = Group.from_connections(cxns).open()
+            assert results[cxns[0]] == 0.0
+            assert not cxns[0].open.called
+
+        def failures_raise_GroupException(self):
+            cxns = self._cxns()
+            oops = OSError("no route to host")
+            cxns[1].open.side_effect = oops
+            with raises(GroupException) as info:
+                Group.from_connections(cxns).open()
+            result = info.value.result
+            assert result.failed == {cxns[1]: oops}
+            assert len(result.succeeded) == 2
+
+        def concurrency_limits_simultaneous_handshakes(self):
+            cxns = self._cxns(count=6, delay=0.05)
+            Group.from_connections(cxns).open(concurrency=2)
+            assert self.peak == 2
+            assert len(self.opened) == 6
+
+        def rate_limits_handshake_starts(self):
+            cxns = self._cxns(count=4)
+            Group.from_connections(cxns).open(rate=20)
+            stamps = sorted(x[1] for x in self.opened)
+            gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+            # ~50ms apart, give or take scheduling jitter
+            assert all(x > 0.04 for x in gaps)
+
+        def empty_groups_are_fine(self):
+            assert Group().open() == {}
+
+        def is_a_no_op_for_ProcessPoolGroup(self):
+            group = ProcessPoolGroup("host1", "host2")
+            with patch.object(Connection, "open") as open_:
+                result = group.open(concurrency=1)
+            assert not open_.called
+            assert result == {group[0]: 0.0, group[1]: 0.0}
+            assert not result.failed
+
     class close_and_contextmanager_behavior:
         def close_closes_all_member_connections(self):
             cxns = [Mock(name=x) for x in ("foo", "bar", "biz")]
@@ -105,6 +245,311 @@ class Group_:
                 # Doesn't stomp given local arg
                 g._do.assert_called_with("get", remote="whatever", local="lol")
 
+    class put_broadcast:
+        def setup(self):
+            # Every member gets its own fake remote filesystem
+            self.stores = []
+            self.patcher = patch(
+                "fabric.connection.SSHClient", side_effect=self._client
+            )
+            self.patcher.start()
+            self.data = bytes(range(256)) * 300
+
+        def teardown(self):
+            self.patcher.stop()
+
+        def _client(self):
+            store = FakeSFTPStore()
+            self.stores.append(store)
+            client = Mock()
+            client.open_sftp.side_effect = store.session
+            return client
+
+        def _local(self, tmp_path, data=None, mode=0o640):
+            path = tmp_path / "artifact.tgz"
+            path.write_bytes(self.data if data is None else data)
+            os.chmod(str(path), mode)
+            return str(path)
+
+        def _calls(self, kind):
+            return [
+                call
+                for store in self.stores
+                for sftp in store.sessions
+                for call in sftp.calls
+                if call[0] == kind
+            ]
+
+        @mark.parametrize("klass", (SerialGroup, ThreadingGroup))
+        def uploads_to_every_member(self, tmp_path, klass):
+            local = self._local(tmp_path)
+            group = klass("host1", "host2", "host3")
+            results = group.put_broadcast(local)
+            assert len(results) == 3
+            for store in self.stores:
+                assert store.data("/remote/artifact.tgz") == self.data
+            for cxn, result in results.items():
+                assert result.connection is cxn
+                assert result.local == local
+                assert result.remote == "/remote/artifact.tgz"
+                assert result.size == len(self.data)
+                assert result.throughput
+
+        def reads_source_only_once(self, tmp_path):
+            local = self._local(tmp_path)
+            group = ThreadingGroup("host1", "host2", "host3")
+            with patch("fabric.group.open", create=True, wraps=open) as opener:
+                with patch("fabric.transfer.open", create=True) as other:
+                    group.put_broadcast(local)
+            opener.assert_called_once_with(local, "rb")
+            assert not other.called
+
+        def honors_remote_path(self, tmp_path):
+            group = SerialGroup("host1", "host2")
+            results = group.put_broadcast(self._local(tmp_path), "release.tgz")
+            assert {x.remote for x in results.values()} == {
+                "/remote/release.tgz"
+            }
+
+        def preserves_mode_by_default(self, tmp_path):
+            SerialGroup("host1", "host2").put_broadcast(self._local(tmp_path))
+            assert (
+                self._calls("chmod")
+                == [("chmod", "/remote/artifact.tgz", 0o640)] * 2
+            )
+            for store in self.stores:
+                assert store.mode("/remote/artifact.tgz") & 0o777 == 0o640
+
+        def allows_disabling_mode_preservation(self, tmp_path):
+            group = SerialGroup("host1", "host2")
+            group.put_broadcast(self._local(tmp_path), preserve_mode=False)
+            assert not self._calls("chmod")
+
+        def accepts_file_like_objects(self):
+            fd = BytesIO(b"in memory")
+            fd.name = "blob"
+            SerialGroup("host1", "host2").put_broadcast(fd)
+            for store in self.stores:
+                assert store.data("/remote/blob") == b"in memory"
+            assert not self._calls("chmod")
+
+        def empty_files_work(self, tmp_path):
+            local = self._local(tmp_path, data=b"")
+            ThreadingGroup("host1", "host2").put_broadcast(local)
+            for store in self.stores:
+                assert store.data("/remote/artifact.tgz") == b""
+
+        def failures_are_collected_per_host(self, tmp_path):
+            local = self._local(tmp_path)
+            group = ThreadingGroup("host1", "host2", "host3")
+            # host2's filesystem has no working directory to upload into
+            self.stores[1].dirs.clear()
+            with raises(GroupException) as info:
+                group.put_broadcast(local)
+            result = info.value.result
+            assert set(result.failed) == {group[1]}
+            assert set(result.succeeded) == {group[0], group[2]}
+            assert self.stores[2].data("/remote/artifact.tgz") == self.data
+
+        def process_pools_read_per_worker_instead(self):
+            group = ProcessPoolGroup("host1")
+            with patch.object(ProcessPoolGroup, "_do") as do:
+                group.put_broadcast("local", "remote")
+            do.assert_called_once_with(_put_path, "local", "remote", True)
+
+    class put_relay:
+        # Hosts are directories under a temp root; the "SSH" between them is
+        # a script which runs the relayed command in the target's directory.
+        def setup(self):
+            self.root = tempfile.mkdtemp()
+            self.ssh = os.path.join(self.root, "fakessh")
+            with open(self.ssh, "w") as fd:
+                fd.write(FAKE_SSH)
+            os.chmod(self.ssh, 0o755)
+            self.local = os.path.join(self.root, "artifact.tgz")
+            self.data = os.urandom(200000)
+            with open(self.local, "wb") as fd:
+                fd.write(self.data)
+            os.chmod(self.local, 0o640)
+            self.sessions = []
+            self.patchers = [
+                patch.object(Connection, "open"),
+                patch.object(
+                    Connection,
+                    "create_session",
+                    autospec=True,
+                    side_effect=self._session,
+                ),
+                patch.object(
+                    Connection, "run", autospec=True, side_effect=self._run
+                ),
+            ]
+            for patcher in self.patchers:
+                patcher.start()
+
+        def teardown(self):
+            for patcher in self.patchers:
+                patcher.stop()
+            shutil.rmtree(self.root)
+
+        def _group(self, count):
+            hosts = ["host{}".format(i) for i in range(count)]
+            for host in hosts:
+                os.mkdir(os.path.join(self.root, host))
+            return SerialGroup(*hosts)
+
+        def _session(self, cxn):
+            self.sessions.append(cxn.host)
+            return LocalChannel(os.path.join(self.root, cxn.host))
+
+        def _run(self, cxn, command, **kwargs):
+            proc = subprocess.run(
+                command,
+                shell=True,
+                cwd=os.path.join(self.root, cxn.host),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            return Mock(stdout=proc.stdout)
+
+        def _relay(self, group, **kwargs):
+            kwargs.setdefault("ssh_command", self.ssh)
+            return group.put_relay(self.local, "artifact.tgz", **kwargs)
+
+        def _copy(self, host):
+            path = os.path.join(self.root, host, "artifact.tgz")
+            with open(path, "rb") as fd:
+                return fd.read()
+
+        def delivers_to_every_member(self):
+            group = self._group(7)
+            results = self._relay(group)
+            assert set(results.succeeded) == set(group)
+            for cxn, result in results.items():
+                assert self._copy(cxn.host) == self.data
+                assert result.connection is cxn
+                assert result.local == self.local
+                assert result.size == len(self.data)
+
+        def only_streams_directly_to_seeds(self):
+            self._relay(self._group(7), fanout=3)
+            assert self.sessions == ["host0", "host1", "host2"]
+
+        def fanout_of_one_is_a_pipeline(self):
+            group = self._group(4)
+            self._relay(group, fanout=1)
+            assert self.sessions == ["host0"]
+            for cxn in group:
+                assert self._copy(cxn.host) == self.data
+
+        def tree_follows_member_order(self):
+            group = self._group(7)
+            self._relay(group)
+            # host0 relays to host2 & host3, host1 to host4 & host5, host2 to
+            # host6; the rest are leaves.
+            with open(os.path.join(self.root, "hops")) as fd:
+                hops = sorted(fd.read().split())
+            assert hops == ["host2", "host3", "host4", "host5", "host6"]
+
+        def commands_stay_small_however_deep_the_tree(self):
+            group = self._group(24)
+            self._relay(group, fanout=1)
+            for cxn in group:
+                assert self._copy(cxn.host) == self.data
+            with open(os.path.join(self.root, "lengths")) as fd:
+                lengths = [int(x) for x in fd.read().split()]
+            assert len(lengths) == 23
+            assert max(lengths) < 100
+
+        def newlines_in_paths_are_rejected(self):
+            with raises(ValueError):
+                self._group(2).put_relay(self.local, "a\nb")
+
+        def preserves_mode_by_default(self):
+            group = self._group(3)
+            self._relay(group)
+            path = os.path.join(self.root, "host2", "artifact.tgz")
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+        def failures_are_confined_to_their_subtree(self):
+            group = self._group(5)
+            # host0 relays to host2 & host3; take host3 away entirely.
+            shutil.rmtree(os.path.join(self.root, "host3"))
+            with raises(GroupException) as info:
+                self._relay(group)
+            failed = info.value.result.failed
+            assert [x.host for x in failed] == ["host3"]
+            for host in ("host0", "host1", "host2", "host4"):
+                assert self._copy(host) == self.data
+
+        def corrupt_copies_fail_verification(self):
+            group = self._group(3)
+            with patch("fabric.group._relay_to") as relay:
+                # Nothing actually streamed; leave a bogus copy behind
+                for cxn in group:
+                    path = os.path.join(self.root, cxn.host, "artifact.tgz")
+                    with open(path, "wb") as fd:
+                        fd.write(b"nope")
+                with raises(GroupException) as info:
+                    self._relay(group)
+            assert relay.call_count == 2
+            errors = info.value.result.failed.values()
+            assert len(errors) == 3
+            assert all("Checksum mismatch" in str(x) for x in errors)
+
+        def fanout_must_be_positive(self):
+            with raises(ValueError):
+                self._relay(self._group(2), fanout=0)
+
+
+FAKE_SSH = """#!/bin/sh
+# Usage: fakessh -p <port> <user>@<host> <command>
+shift 2
+host=${1#*@}
+root=$(dirname "$0")
+echo "$host" >> "$root/hops"
+echo "${#2}" >> "$root/lengths"
+cd "$root/$host" && exec sh -c "$2"
+"""
+
+
+class LocalConnection(Connection):
+    """
+    Network-free Connection whose run() reports where it executed.
+
+    Defined at module level so it can be pickled into worker processes.
+    """
+
+    def run(self, command, **kwargs):
+        if command == "fail":
+            raise UnexpectedExit(
+                Result(connection=self, command=command, exited=1)
+            )
+        if command == "unpicklable":
+            raise Exception(Lock())
+        return Result(
+            connection=self,
+            command=command,
+            stdout="{}\n".format(os.getpid()),
+            exited=0,
+        )
+
+
+class PicklingExecutor(ThreadPoolExecutor):
+    """
+    In-process stand-in for ProcessPoolExecutor that still round-trips
+    arguments and return values through pickle, as a real one would.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        args, kwargs = pickle.loads(pickle.dumps((args, kwargs)))
+
+        def body():
+            return pickle.loads(pickle.dumps(fn(*args, **kwargs)))
+
+        return super().submit(body)
+
 
 def _make_serial_tester(method, cxns, index, args, kwargs):
     args = args[:]
@@ -178,6 +623,27 @@ class SerialGroup_:
         assert result.succeeded == expected
         assert result.failed == {}
 
+    class iter_methods:
+        @mark.parametrize("method", ALL_METHODS)
+        def yields_pairs_in_order(self, method):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+            g = SerialGroup.from_connections(cxns)
+            stream = getattr(g, method + "_iter")("whatever")
+            assert isinstance(stream, GroupResultIterator)
+            expected = [(x, getattr(x, method).return_value) for x in cxns]
+            assert list(stream) == expected
+
+        @mark.parametrize("method", ALL_METHODS)
+        def yields_exceptions_instead_of_raising(self, method):
+            cxns = [Mock(name=x) for x in ("host1", "host2")]
+            onoz = Exception("onoz")
+            getattr(cxns[0], method).side_effect = onoz
+            g = SerialGroup.from_connections(cxns)
+            stream = getattr(g, method + "_iter")("whatever")
+            assert next(stream) == (cxns[0], onoz)
+            assert stream.result.failed == {cxns[0]: onoz}
+            assert list(stream.result.succeeded) == [cxns[1]]
+
 
 class ThreadingGroup_:
     def setup(self):
@@ -297,3 +763,178 @@ class ThreadingGroup_:
         assert result == expected
         assert result.succeeded == expected
         assert result.failed == {}
+
+    class max_workers:
+        def defaults_to_None(self):
+            assert ThreadingGroup("host1").max_workers is None
+
+        def is_not_forwarded_to_Connections(self):
+            g = ThreadingGroup("host1", "host2", max_workers=1, user="admin")
+            assert g.max_workers == 1
+            assert g[0].user == "admin"
+
+        @mark.parametrize("method", ALL_METHODS)
+        def bounds_number_of_in_flight_connections(self, method):
+            lock = Lock()
+            state = dict(current=0, peak=0)
+
+            def busy(*args, **kwargs):
+                with lock:
+                    state["current"] += 1
+                    state["peak"] = max(state["peak"], state["current"])
+                time.sleep(0.01)
+                with lock:
+                    state["current"] -= 1
+
+            cxns = [Mock(name="host{}".format(x)) for x in range(10)]
+            for cxn in cxns:
+                getattr(cxn, method).side_effect = busy
+            g = ThreadingGroup.from_connections(cxns, max_workers=3)
+            getattr(g, method)(
+                *ARGS_BY_METHOD[method], **KWARGS_BY_METHOD[method]
+            )
+            assert state["peak"] <= 3
+            for cxn in cxns:
+                getattr(cxn, method).assert_called_once_with(
+                    *ARGS_BY_METHOD[method], **KWARGS_BY_METHOD[method]
+                )
+
+        @mark.parametrize("method", ALL_METHODS)
+        def returns_results_mapping(self, method):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+            g = ThreadingGroup.from_connections(cxns, max_workers=2)
+            result = getattr(g, method)("whatever", hide=True)
+            assert isinstance(result, GroupResult)
+            expected = {x: getattr(x, method).return_value for x in cxns}
+            assert result == expected
+            assert result.failed == {}
+
+        @mark.parametrize("method", ALL_METHODS)
+        def captures_errors_per_connection(self, method):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+
+            class OhNoz(Exception):
+                pass
+
+            onoz = OhNoz()
+            getattr(cxns[1], method).side_effect = onoz
+            g = ThreadingGroup.from_connections(cxns, max_workers=2)
+            with raises(GroupException) as info:
+                getattr(g, method)("whatever", hide=True)
+            result = info.value.result
+            assert result.failed == {cxns[1]: onoz}
+            assert set(result.succeeded) == {cxns[0], cxns[2]}
+
+    class iter_methods:
+        @mark.parametrize("method", ALL_METHODS)
+        def yields_each_result_once(self, method):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+            g = ThreadingGroup.from_connections(cxns)
+            pairs = list(getattr(g, method + "_iter")("whatever"))
+            expected = {x: getattr(x, method).return_value for x in cxns}
+            assert dict(pairs) == expected
+            assert len(pairs) == 3
+
+        def yields_fast_results_before_slow_ones_finish(self):
+            # The slow host won't finish until the consumer has seen the fast
+            # host's result; a non-streaming implementation would deadlock
+            # here (hence the timeout on the wait).
+            seen_fast = Event()
+            fast, slow = Mock(name="fast"), Mock(name="slow")
+
+            def wait_for_fast(*args, **kwargs):
+                if not seen_fast.wait(timeout=1):
+                    raise Exception("Results were not streamed!")
+                return "slow result"
+
+            slow.run.side_effect = wait_for_fast
+            g = ThreadingGroup.from_connections([slow, fast])
+            stream = g.run_iter("whatever")
+            cxn, value = next(stream)
+            assert cxn is fast
+            seen_fast.set()
+            assert next(stream) == (slow, "slow result")
+            assert stream.result.failed == {}
+
+        def honors_max_workers(self):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+            g = ThreadingGroup.from_connections(cxns, max_workers=1)
+            # Single worker means completion order == member order
+            assert [x[0] for x in g.run_iter("whatever")] == cxns
+
+        def result_drains_remaining_values(self):
+            cxns = [Mock(name=x) for x in ("host1", "host2", "host3")]
+            onoz = Exception("onoz")
+            cxns[2].run.side_effect = onoz
+            g = ThreadingGroup.from_connections(cxns)
+            result = g.run_iter("whatever").result
+            assert isinstance(result, GroupResult)
+            assert len(result) == 3
+            assert result.failed == {cxns[2]: onoz}
+
+
+class ProcessPoolGroup_:
+    def init_pops_own_kwargs(self):
+        g = ProcessPoolGroup("host1", "host2", processes=2, threads=4)
+        assert g.processes == 2
+        assert g.threads == 4
+        assert len(g) == 2
+
+    def members_are_picklable_even_when_open(self):
+        cxn = Connection("admin@host1:2222")
+        cxn.transport = Mock()
+        cxn._sftp = Mock()
+        clone = pickle.loads(pickle.dumps(cxn))
+        assert clone == cxn
+        assert clone.transport is None
+        assert clone.client is not cxn.client
+        assert not clone.is_connected
+
+    @patch("fabric.group.ProcessPoolExecutor", PicklingExecutor)
+    def results_point_at_parent_members(self):
+        g = ProcessPoolGroup.from_connections(
+            [LocalConnection("host{}".format(x)) for x in range(5)],
+            processes=2,
+        )
+        result = g.run("whatever")
+        assert set(result) == set(g)
+        for cxn, value in result.items():
+            assert any(value.connection is x for x in g)
+            assert value.connection is cxn
+            assert value.command == "whatever"
+
+    @patch("fabric.group.ProcessPoolExecutor", PicklingExecutor)
+    def failures_raise_GroupException(self):
+        g = ProcessPoolGroup.from_connections(
+            [LocalConnection("host1")], processes=1
+        )
+        with raises(GroupException) as info:
+            g.run("fail")
+        ((cxn, exc),) = info.value.result.failed.items()
+        assert cxn is g[0]
+        assert isinstance(exc, UnexpectedExit)
+        assert exc.result.connection is g[0]
+
+    @patch("fabric.group.ProcessPoolExecutor", PicklingExecutor)
+    def unpicklable_exceptions_are_degraded(self):
+        g = ProcessPoolGroup.from_connections(
+            [LocalConnection("host1")], processes=1
+        )
+        with raises(GroupException) as info:
+            g.run("unpicklable")
+        exc = info.value.result[g[0]]
+        assert type(exc) is Exception
+        assert "raised in worker process" in str(exc)
+
+    def empty_group_is_a_noop(self):
+        assert ProcessPoolGroup().run("whatever") == {}
+
+    def actually_uses_other_processes(self):
+        g = ProcessPoolGroup.from_connections(
+            [LocalConnection("host{}".format(x)) for x in range(4)],
+            processes=2,
+        )
+        result = g.run_iter("whatever").result
+        assert len(result) == 4
+        pids = {int(x.stdout) for x in result.values()}
+        assert os.getpid() not in pids
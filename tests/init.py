@@ -1,5 +1,14 @@
 import fabric
-from fabric import _version, connection, runners, group, tasks, executor, auth
+from fabric import (
+    _version,
+    aio,
+    auth,
+    connection,
+    executor,
+    group,
+    runners,
+    tasks,
+)
 
 
 class init:
@@ -33,9 +42,18 @@ class init:
     def ThreadingGroup(self):
         assert fabric.ThreadingGroup is group.ThreadingGroup
 
+    def ProcessPoolGroup(self):
+        assert fabric.ProcessPoolGroup is group.ProcessPoolGroup
+
     def GroupResult(self):
         assert fabric.GroupResult is group.GroupResult
 
+    def AsyncConnection(self):
+        assert fabric.AsyncConnection is aio.AsyncConnection
+
+    def AsyncGroup(self):
+        assert fabric.AsyncGroup is aio.AsyncGroup
+
     def task(self):
         assert fabric.task is tasks.task
 
@@ -0,0 +1,159 @@
+import pickle
+import socket
+from unittest.mock import patch
+
+from pytest import raises
+
+from fabric.net import DNSCache, connect, interleave
+
+
+def _info(family, address):
+    return (family, socket.SOCK_STREAM, 6, "", address)
+
+
+def _listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(5)
+    return sock
+
+
+def _refused():
+    # An address nothing is listening on (anymore).
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+class DNSCache_:
+    def setup(self):
+        self.cache = DNSCache()
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def resolves_via_getaddrinfo(self, getaddrinfo):
+        infos = self.cache.resolve("host", 22)
+        getaddrinfo.assert_called_once_with(
+            "host", 22, socket.AF_UNSPEC, socket.SOCK_STREAM
+        )
+        assert infos is getaddrinfo.return_value
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def caches_per_host_port_and_family(self, getaddrinfo):
+        self.cache.resolve("host", 22)
+        self.cache.resolve("host", 22)
+        assert getaddrinfo.call_count == 1
+        self.cache.resolve("host", 2222)
+        self.cache.resolve("host", 22, family=socket.AF_INET)
+        assert getaddrinfo.call_count == 3
+        assert len(self.cache) == 3
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def entries_expire_after_ttl(self, getaddrinfo):
+        with patch("fabric.net.time.monotonic", return_value=100):
+            self.cache.resolve("host", 22, ttl=5)
+        with patch("fabric.net.time.monotonic", return_value=104):
+            self.cache.resolve("host", 22, ttl=5)
+        assert getaddrinfo.call_count == 1
+        with patch("fabric.net.time.monotonic", return_value=105):
+            self.cache.resolve("host", 22, ttl=5)
+        assert getaddrinfo.call_count == 2
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def zero_ttl_disables_caching(self, getaddrinfo):
+        self.cache.resolve("host", 22, ttl=0)
+        self.cache.resolve("host", 22, ttl=0)
+        assert getaddrinfo.call_count == 2
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def failures_are_not_cached(self, getaddrinfo):
+        getaddrinfo.side_effect = [socket.gaierror("nope"), []]
+        with raises(socket.gaierror):
+            self.cache.resolve("host", 22)
+        assert self.cache.resolve("host", 22) == []
+
+    @patch("fabric.net.socket.getaddrinfo")
+    def clear_forgets_everything(self, getaddrinfo):
+        self.cache.resolve("host", 22)
+        self.cache.clear()
+        assert len(self.cache) == 0
+
+    def survives_pickling(self):
+        assert len(pickle.loads(pickle.dumps(self.cache))) == 0
+
+
+class interleave_:
+    def alternates_families_starting_with_the_first(self):
+        v6 = [_info(socket.AF_INET6, ("::{}".format(x), 22)) for x in "123"]
+        v4 = [_info(socket.AF_INET, ("10.0.0.{}".format(x), 22)) for x in "12"]
+        result = interleave(v6 + v4)
+        assert result == [v6[0], v4[0], v6[1], v4[1], v6[2]]
+
+    def leaves_single_family_alone(self):
+        v4 = [_info(socket.AF_INET, ("10.0.0.{}".format(x), 22)) for x in "12"]
+        assert interleave(v4) == v4
+
+
+class connect_:
+    def setup(self):
+        self.listener = _listener()
+        self.address = self.listener.getsockname()
+
+    def teardown(self):
+        self.listener.close()
+
+    def returns_connected_blocking_socket(self):
+        sock = connect([_info(socket.AF_INET, self.address)])
+        try:
+            assert sock.getpeername() == self.address
+            assert sock.gettimeout() is None
+        finally:
+            sock.close()
+
+    def skips_past_dead_addresses_without_waiting(self):
+        infos = [
+            _info(socket.AF_INET, _refused()),
+            _info(socket.AF_INET, self.address),
+        ]
+        # Long delay: moving on promptly relies on noticing the failure.
+        sock = connect(infos, timeout=5, delay=30)
+        try:
+            assert sock.getpeername() == self.address
+        finally:
+            sock.close()
+
+    def raises_last_error_if_all_fail(self):
+        infos = [_info(socket.AF_INET, _refused()) for _ in range(2)]
+        with raises(ConnectionRefusedError):
+            connect(infos, timeout=5)
+
+    def requires_addresses(self):
+        with raises(OSError):
+            connect([])
+
+    def closes_losing_attempts(self):
+        other = _listener()
+        made = []
+        real = socket.socket
+
+        def make(*args):
+            made.append(real(*args))
+            return made[-1]
+
+        infos = [
+            _info(socket.AF_INET, self.address),
+            _info(socket.AF_INET, other.getsockname()),
+        ]
+        try:
+            with patch("fabric.net.socket.socket", side_effect=make):
+                sock = connect(infos, delay=0)
+            assert sock in made
+            assert all(x.fileno() == -1 for x in made if x is not sock)
+            sock.close()
+        finally:
+            other.close()
+
+    def honors_overall_timeout(self):
+        with raises(socket.timeout):
+            connect([_info(socket.AF_INET, self.address)], timeout=0)
@@ -0,0 +1,196 @@
+from threading import Event, Thread
+import time
+from unittest.mock import Mock, patch
+
+from fabric.pool import ConnectionPool, PoolEntry
+
+
+def _client(active=True):
+    client = Mock(name="client")
+    client.get_transport.return_value.is_active.return_value = active
+    return client
+
+
+class ConnectionPool_:
+    def setup(self):
+        self.pool = ConnectionPool()
+
+    def starts_empty(self):
+        assert len(self.pool) == 0
+        assert self.pool.acquire("key") is None
+
+    def registered_clients_may_be_acquired(self):
+        client = _client()
+        assert self.pool.register("key", client) is True
+        assert "key" in self.pool
+        assert self.pool.acquire("key") is client
+
+    def register_refuses_to_replace_live_client(self):
+        first, second = _client(), _client()
+        self.pool.register("key", first)
+        assert self.pool.register("key", second) is False
+        assert self.pool.acquire("key") is first
+
+    def register_replaces_dead_client(self):
+        dead, live = _client(active=False), _client()
+        self.pool.register("key", dead)
+        assert self.pool.register("key", live) is True
+        dead.close.assert_called_once_with()
+        assert self.pool.acquire("key") is live
+
+    class liveness:
+        def setup(self):
+            self.pool = ConnectionPool()
+
+        def inactive_transports_are_discarded(self):
+            client = _client(active=False)
+            self.pool.register("key", client)
+            assert self.pool.acquire("key") is None
+            client.close.assert_called_once_with()
+            assert "key" not in self.pool
+
+        def failing_ignore_probe_is_discarded(self):
+            client = _client()
+            transport = client.get_transport.return_value
+            transport.send_ignore.side_effect = EOFError
+            self.pool.register("key", client)
+            assert self.pool.acquire("key") is None
+            client.close.assert_called_once_with()
+
+        def missing_transport_is_discarded(self):
+            client = _client()
+            client.get_transport.return_value = None
+            self.pool.register("key", client)
+            assert self.pool.acquire("key") is None
+
+    class locking:
+        # Network-bound work happens outside the pool's lock.
+        def setup(self):
+            self.pool = ConnectionPool()
+            self.entered = Event()
+            self.unblock = Event()
+
+        def _blocking(self, *args):
+            self.entered.set()
+            assert self.unblock.wait(5)
+
+        def _in_thread(self, func, *args):
+            thread = Thread(target=func, args=args, daemon=True)
+            thread.start()
+            assert self.entered.wait(5)
+            return thread
+
+        def slow_liveness_probes_do_not_block_others(self):
+            slow, other = _client(), _client()
+            slow.get_transport().send_ignore.side_effect = self._blocking
+            self.pool.register("slow", slow)
+            self.pool.register("other", other)
+            thread = self._in_thread(self.pool.acquire, "slow")
+            try:
+                start = time.monotonic()
+                assert self.pool.acquire("other") is other
+                self.pool.release("other", other)
+                assert self.pool.register("new", _client()) is True
+                assert time.monotonic() - start < 1
+            finally:
+                self.unblock.set()
+                thread.join(5)
+
+        def slow_closes_do_not_block_others(self):
+            slow, other = _client(), _client()
+            slow.close.side_effect = self._blocking
+            self.pool.register("slow", slow)
+            self.pool.register("other", other)
+            thread = self._in_thread(self.pool.release, "slow", slow, 0)
+            try:
+                start = time.monotonic()
+                assert "slow" not in self.pool
+                assert self.pool.acquire("other") is other
+                assert time.monotonic() - start < 1
+            finally:
+                self.unblock.set()
+                thread.join(5)
+
+        def entries_being_probed_are_not_evicted(self):
+            client = _client()
+            self.pool.register("key", client)
+            self.pool.release("key", client)
+            transport = client.get_transport()
+            transport.send_ignore.side_effect = self._blocking
+            thread = self._in_thread(self.pool.acquire, "key")
+            try:
+                # Would evict the idle entry, were acquire not holding it
+                self.pool.register("other", _client())
+                self.pool.release("other", Mock(), max_size=0)
+                assert "key" in self.pool
+            finally:
+                self.unblock.set()
+                thread.join(5)
+            assert not client.close.called
+
+    class release:
+        def setup(self):
+            self.pool = ConnectionPool()
+
+        def keeps_client_open_by_default(self):
+            client = _client()
+            self.pool.register("key", client)
+            self.pool.release("key", client)
+            assert not client.close.called
+            assert self.pool.acquire("key") is client
+
+        def zero_idle_timeout_closes_once_unused(self):
+            client = _client()
+            self.pool.register("key", client)
+            assert self.pool.acquire("key") is client  # 2 refs
+            self.pool.release("key", client, idle_timeout=0)
+            assert not client.close.called
+            self.pool.release("key", client, idle_timeout=0)
+            client.close.assert_called_once_with()
+            assert "key" not in self.pool
+
+        @patch("fabric.pool.time")
+        def idle_timeout_expires_lazily(self, time):
+            time.monotonic.return_value = 100
+            client = _client()
+            self.pool.register("key", client)
+            self.pool.release("key", client, idle_timeout=30)
+            time.monotonic.return_value = 120
+            assert self.pool.acquire("key") is client
+            self.pool.release("key", client, idle_timeout=30)
+            time.monotonic.return_value = 160
+            assert self.pool.acquire("key") is None
+            client.close.assert_called_once_with()
+
+        def max_size_evicts_least_recently_used_idle_clients(self):
+            clients = [_client() for _ in range(3)]
+            for i, client in enumerate(clients):
+                self.pool.register(i, client)
+            # Client 1 stays in use; 0 goes idle before 2
+            self.pool.release(0, clients[0])
+            self.pool.release(2, clients[2], max_size=1)
+            clients[0].close.assert_called_once_with()
+            clients[2].close.assert_called_once_with()
+            assert not clients[1].close.called
+            assert len(self.pool) == 1
+
+        def unknown_clients_are_simply_closed(self):
+            client = _client()
+            self.pool.release("key", client)
+            client.close.assert_called_once_with()
+
+    def clear_closes_everything(self):
+        clients = [_client(), _client()]
+        for i, client in enumerate(clients):
+            self.pool.register(i, client)
+        self.pool.clear()
+        assert len(self.pool) == 0
+        for client in clients:
+            client.close.assert_called_once_with()
+
+
+class PoolEntry_:
+    def in_use_entries_never_expire(self):
+        entry = PoolEntry(_client())
+        entry.idle_timeout = 0
+        assert not entry.expired
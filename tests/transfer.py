@@ -1,12 +1,21 @@
-from io import StringIO
+from io import BytesIO, StringIO
+import os
+import posixpath
+import shutil
+import stat
+import subprocess
+import tempfile
 
 from unittest.mock import Mock, call, patch
+import pytest
 from pytest_relaxed import raises
 from pytest import skip  # noqa
 from paramiko import SFTPAttributes
 
-from fabric import Connection
-from fabric.transfer import Transfer
+from fabric import Config, Connection
+from fabric.transfer import Progress, Result, Transfer
+
+from _util import FakeSFTP, FakeSFTPFile, FakeSFTPStore, LocalChannel
 
 
 # TODO: pull in all edge/corner case tests from fabric v1
@@ -177,6 +186,177 @@ class Transfer_:
                     parents=True, exist_ok=True
                 )
 
+        class chunked:
+            def setup(self):
+                self.store = FakeSFTPStore()
+                self.data = bytes(range(256)) * 41  # 10496 bytes
+                self.store.add("/remote/file", self.data, mode=0o100751)
+                self.patcher = patch("fabric.connection.SSHClient")
+                Client = self.patcher.start()
+                Client.return_value.open_sftp.side_effect = self.store.session
+
+            def teardown(self):
+                self.patcher.stop()
+
+            def _transfer(self, **settings):
+                settings.setdefault("chunk_size", 1024)
+                config = Config(overrides={"transfers": settings})
+                return Transfer(Connection("host", config=config))
+
+            def _get(self, tmp_path, chunked=True, **settings):
+                local = str(tmp_path / "file")
+                result = self._transfer(**settings).get(
+                    "file", local=local, chunked=chunked
+                )
+                return result, local
+
+            def downloads_ranges_over_multiple_sessions(self, tmp_path):
+                result, local = self._get(tmp_path, channels=3)
+                assert result.local == local
+                with open(local, "rb") as fd:
+                    assert fd.read() == self.data
+                assert len(self.store.sessions) == 3
+                # Extra sessions are closed afterwards; the main one isn't
+                assert [x.closed for x in self.store.sessions] == [
+                    False,
+                    True,
+                    True,
+                ]
+
+            def deals_ranges_out_round_robin(self, tmp_path):
+                self._get(tmp_path, channels=3, chunk_size=4096)
+                # 10496 bytes -> ranges of 4096, 4096, 2304
+                opened = [
+                    x
+                    for x in self.store.sessions
+                    if ("open", "/remote/file", "rb") in x.calls
+                ]
+                assert len(opened) == 3
+
+            def stats_remote_file_only_once(self, tmp_path):
+                self._get(tmp_path, channels=3)
+                stats = [
+                    call
+                    for session in self.store.sessions
+                    for call in session.calls
+                    if call[0] == "stat"
+                ]
+                assert stats == [("stat", "/remote/file")]
+
+            def never_uses_more_sessions_than_ranges(self, tmp_path):
+                self._get(tmp_path, channels=8, chunk_size=8192)
+                assert len(self.store.sessions) == 2
+
+            def single_range_uses_only_main_session(self, tmp_path):
+                result, local = self._get(tmp_path, chunk_size=1 << 20)
+                assert len(self.store.sessions) == 1
+                with open(local, "rb") as fd:
+                    assert fd.read() == self.data
+
+            def empty_files_work(self, tmp_path):
+                self.store.add("/remote/file", b"")
+                result, local = self._get(tmp_path)
+                with open(local, "rb") as fd:
+                    assert fd.read() == b""
+
+            def overwrites_longer_existing_local_file(self, tmp_path):
+                with open(str(tmp_path / "file"), "wb") as fd:
+                    fd.write(b"x" * 20000)
+                result, local = self._get(tmp_path)
+                with open(local, "rb") as fd:
+                    assert fd.read() == self.data
+
+            def preserves_remote_mode_by_default(self, tmp_path):
+                result, local = self._get(tmp_path)
+                assert stat.S_IMODE(os.stat(local).st_mode) == 0o751
+
+            def allows_disabling_remote_mode_preservation(self, tmp_path):
+                local = str(tmp_path / "file")
+                self._transfer().get(
+                    "file", local=local, chunked=True, preserve_mode=False
+                )
+                assert stat.S_IMODE(os.stat(local).st_mode) != 0o751
+
+            def pipeline_depth_handed_to_readv(self, tmp_path):
+                files = []
+                original = FakeSFTP.open
+
+                def tracking_open(sftp, *args, **kwargs):
+                    files.append(original(sftp, *args, **kwargs))
+                    return files[-1]
+
+                with patch.object(FakeSFTP, "open", tracking_open):
+                    self._get(tmp_path, channels=1, pipeline_depth=7)
+                ranges, depth = files[0].readv_calls[0]
+                assert len(ranges) == 11
+                assert depth == 7
+
+            def prefetch_is_bounded_by_default(self, tmp_path):
+                # 3 MiB in 256 KiB ranges; 64 requests of 32 KiB is 2 MiB
+                data = os.urandom(3 << 20)
+                self.store.add("/remote/file", data)
+                files = []
+                original = FakeSFTP.open
+
+                def tracking_open(sftp, *args, **kwargs):
+                    files.append(original(sftp, *args, **kwargs))
+                    return files[-1]
+
+                with patch.object(FakeSFTP, "open", tracking_open):
+                    result, local = self._get(
+                        tmp_path, channels=1, chunk_size=256 << 10
+                    )
+                calls = files[0].readv_calls
+                assert [len(ranges) for ranges, _ in calls] == [8, 4]
+                assert all(depth is None for _, depth in calls)
+                with open(local, "rb") as fd:
+                    assert fd.read() == data
+
+            @raises(IOError)
+            def short_reads_raise_IOError(self, tmp_path):
+                def truncating_readv(rfile, chunks, **kwargs):
+                    for offset, size in chunks:
+                        yield b"x" * (size - 1)
+
+                with patch.object(FakeSFTPFile, "readv", truncating_readv):
+                    self._get(tmp_path, channels=2)
+
+            def failures_leave_no_local_file_behind(self, tmp_path):
+                with patch.object(
+                    FakeSFTPFile, "readv", side_effect=OSError("boom")
+                ):
+                    with pytest.raises(OSError):
+                        self._get(tmp_path, channels=2)
+                assert not (tmp_path / "file").exists()
+
+            def enabled_by_config(self, tmp_path):
+                local = str(tmp_path / "file")
+                self._transfer(chunked=True).get("file", local=local)
+                with open(local, "rb") as fd:
+                    assert fd.read() == self.data
+
+            def disabled_by_default(self, tmp_path):
+                # Non-chunked mode goes via SFTPClient.get, which our fake
+                # lacks; prove we went there instead.
+                with pytest.raises(AttributeError, match="get"):
+                    self._get(tmp_path, chunked=None)
+
+            def file_like_local_ignores_chunked_mode(self):
+                fd = Mock()
+                transfer = self._transfer()
+                sftp = transfer.sftp
+                sftp.getfo = Mock()
+                transfer.get("file", local=fd, chunked=True)
+                sftp.getfo.assert_called_once_with(
+                    remotepath="/remote/file", fl=fd
+                )
+
+            def result_records_size_and_throughput(self, tmp_path):
+                result, local = self._get(tmp_path, channels=2)
+                assert result.size == len(self.data)
+                assert result.elapsed > 0
+                assert result.throughput == result.size / result.elapsed
+
     class put:
         class basics:
             def accepts_single_local_path_posarg(self, sftp_objs):
@@ -299,3 +479,1190 @@ class Transfer_:
                 transfer, client = sftp_objs
                 transfer.put("file", preserve_mode=False)
                 assert not client.chmod.called
+
+        class chunked:
+            def setup(self):
+                self.store = FakeSFTPStore()
+                self.data = bytes(range(256)) * 41  # 10496 bytes
+                self.patcher = patch("fabric.connection.SSHClient")
+                Client = self.patcher.start()
+                Client.return_value.open_sftp.side_effect = self.store.session
+
+            def teardown(self):
+                self.patcher.stop()
+
+            def _transfer(self, **settings):
+                settings.setdefault("chunk_size", 1024)
+                config = Config(overrides={"transfers": settings})
+                return Transfer(Connection("host", config=config))
+
+            def _put(self, tmp_path, chunked=True, mode=0o640, **settings):
+                local = str(tmp_path / "file")
+                with open(local, "wb") as fd:
+                    fd.write(self.data)
+                os.chmod(local, mode)
+                return self._transfer(**settings).put(
+                    local, remote="file", chunked=chunked
+                )
+
+            def _files(self):
+                # Every remote file handle opened, across all sessions
+                files = []
+                original = FakeSFTP.open
+
+                def tracking_open(sftp, *args, **kwargs):
+                    files.append(original(sftp, *args, **kwargs))
+                    return files[-1]
+
+                return files, patch.object(FakeSFTP, "open", tracking_open)
+
+            def uploads_ranges_over_multiple_sessions(self, tmp_path):
+                result = self._put(tmp_path, channels=3)
+                assert result.remote == "/remote/file"
+                assert self.store.data("/remote/file") == self.data
+                assert len(self.store.sessions) == 3
+                assert [x.closed for x in self.store.sessions] == [
+                    False,
+                    True,
+                    True,
+                ]
+
+            def creates_remote_file_once_then_writes_in_place(self, tmp_path):
+                self.store.add("/remote/file", b"x" * 20000)
+                self._put(tmp_path, channels=3)
+                opens = [
+                    call
+                    for session in self.store.sessions
+                    for call in session.calls
+                    if call[0] == "open"
+                ]
+                assert opens[0] == ("open", "/remote/file", "wb")
+                assert set(opens[1:]) == {("open", "/remote/file", "r+b")}
+                assert self.store.data("/remote/file") == self.data
+
+            def pipelines_writes(self, tmp_path):
+                files, patcher = self._files()
+                with patcher:
+                    self._put(tmp_path, channels=2)
+                writers = [x for x in files[1:]]
+                assert writers and all(x.pipelined for x in writers)
+
+            def pipeline_depth_bounds_writes_in_flight(self, tmp_path):
+                # 1 request of 32KiB -> a barrier every 32 ranges of 1KiB
+                self.data = b"x" * (1024 * 64)
+                self._put(tmp_path, channels=1, pipeline_depth=1)
+                barriers = [
+                    call
+                    for call in self.store.sessions[0].calls
+                    if call == ("stat", "/remote/file")
+                ]
+                assert len(barriers) == 2
+
+            def no_barriers_without_pipeline_depth(self, tmp_path):
+                self.data = b"x" * (1024 * 64)
+                self._put(tmp_path, channels=1)
+                calls = self.store.sessions[0].calls
+                assert ("stat", "/remote/file") not in calls
+
+            def preserves_local_mode_via_open_handle(self, tmp_path):
+                self._put(tmp_path, mode=0o751)
+                assert stat.S_IMODE(self.store.mode("/remote/file")) == 0o751
+                calls = self.store.sessions[0].calls
+                assert ("fchmod", "/remote/file", 0o751) in calls
+                assert not [x for x in calls if x[0] == "chmod"]
+
+            def allows_disabling_local_mode_preservation(self, tmp_path):
+                local = str(tmp_path / "file")
+                with open(local, "wb") as fd:
+                    fd.write(self.data)
+                self._transfer().put(
+                    local, remote="file", chunked=True, preserve_mode=False
+                )
+                calls = self.store.sessions[0].calls
+                assert not [x for x in calls if "chmod" in x[0]]
+
+            def empty_files_work(self, tmp_path):
+                self.data = b""
+                self._put(tmp_path)
+                assert self.store.data("/remote/file") == b""
+
+            def enabled_by_config(self, tmp_path):
+                local = str(tmp_path / "file")
+                with open(local, "wb") as fd:
+                    fd.write(self.data)
+                self._transfer(chunked=True).put(local, remote="file")
+                assert self.store.data("/remote/file") == self.data
+
+            def disabled_by_default(self, tmp_path):
+                # Non-chunked mode goes via SFTPClient.put, which our fake
+                # lacks; prove we went there instead.
+                with pytest.raises(AttributeError, match="put"):
+                    self._put(tmp_path, chunked=None)
+
+            def file_like_local_ignores_chunked_mode(self):
+                fd = Mock()
+                fd.tell.return_value = 0
+                transfer = self._transfer()
+                sftp = transfer.sftp
+                sftp.putfo = Mock()
+                transfer.put(fd, remote="file", chunked=True)
+                sftp.putfo.assert_called_once_with(
+                    fl=fd, remotepath="/remote/file"
+                )
+
+            def result_records_size_and_throughput(self, tmp_path):
+                result = self._put(tmp_path, channels=2)
+                assert result.size == len(self.data)
+                assert result.elapsed > 0
+                assert result.throughput == result.size / result.elapsed
+
+    class directories:
+        def setup(self):
+            self.store = FakeSFTPStore()
+            self.patcher = patch("fabric.connection.SSHClient")
+            Client = self.patcher.start()
+            # (Late-bound, so nested classes may swap in their own store.)
+            Client.return_value.open_sftp.side_effect = (
+                lambda: self.store.session()
+            )
+
+        def teardown(self):
+            self.patcher.stop()
+
+        def _transfer(self, **settings):
+            config = Config(overrides={"transfers": settings})
+            return Transfer(Connection("host", config=config))
+
+        def _calls(self, kind):
+            return [
+                call
+                for session in self.store.sessions
+                for call in session.calls
+                if call[0] == kind
+            ]
+
+        class put_dir:
+            def setup(self):
+                # (Nested setups don't chain; see pytest-relaxed.)
+                Transfer_.directories.setup(self)
+
+            def _tree(self, tmp_path):
+                root = tmp_path / "site"
+                (root / "css").mkdir(parents=True)
+                (root / "js" / "lib").mkdir(parents=True)
+                (root / "index.html").write_bytes(b"<html>")
+                (root / "css" / "main.css").write_bytes(b"body {}")
+                (root / "js" / "lib" / "app.js").write_bytes(b"go()")
+                os.chmod(str(root / "index.html"), 0o640)
+                os.chmod(str(root / "js"), 0o750)
+                return str(root)
+
+            def mirrors_tree_under_remote_dir(self, tmp_path):
+                local = self._tree(tmp_path)
+                result = self._transfer().put_dir(local, "www")
+                assert result.remote == "/remote/www"
+                assert result.local == local
+                assert self.store.data("/remote/www/index.html") == b"<html>"
+                assert (
+                    self.store.data("/remote/www/css/main.css") == b"body {}"
+                )
+                assert self.store.data("/remote/www/js/lib/app.js") == b"go()"
+
+            def remote_defaults_to_local_basename(self, tmp_path):
+                result = self._transfer().put_dir(self._tree(tmp_path))
+                assert result.remote == "/remote/site"
+                assert "/remote/site/index.html" in self.store.files
+
+            def creates_each_directory_once_parents_first(self, tmp_path):
+                self._transfer().put_dir(self._tree(tmp_path), "www")
+                made = [x[1] for x in self._calls("mkdir")]
+                assert sorted(made) == [
+                    "/remote/www",
+                    "/remote/www/css",
+                    "/remote/www/js",
+                    "/remote/www/js/lib",
+                ]
+                # (Our fake refuses to create children of missing parents, so
+                # getting here at all proves the ordering.)
+
+            def tolerates_existing_remote_directories(self, tmp_path):
+                self.store.add_dir("/remote/www")
+                self._transfer().put_dir(self._tree(tmp_path), "www")
+                assert "/remote/www/index.html" in self.store.files
+
+            @raises(OSError)
+            def complains_if_remote_directory_is_a_file(self, tmp_path):
+                self.store.add("/remote/www", b"")
+                self._transfer().put_dir(self._tree(tmp_path), "www")
+
+            def preserves_modes_without_extra_round_trips(self, tmp_path):
+                self._transfer().put_dir(self._tree(tmp_path), "www")
+                mode = self.store.mode("/remote/www/index.html")
+                assert stat.S_IMODE(mode) == 0o640
+                js = self.store.dirs["/remote/www/js"]
+                assert stat.S_IMODE(js) == 0o750
+                assert not self._calls("chmod")
+
+            def allows_disabling_mode_preservation(self, tmp_path):
+                self._transfer().put_dir(
+                    self._tree(tmp_path), "www", preserve_mode=False
+                )
+                assert not self._calls("fchmod")
+                assert {x[2] for x in self._calls("mkdir")} == {0o777}
+
+            def spreads_files_over_sessions(self, tmp_path):
+                # (Slow sessions make sure both threads get a look in.)
+                self.store = FakeSFTPStore(exclusive=True)
+                self._transfer(channels=2).put_dir(self._tree(tmp_path))
+                assert len(self.store.sessions) == 2
+                opened = [bool(x.calls) for x in self.store.sessions]
+                assert opened == [True, True]
+                assert self.store.sessions[1].closed
+
+            def single_session_when_one_channel(self, tmp_path):
+                self._transfer(channels=1).put_dir(self._tree(tmp_path))
+                assert len(self.store.sessions) == 1
+
+            def never_shares_a_session_between_threads(self, tmp_path):
+                # Real SFTPClients mix up concurrent callers' responses.
+                self.store = FakeSFTPStore(exclusive=True)
+                root = tmp_path / "many"
+                for name in "abcdef":
+                    (root / name).mkdir(parents=True)
+                    (root / name / "file").write_bytes(name.encode())
+                self._transfer(channels=2, file_workers=8).put_dir(
+                    str(root), "www"
+                )
+                assert self.store.collisions == 0
+                assert self.store.data("/remote/www/f/file") == b"f"
+
+            def returns_per_file_results_and_totals(self, tmp_path):
+                local = self._tree(tmp_path)
+                result = self._transfer().put_dir(local, "www")
+                assert sorted(x.remote for x in result) == [
+                    "/remote/www/css/main.css",
+                    "/remote/www/index.html",
+                    "/remote/www/js/lib/app.js",
+                ]
+                assert all(isinstance(x, Result) for x in result)
+                assert result.size == 6 + 7 + 4
+                assert result.elapsed > 0
+                assert result.throughput == result.size / result.elapsed
+
+            def empty_directories_work(self, tmp_path):
+                result = self._transfer().put_dir(str(tmp_path), "empty")
+                assert "/remote/empty" in self.store.dirs
+                assert len(result) == 0
+                assert result.size == 0
+
+            @raises(ValueError)
+            def local_must_be_a_directory(self, tmp_path):
+                path = tmp_path / "file"
+                path.write_bytes(b"")
+                self._transfer().put_dir(str(path))
+
+        class get_dir:
+            def setup(self):
+                Transfer_.directories.setup(self)
+                self.store.add_dir("/remote/site")
+                self.store.add_dir("/remote/site/css", mode=0o40750)
+                self.store.add_dir("/remote/site/empty")
+                self.store.add("/remote/site/index.html", b"<html>", 0o100640)
+                self.store.add("/remote/site/css/main.css", b"body {}")
+
+            def mirrors_tree_into_local_dir(self, tmp_path):
+                local = str(tmp_path / "copy")
+                result = self._transfer().get_dir("site", local)
+                assert result.local == local
+                assert result.remote == "/remote/site"
+                with open(os.path.join(local, "index.html"), "rb") as fd:
+                    assert fd.read() == b"<html>"
+                path = os.path.join(local, "css", "main.css")
+                with open(path, "rb") as fd:
+                    assert fd.read() == b"body {}"
+                assert os.path.isdir(os.path.join(local, "empty"))
+
+            def local_defaults_to_remote_basename(self, tmp_path, monkeypatch):
+                monkeypatch.chdir(tmp_path)
+                result = self._transfer().get_dir("site")
+                assert result.local == str(tmp_path / "site")
+
+            def local_is_interpolated(self, tmp_path):
+                local = str(tmp_path / "{host}" / "{basename}")
+                result = self._transfer().get_dir("site", local)
+                assert result.local == str(tmp_path / "host" / "site")
+
+            def lists_each_directory_once_without_stat_per_file(
+                self, tmp_path
+            ):
+                self._transfer().get_dir("site", str(tmp_path / "copy"))
+                listed = sorted(x[1] for x in self._calls("listdir_attr"))
+                assert listed == [
+                    "/remote/site",
+                    "/remote/site/css",
+                    "/remote/site/empty",
+                ]
+                assert not self._calls("stat")
+
+            def preserves_modes(self, tmp_path):
+                local = str(tmp_path / "copy")
+                self._transfer().get_dir("site", local)
+                index = os.stat(os.path.join(local, "index.html"))
+                assert stat.S_IMODE(index.st_mode) == 0o640
+                css = os.stat(os.path.join(local, "css"))
+                assert stat.S_IMODE(css.st_mode) == 0o750
+
+            def allows_disabling_mode_preservation(self, tmp_path):
+                local = str(tmp_path / "copy")
+                self._transfer().get_dir("site", local, preserve_mode=False)
+                index = os.stat(os.path.join(local, "index.html"))
+                assert stat.S_IMODE(index.st_mode) != 0o640
+
+            def returns_per_file_results_and_totals(self, tmp_path):
+                result = self._transfer().get_dir("site", str(tmp_path))
+                assert sorted(x.remote for x in result) == [
+                    "/remote/site/css/main.css",
+                    "/remote/site/index.html",
+                ]
+                assert result.size == 6 + 7
+
+            def never_shares_a_session_between_threads(self, tmp_path):
+                store, self.store = self.store, FakeSFTPStore(exclusive=True)
+                self.store.files, self.store.dirs = store.files, store.dirs
+                for name in "abcdef":
+                    self.store.add("/remote/site/" + name, name.encode())
+                local = str(tmp_path / "copy")
+                self._transfer(channels=2, file_workers=8).get_dir(
+                    "site", local
+                )
+                assert self.store.collisions == 0
+                with open(os.path.join(local, "f"), "rb") as fd:
+                    assert fd.read() == b"f"
+
+            @raises(ValueError)
+            def remote_must_not_be_empty(self):
+                self._transfer().get_dir("")
+
+        class sync:
+            def setup(self):
+                # Remote checksum commands really run, against copies of the
+                # fake remote files kept at the same paths on local disk.
+                self.root = tempfile.mkdtemp()
+                Transfer_.directories.setup(self)
+                self.store = FakeSFTPStore(cwd=os.path.join(self.root, "r"))
+                self.commands = []
+                self.run_patcher = patch.object(
+                    Connection, "run", side_effect=self._run
+                )
+                self.run_patcher.start()
+                self.local = os.path.join(self.root, "site")
+                self._write("index.html", b"<html>")
+                self._write("css/main.css", b"body {}")
+                self._write("big.bin", bytes(range(256)) * 4)
+
+            def teardown(self):
+                self.run_patcher.stop()
+                Transfer_.directories.teardown(self)
+                shutil.rmtree(self.root)
+
+            def _run(self, command, **kwargs):
+                self.commands.append(command)
+                for path, (data, _) in self.store.files.items():
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(path, "wb") as fd:
+                        fd.write(data)
+                proc = subprocess.run(
+                    command, shell=True, capture_output=True, text=True
+                )
+                return Mock(stdout=proc.stdout)
+
+            def _write(self, name, data, mtime=1000):
+                path = os.path.join(self.local, *name.split("/"))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as fd:
+                    fd.write(data)
+                os.utime(path, (mtime, mtime))
+
+            def _remote(self, name):
+                return posixpath.join(self.store.cwd, "www", name)
+
+            def _sync(self, **kwargs):
+                transfer = self._transfer(sync_block_size=256)
+                return transfer.sync(self.local, "www", **kwargs)
+
+            def _written(self):
+                return sum(x[3] for x in self._calls("write"))
+
+            def first_sync_uploads_everything(self):
+                result = self._sync()
+                assert sorted(result.created) == [
+                    self._remote("big.bin"),
+                    self._remote("css/main.css"),
+                    self._remote("index.html"),
+                ]
+                assert result.updated == result.unchanged == []
+                assert self.store.data(self._remote("css/main.css")) == (
+                    b"body {}"
+                )
+                assert result.size == result.total_size == 1024 + 6 + 7
+                assert result.bytes_saved == 0
+                assert not self.commands
+
+            def applies_local_mtimes_and_modes(self):
+                os.chmod(os.path.join(self.local, "index.html"), 0o640)
+                self._sync()
+                path = self._remote("index.html")
+                assert self.store.mtimes[path] == 1000
+                assert stat.S_IMODE(self.store.mode(path)) == 0o640
+
+            def unchanged_size_and_mtime_sends_nothing(self):
+                self._sync()
+                before = len(self.store.sessions)
+                result = self._sync()
+                assert len(result.unchanged) == 3
+                assert result.created == result.updated == []
+                assert result.size == 0
+                assert result.bytes_saved == result.total_size
+                assert not self.commands
+                # Nothing was even opened the second time around
+                later = self.store.sessions[before:]
+                assert not [
+                    x for sftp in later for x in sftp.calls if x[0] == "open"
+                ]
+
+            def sends_only_changed_blocks(self):
+                self._sync()
+                data = bytearray(bytes(range(256)) * 4)
+                data[300] = 0xFF
+                self._write("big.bin", bytes(data), mtime=2000)
+                del self.store.sessions[:]
+                result = self._sync()
+                assert result.updated == [self._remote("big.bin")]
+                assert len(self.commands) == 1
+                assert self._written() == 256
+                assert result.size == 256
+                assert result.bytes_saved == result.total_size - 256
+                assert self.store.data(self._remote("big.bin")) == data
+                assert self.store.mtimes[self._remote("big.bin")] == 2000
+
+            def identical_contents_only_touch_mtime(self):
+                self._sync()
+                self._write("index.html", b"<html>", mtime=3000)
+                del self.store.sessions[:]
+                result = self._sync()
+                assert self._remote("index.html") in result.unchanged
+                assert result.size == 0
+                assert not self._written()
+                assert self.store.mtimes[self._remote("index.html")] == 3000
+
+            def never_shares_a_session_between_threads(self):
+                cwd = self.store.cwd
+                self.store = FakeSFTPStore(cwd=cwd, exclusive=True)
+                for name in "abcdef":
+                    self._write(name + "/file", name.encode() * 300)
+                self._sync()
+                self._write("big.bin", b"x" * 1024, mtime=2000)
+                self._write("c/file", b"C" * 300, mtime=2000)
+                result = self._sync()
+                assert self.store.collisions == 0
+                assert sorted(result.updated) == [
+                    self._remote("big.bin"),
+                    self._remote("c/file"),
+                ]
+                assert self.store.data(self._remote("c/file")) == b"C" * 300
+
+            def shrunk_files_are_truncated(self):
+                self._sync()
+                self._write("big.bin", bytes(range(256)) * 2, mtime=2000)
+                del self.store.sessions[:]
+                result = self._sync()
+                assert result.size == 0
+                assert self._calls("truncate") == [
+                    ("truncate", self._remote("big.bin"), 512)
+                ]
+                assert self.store.data(self._remote("big.bin")) == (
+                    bytes(range(256)) * 2
+                )
+
+            def grown_files_send_new_blocks(self):
+                self._sync()
+                self._write("big.bin", bytes(range(256)) * 5, mtime=2000)
+                del self.store.sessions[:]
+                result = self._sync()
+                assert result.size == 256
+                assert self.store.data(self._remote("big.bin")) == (
+                    bytes(range(256)) * 5
+                )
+
+            def checksum_failures_fall_back_to_whole_files(self):
+                self._sync()
+                self._write("big.bin", b"x" * 1024, mtime=2000)
+                del self.store.sessions[:]
+                with patch.object(
+                    Connection, "run", return_value=Mock(stdout="")
+                ):
+                    result = self._sync()
+                assert result.size == 1024
+                assert self.store.data(self._remote("big.bin")) == b"x" * 1024
+
+            def checksums_may_be_disabled(self):
+                self._sync()
+                self._write("index.html", b"<html>", mtime=3000)
+                del self.store.sessions[:]
+                result = self._sync(checksum=False)
+                assert result.updated == [self._remote("index.html")]
+                assert result.size == 6
+                assert not self.commands
+
+            def checksums_are_batched(self):
+                self.store.add(self._remote("index.html"), b"<html>")
+                self.store.add(self._remote("big.bin"), b"")
+                self.store.add_dir(posixpath.join(self.store.cwd, "www"))
+                self._sync()
+                # Both files checksummed in a single command
+                assert len(self.commands) == 1
+
+            def dry_run_changes_nothing(self):
+                self._sync()
+                self._write("big.bin", b"\0" * 256 + bytes(range(256)) * 3)
+                os.utime(os.path.join(self.local, "big.bin"), (9, 9))
+                self._write("new.txt", b"new")
+                del self.store.sessions[:]
+                result = self._sync(dry_run=True)
+                assert result.dry_run
+                assert result.created == [self._remote("new.txt")]
+                assert result.updated == [self._remote("big.bin")]
+                assert result.size == 256 + 3
+                assert not self._calls("open")
+                assert not self._calls("mkdir")
+                assert self._remote("new.txt") not in self.store.files
+
+            def leaves_remote_only_files_alone(self):
+                self._sync()
+                self.store.add(self._remote("extra.txt"), b"keep me")
+                self._sync()
+                assert self.store.data(self._remote("extra.txt")) == b"keep me"
+
+            @raises(ValueError)
+            def local_must_be_a_directory(self):
+                self._transfer().sync(os.path.join(self.local, "index.html"))
+
+    class compressed:
+        # Remote commands really run, in a local shell, with the fake SFTP
+        # server's working directory being a real temp directory.
+        def setup(self):
+            self.root = tempfile.mkdtemp()
+            self.store = FakeSFTPStore(cwd=self.root)
+            self.channels = []
+            self.patchers = [
+                patch("fabric.connection.SSHClient"),
+                patch.object(
+                    Connection, "create_session", side_effect=self._session
+                ),
+            ]
+            Client = self.patchers[0].start()
+            Client.return_value.open_sftp.side_effect = self.store.session
+            self.patchers[1].start()
+            self.data = b"all work and no play makes jack a dull boy\n" * 500
+            self.remote = os.path.join(self.root, "file.txt")
+
+        def teardown(self):
+            for patcher in self.patchers:
+                patcher.stop()
+            shutil.rmtree(self.root)
+
+        def _session(self):
+            self.channels.append(LocalChannel(self.root))
+            return self.channels[-1]
+
+        def _transfer(self, **settings):
+            config = Config(overrides={"transfers": settings})
+            return Transfer(Connection("host", config=config))
+
+        def _local(self, tmp_path, mode=0o640):
+            path = tmp_path / "file.txt"
+            path.write_bytes(self.data)
+            os.chmod(str(path), mode)
+            return str(path)
+
+        def _remote_data(self):
+            with open(self.remote, "rb") as fd:
+                return fd.read()
+
+        class put:
+            def streams_through_remote_gzip(self, tmp_path):
+                local = self._local(tmp_path)
+                result = self._transfer().put(
+                    local, "file.txt", compress="gzip"
+                )
+                assert self._remote_data() == self.data
+                assert self.channels[0].command.startswith("gzip -dc > ")
+                assert result.remote == self.remote
+                assert result.size == len(self.data)
+
+            def preserves_mode_in_same_command(self, tmp_path):
+                self._transfer().put(
+                    self._local(tmp_path), "file.txt", compress="gzip"
+                )
+                assert len(self.channels) == 1
+                assert stat.S_IMODE(os.stat(self.remote).st_mode) == 0o640
+
+            def allows_disabling_mode_preservation(self, tmp_path):
+                self._transfer().put(
+                    self._local(tmp_path),
+                    "file.txt",
+                    compress="gzip",
+                    preserve_mode=False,
+                )
+                assert "chmod" not in self.channels[0].command
+
+            def accepts_file_like_objects(self):
+                fd = BytesIO(self.data)
+                fd.seek(10)
+                self._transfer().put(fd, "file.txt", compress="gzip")
+                assert self._remote_data() == self.data
+                assert fd.tell() == 10
+
+            def enabled_by_config(self, tmp_path):
+                local = self._local(tmp_path)
+                self._transfer(compress="gzip").put(local, "file.txt")
+                assert self.channels
+                assert self._remote_data() == self.data
+
+            def remote_failures_raise_IOError(self, tmp_path):
+                local = self._local(tmp_path)
+                with pytest.raises(IOError, match="exited"):
+                    self._transfer().put(
+                        local, "nope/file.txt", compress="gzip"
+                    )
+
+        class get:
+            def setup(self):
+                Transfer_.compressed.setup(self)
+                with open(self.remote, "wb") as fd:
+                    fd.write(self.data)
+                os.chmod(self.remote, 0o751)
+                # For the stat done by mode preservation
+                self.store.add(self.remote, self.data, mode=0o100751)
+
+            def streams_through_remote_gzip(self, tmp_path):
+                local = str(tmp_path / "copy")
+                result = self._transfer().get(
+                    "file.txt", local, compress="gzip"
+                )
+                with open(local, "rb") as fd:
+                    assert fd.read() == self.data
+                assert self.channels[0].command.startswith("gzip -c < ")
+                assert result.size == len(self.data)
+
+            def preserves_mode(self, tmp_path):
+                local = str(tmp_path / "copy")
+                self._transfer().get("file.txt", local, compress="gzip")
+                assert stat.S_IMODE(os.stat(local).st_mode) == 0o751
+
+            def accepts_file_like_objects(self):
+                fd = BytesIO()
+                self._transfer().get("file.txt", fd, compress="gzip")
+                assert fd.getvalue() == self.data
+
+            def remote_failures_raise_IOError(self, tmp_path):
+                with pytest.raises(IOError, match="exited"):
+                    self._transfer().get(
+                        "missing.txt", str(tmp_path / "x"), compress="gzip"
+                    )
+
+        def zstd_round_trips(self, tmp_path):
+            pytest.importorskip("zstandard")
+            local = self._local(tmp_path)
+            transfer = self._transfer()
+            transfer.put(local, "file.txt", compress="zstd")
+            assert self._remote_data() == self.data
+            fd = BytesIO()
+            transfer.get("file.txt", fd, compress="zstd")
+            assert fd.getvalue() == self.data
+
+        def zstd_needs_zstandard(self, tmp_path):
+            with patch.dict("sys.modules", {"zstandard": None}):
+                with pytest.raises(ImportError, match="zstandard"):
+                    self._transfer().put(
+                        self._local(tmp_path), "file.txt", compress="zstd"
+                    )
+
+        def unknown_formats_rejected(self, tmp_path):
+            with pytest.raises(ValueError, match="gzip, zstd"):
+                self._transfer().put(
+                    self._local(tmp_path), "file.txt", compress="rar"
+                )
+
+    class resumable:
+        # Remote checksum commands really run, against copies of the fake
+        # remote files kept at the same paths on local disk.
+        def setup(self):
+            self.root = tempfile.mkdtemp()
+            self.store = FakeSFTPStore(cwd=os.path.join(self.root, "r"))
+            self.commands = []
+            self.fail_commands = False
+            self.patchers = [
+                patch("fabric.connection.SSHClient"),
+                patch.object(Connection, "run", side_effect=self._run),
+            ]
+            Client = self.patchers[0].start()
+            Client.return_value.open_sftp.side_effect = self.store.session
+            self.patchers[1].start()
+            self.data = os.urandom(5000)
+            self.remote = os.path.join(self.store.cwd, "big.bin")
+            self.local = os.path.join(self.root, "big.bin")
+
+        def teardown(self):
+            for patcher in self.patchers:
+                patcher.stop()
+            shutil.rmtree(self.root)
+
+        def _run(self, command, **kwargs):
+            self.commands.append(command)
+            for path, (data, _) in self.store.files.items():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as fd:
+                    fd.write(data)
+            if self.fail_commands:
+                command = "exit 1"
+            proc = subprocess.run(
+                command, shell=True, capture_output=True, text=True
+            )
+            return Mock(stdout=proc.stdout, failed=bool(proc.returncode))
+
+        def _transfer(self, **settings):
+            config = Config(overrides={"transfers": settings})
+            return Transfer(Connection("host", config=config))
+
+        def _calls(self, kind):
+            return [
+                call
+                for session in self.store.sessions
+                for call in session.calls
+                if call[0] == kind
+            ]
+
+        class get:
+            def setup(self):
+                Transfer_.resumable.setup(self)
+                self.store.add(self.remote, self.data, mode=0o100751)
+
+            def _partial(self, data):
+                with open(self.local + ".part", "wb") as fd:
+                    fd.write(data)
+
+            def _local_data(self):
+                with open(self.local, "rb") as fd:
+                    return fd.read()
+
+            def downloads_via_partial_file(self):
+                result = self._transfer().get(
+                    "big.bin", self.local, resume=True
+                )
+                assert self._local_data() == self.data
+                assert not os.path.exists(self.local + ".part")
+                assert result.size == 5000
+                assert result.resumed_from == 0
+                # Nothing to verify, so no checksum round trip
+                assert self.commands == []
+
+            def picks_up_after_matching_prefix(self):
+                self._partial(self.data[:2000])
+                result = self._transfer().get(
+                    "big.bin", self.local, resume=True
+                )
+                assert self._local_data() == self.data
+                assert not os.path.exists(self.local + ".part")
+                assert result.resumed_from == 2000
+                assert result.size == 3000
+                assert self.commands == [
+                    "head -c 2000 {} | md5sum".format(self.remote)
+                ]
+
+            def starts_over_if_prefix_differs(self):
+                self._partial(b"x" * 2000)
+                result = self._transfer().get(
+                    "big.bin", self.local, resume=True
+                )
+                assert self._local_data() == self.data
+                assert result.resumed_from == 0
+                assert result.size == 5000
+
+            def starts_over_if_partial_is_too_long(self):
+                self._partial(self.data + b"junk")
+                result = self._transfer().get(
+                    "big.bin", self.local, resume=True
+                )
+                assert self._local_data() == self.data
+                assert result.resumed_from == 0
+                assert self.commands == []
+
+            def starts_over_if_remote_checksum_fails(self):
+                self.fail_commands = True
+                self._partial(self.data[:2000])
+                result = self._transfer().get(
+                    "big.bin", self.local, resume=True
+                )
+                assert self._local_data() == self.data
+                assert result.resumed_from == 0
+
+            def preserves_mode(self):
+                self._transfer().get("big.bin", self.local, resume=True)
+                assert stat.S_IMODE(os.stat(self.local).st_mode) == 0o751
+
+            def enabled_by_config(self):
+                self._partial(self.data[:2000])
+                result = self._transfer(resume=True).get("big.bin", self.local)
+                assert result.resumed_from == 2000
+
+            def ignored_for_file_like_objects(self):
+                fd = BytesIO()
+                result = self._transfer().get("big.bin", fd, resume=True)
+                assert fd.getvalue() == self.data
+                assert result.resumed_from == 0
+
+        class put:
+            def setup(self):
+                Transfer_.resumable.setup(self)
+                with open(self.local, "wb") as fd:
+                    fd.write(self.data)
+                os.chmod(self.local, 0o640)
+
+            def uploads_via_partial_file(self):
+                result = self._transfer().put(
+                    self.local, "big.bin", resume=True
+                )
+                assert self.store.data(self.remote) == self.data
+                assert self.remote + ".part" not in self.store.files
+                assert self._calls("posix_rename") == [
+                    ("posix_rename", self.remote + ".part", self.remote)
+                ]
+                assert result.size == 5000
+                assert result.resumed_from == 0
+                assert self.commands == []
+
+            def picks_up_after_matching_prefix(self):
+                self.store.add(self.remote + ".part", self.data[:2000])
+                result = self._transfer().put(
+                    self.local, "big.bin", resume=True
+                )
+                assert self.store.data(self.remote) == self.data
+                assert result.resumed_from == 2000
+                assert result.size == 3000
+                # Only the remainder went over the wire
+                assert self._calls("write")[0][2] == 2000
+                assert sum(x[3] for x in self._calls("write")) == 3000
+
+            def starts_over_if_prefix_differs(self):
+                self.store.add(self.remote + ".part", b"x" * 2000)
+                result = self._transfer().put(
+                    self.local, "big.bin", resume=True
+                )
+                assert self.store.data(self.remote) == self.data
+                assert result.resumed_from == 0
+                assert result.size == 5000
+
+            def preserves_mode(self):
+                self._transfer().put(self.local, "big.bin", resume=True)
+                assert stat.S_IMODE(self.store.mode(self.remote)) == 0o640
+
+            def replaces_existing_file(self):
+                self.store.add(self.remote, b"old")
+                self._transfer().put(self.local, "big.bin", resume=True)
+                assert self.store.data(self.remote) == self.data
+
+    class copy:
+        def setup(self):
+            self.src_store = FakeSFTPStore(cwd="/src")
+            self.dst_store = FakeSFTPStore(cwd="/dst")
+            self.data = os.urandom(10000)
+            self.src_store.add("/src/file.bin", self.data, mode=0o100750)
+            # Each Connection gets a client of its own
+            self.patcher = patch(
+                "fabric.connection.SSHClient", side_effect=lambda: Mock()
+            )
+            self.patcher.start()
+            config = Config(overrides={"transfers": {"chunk_size": 1024}})
+            self.src = Connection("src", user="me", config=config)
+            self.src.client.open_sftp.side_effect = self.src_store.session
+            self.dst = Connection("dst", user="you", port=2222)
+            self.dst.client.open_sftp.side_effect = self.dst_store.session
+
+        def teardown(self):
+            self.patcher.stop()
+
+        def _copy(self, *args, **kwargs):
+            return Transfer(self.src).copy(
+                "file.bin", self.dst, *args, **kwargs
+            )
+
+        def pumps_between_sftp_sessions(self):
+            result = self._copy("out.bin")
+            assert self.dst_store.data("/dst/out.bin") == self.data
+            assert result.remote == "/src/file.bin"
+            assert result.orig_remote == "file.bin"
+            assert result.connection is self.src
+            assert result.dst_remote == "/dst/out.bin"
+            assert result.orig_dst_remote == "out.bin"
+            assert result.dst_connection is self.dst
+            assert result.local is None
+            assert result.size == 10000
+            assert not result.direct
+
+        def copies_within_one_host_over_separate_sessions(self):
+            store = FakeSFTPStore(cwd="/src", exclusive=True)
+            store.add("/src/file.bin", self.data)
+            self.src.client.open_sftp.side_effect = store.session
+            result = Transfer(self.src).copy("file.bin", self.src, "out.bin")
+            assert store.data("/src/out.bin") == self.data
+            assert store.collisions == 0
+            assert result.dst_connection is self.src
+            # The reader's extra session is cleaned up afterwards
+            assert len(store.sessions) == 2
+            assert store.sessions[1].closed
+
+        def reads_and_writes_in_chunks(self):
+            self._copy("out.bin")
+            writes = [
+                call[3]
+                for session in self.dst_store.sessions
+                for call in session.calls
+                if call[0] == "write"
+            ]
+            assert writes == [1024] * 9 + [784]
+
+        def defaults_to_source_basename(self):
+            result = self._copy()
+            assert result.dst_remote == "/dst/file.bin"
+            self.dst_store.add_dir("/dst/sub")
+            result = self._copy("/dst/sub")
+            assert result.dst_remote == "/dst/sub/file.bin"
+            assert self.dst_store.data("/dst/sub/file.bin") == self.data
+
+        def preserves_mode(self):
+            self._copy("out.bin")
+            assert stat.S_IMODE(self.dst_store.mode("/dst/out.bin")) == 0o750
+            self._copy("other.bin", preserve_mode=False)
+            assert stat.S_IMODE(self.dst_store.mode("/dst/other.bin")) == (
+                0o644
+            )
+
+        def buffers_only_a_few_chunks(self):
+            self.src.config.transfers.copy_buffer = 2
+            ahead = []
+            original = FakeSFTPFile.write
+
+            def slow_write(wfile, data):
+                # How far the reader has got, relative to the writer
+                ahead.append(self.reads[0] - wfile.pos)
+                original(wfile, data)
+
+            self.reads = [0]
+            original_readv = FakeSFTPFile.readv
+
+            def counting_readv(rfile, chunks, **kwargs):
+                for data in original_readv(rfile, chunks, **kwargs):
+                    self.reads[0] += len(data)
+                    yield data
+
+            with patch.object(FakeSFTPFile, "write", slow_write):
+                with patch.object(FakeSFTPFile, "readv", counting_readv):
+                    self._copy("out.bin")
+            # Queue of 2, one in the writer's hands, one being read
+            assert max(ahead) <= 4 * 1024
+
+        def reader_errors_are_raised(self):
+            with patch.object(
+                FakeSFTPFile, "readv", side_effect=OSError("boom")
+            ):
+                with pytest.raises(OSError, match="boom"):
+                    self._copy("out.bin")
+
+        def writer_errors_stop_the_reader(self):
+            with patch.object(
+                FakeSFTPFile, "write", side_effect=OSError("disk full")
+            ):
+                with pytest.raises(OSError, match="disk full"):
+                    self._copy("out.bin")
+
+        def reports_progress(self):
+            self.src.config.transfers.progress_interval = 0
+            reports = []
+            self._copy("out.bin", callback=reports.append)
+            assert reports[-1].done
+            assert reports[-1].transferred == 10000
+            assert len(reports) == 11
+
+        class direct:
+            def setup(self):
+                Transfer_.copy.setup(self)
+                self.commands = []
+                self.run_patcher = patch.object(
+                    Connection, "run", side_effect=self._run
+                )
+                self.run_patcher.start()
+                self.push_works = True
+
+            def teardown(self):
+                self.run_patcher.stop()
+                Transfer_.copy.teardown(self)
+
+            def _run(self, command, **kwargs):
+                self.commands.append(command)
+                if not self.push_works:
+                    return Mock(failed=True, stderr="Permission denied\n")
+                self.dst_store.add("/dst/out.bin", self.data)
+                return Mock(failed=False)
+
+            def pushes_from_source_host(self):
+                result = self._copy("out.bin", direct=True)
+                assert result.direct
+                assert self.commands == [
+                    "ssh -o BatchMode=yes -p 2222 you@dst "
+                    "'cat > /dst/out.bin && chmod 750 /dst/out.bin' "
+                    "< /src/file.bin"
+                ]
+                # Nothing was pumped
+                assert not any(
+                    call[0] == "open"
+                    for session in self.src_store.sessions
+                    for call in session.calls
+                )
+
+            def honors_ssh_command_and_preserve_mode(self):
+                self._copy(
+                    "out.bin",
+                    direct=True,
+                    preserve_mode=False,
+                    ssh_command="ssh -i key",
+                )
+                assert self.commands == [
+                    "ssh -i key -p 2222 you@dst 'cat > /dst/out.bin' "
+                    "< /src/file.bin"
+                ]
+
+            def falls_back_to_pumping_on_failure(self):
+                self.push_works = False
+                result = self._copy("out.bin", direct=True)
+                assert not result.direct
+                assert self.dst_store.data("/dst/out.bin") == self.data
+
+            def falls_back_to_pumping_on_short_copy(self):
+                self.data, data = self.data[:10], self.data
+                result = self._copy("out.bin", direct=True)
+                assert not result.direct
+                assert self.dst_store.data("/dst/out.bin") == data
+
+
+class Result_:
+    def _result(self, **kwargs):
+        return Result(
+            local="l",
+            orig_local="l",
+            remote="r",
+            orig_remote="r",
+            connection=None,
+            **kwargs
+        )
+
+    def size_and_elapsed_default_to_None(self):
+        result = self._result()
+        assert result.size is None
+        assert result.elapsed is None
+        assert result.throughput is None
+
+    def throughput_is_bytes_per_second(self):
+        assert self._result(size=100, elapsed=4).throughput == 25
+
+    def throughput_is_None_for_zero_elapsed_time(self):
+        assert self._result(size=100, elapsed=0).throughput is None
+
+    def sequential_transfers_record_size(self, sftp_objs):
+        transfer, client = sftp_objs
+        client.put.return_value.st_size = 1234
+        result = transfer.put("file")
+        assert result.size == 1234
+        assert result.elapsed >= 0
+
+
+class Progress_:
+    def setup(self):
+        self.store = FakeSFTPStore()
+        self.data = bytes(range(256)) * 40  # 10240 bytes
+        self.store.add("/remote/file", self.data)
+        self.patcher = patch("fabric.connection.SSHClient")
+        Client = self.patcher.start()
+        Client.return_value.open_sftp.side_effect = self.store.session
+        self.reports = []
+
+    def teardown(self):
+        self.patcher.stop()
+
+    def _transfer(self, **settings):
+        settings.setdefault("chunk_size", 1024)
+        settings.setdefault("progress_interval", 0)
+        config = Config(overrides={"transfers": settings})
+        return Transfer(Connection("host", config=config))
+
+    def fraction_is_portion_of_total(self):
+        progress = Progress(None, "l", "r", 25, 100, 1, 25)
+        assert progress.fraction == 0.25
+        assert Progress(None, "l", "r", 25, None, 1, 25).fraction is None
+
+    def repr_is_informative(self):
+        progress = Progress(None, "l", "r", 25, None, 1, 25, done=True)
+        assert repr(progress) == "<Progress 'r': 25/? bytes, 25 B/s (done)>"
+
+    def chunked_transfers_report_every_range(self, tmp_path):
+        result = self._transfer(channels=1).get(
+            "file",
+            str(tmp_path / "file"),
+            chunked=True,
+            callback=self.reports.append,
+        )
+        # One per 1KiB range, then the final one
+        assert len(self.reports) == 11
+        assert [x.transferred for x in self.reports[:10]] == list(
+            range(1024, 10241, 1024)
+        )
+        final = self.reports[-1]
+        assert final.done
+        assert final.transferred == final.total == result.size == 10240
+        assert final.connection is result.connection
+        assert final.remote == "/remote/file"
+        assert not any(x.done for x in self.reports[:-1])
+
+    def reports_are_rate_limited(self, tmp_path):
+        self._transfer(progress_interval=60).put(
+            BytesIO(self.data), "copy", callback=self.reports.append
+        )
+        assert len(self.reports) == 1
+        assert self.reports[0].done
+        assert self.reports[0].transferred == self.reports[0].total == 10240
+
+    def sequential_transfers_use_paramiko_callbacks(self, sftp_objs):
+        transfer, client = sftp_objs
+        transfer.connection.config.transfers.progress_interval = 0
+
+        def get(remotepath, localpath, callback):
+            callback(100, 300)
+            callback(300, 300)
+
+        client.get.side_effect = get
+        transfer.get("file", callback=self.reports.append)
+        assert [(x.transferred, x.total) for x in self.reports] == [
+            (100, 300),
+            (300, 300),
+            (300, 300),
+        ]
+        assert self.reports[-1].done
+
+    def parallel_workers_share_one_tally(self, tmp_path):
+        local = tmp_path / "file"
+        local.write_bytes(self.data)
+        self._transfer(channels=4).put(
+            str(local), "copy", chunked=True, callback=self.reports.append
+        )
+        assert self.reports[-1].transferred == 10240
+        assert len(self.reports) == 11
@@ -0,0 +1,314 @@
+import selectors
+import socket
+import time
+from unittest.mock import Mock
+
+from invoke.exceptions import ThreadException
+import pytest
+
+from fabric.tunnels import Tunnel, TunnelManager
+
+from _util import recv_exactly
+
+
+class FullChannel:
+    """
+    Channel stand-in whose SSH send window is full until told otherwise.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.window = 0
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def send(self, data):
+        if not self.window:
+            raise socket.timeout()
+        sent = self.sock.send(data[: self.window])
+        self.window -= sent
+        return sent
+
+
+def _block_channel(test):
+    # Swap a test's tunnel for one whose channel has a full send window.
+    test.channel = FullChannel(test.channel)
+    test.tunnel = Tunnel(channel=test.channel, sock=test.sock)
+
+
+class Tunnel_:
+    def setup(self):
+        self.channel, self.remote = socket.socketpair()
+        self.sock, self.local = socket.socketpair()
+        self.tunnel = Tunnel(channel=self.channel, sock=self.sock)
+        self.selector = selectors.DefaultSelector()
+
+    def teardown(self):
+        self.selector.close()
+        for sock in (self.channel, self.remote, self.sock, self.local):
+            sock.close()
+
+    def puts_both_ends_in_nonblocking_mode(self):
+        assert self.channel.gettimeout() == 0.0
+        assert self.sock.gettimeout() == 0.0
+
+    def finished_is_optional(self):
+        assert not self.tunnel.finished.is_set()
+
+    def forwards_socket_data_to_channel(self):
+        self.local.sendall(b"hello")
+        self.tunnel.handle(self.sock, selectors.EVENT_READ)
+        assert recv_exactly(self.remote, 5) == b"hello"
+
+    def forwards_channel_data_to_socket(self):
+        self.remote.sendall(b"hello")
+        self.tunnel.handle(self.channel, selectors.EVENT_READ)
+        assert recv_exactly(self.local, 5) == b"hello"
+
+    def chunk_sizes_default_to_64KiB(self):
+        assert self.tunnel.socket_chunk_size == 65536
+        assert self.tunnel.channel_chunk_size == 65536
+
+    def chunk_sizes_are_configurable(self):
+        tunnel = Tunnel(
+            channel=self.channel,
+            sock=self.sock,
+            socket_chunk_size=4,
+            channel_chunk_size=2,
+        )
+        self.local.sendall(b"hello")
+        tunnel.handle(self.sock, selectors.EVENT_READ)
+        assert recv_exactly(self.remote, 4) == b"hell"
+        self.remote.sendall(b"hello")
+        tunnel.handle(self.channel, selectors.EVENT_READ)
+        assert recv_exactly(self.local, 2) == b"he"
+        # The rest stays put until the next read
+        tunnel.handle(self.channel, selectors.EVENT_READ)
+        assert recv_exactly(self.local, 2) == b"ll"
+
+    def reuses_read_buffer_for_sockets(self):
+        for data in (b"hello", b"world"):
+            self.local.sendall(data)
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            assert recv_exactly(self.remote, 5) == data
+        assert len(self.tunnel._buffers) == 1
+        assert self.tunnel._buffers[self.sock][:5] == b"world"
+
+    def counts_bytes_in_each_direction(self):
+        self.local.sendall(b"hello")
+        self.tunnel.handle(self.sock, selectors.EVENT_READ)
+        self.remote.sendall(b"hi")
+        self.tunnel.handle(self.channel, selectors.EVENT_READ)
+        assert self.tunnel.bytes_sent == 5
+        assert self.tunnel.bytes_received == 2
+
+    def spurious_wakeups_are_harmless(self):
+        self.tunnel.handle(self.sock, selectors.EVENT_READ)
+        assert not self.tunnel.done
+
+    class registration:
+        def reads_from_both_ends_when_idle(self):
+            self.tunnel.update(self.selector)
+            sock_key = self.selector.get_key(self.sock)
+            channel_key = self.selector.get_key(self.channel)
+            assert sock_key.events == selectors.EVENT_READ
+            assert channel_key.events == selectors.EVENT_READ
+            assert sock_key.data is self.tunnel
+
+        def unregisters_everything_once_finished(self):
+            self.tunnel.update(self.selector)
+            self.tunnel.finished.set()
+            self.tunnel.update(self.selector)
+            assert not self.selector.get_map()
+
+    class backpressure:
+        def buffers_data_channel_cannot_take(self):
+            _block_channel(self)
+            self.local.sendall(b"hello")
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            assert self.tunnel.channel_blocked
+            # Channel window opens up; retrying delivers the rest
+            self.channel.window = 3
+            self.tunnel.handle(None, 0)
+            assert recv_exactly(self.remote, 3) == b"hel"
+            assert self.tunnel.channel_blocked
+            self.channel.window = 10
+            self.tunnel.handle(None, 0)
+            assert recv_exactly(self.remote, 2) == b"lo"
+            assert not self.tunnel.channel_blocked
+
+        def only_counts_bytes_actually_written(self):
+            _block_channel(self)
+            self.local.sendall(b"hello")
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            assert self.tunnel.bytes_sent == 0
+            self.channel.window = 3
+            self.tunnel.handle(None, 0)
+            assert self.tunnel.bytes_sent == 3
+
+        def reads_anew_instead_of_clobbering_buffer(self):
+            _block_channel(self)
+            self.local.sendall(b"hello")
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            # Direct calls while data is still pending must not overwrite it
+            self.local.sendall(b"world")
+            self.tunnel.read_and_write(self.sock, self.channel, 1024)
+            self.channel.window = 10
+            self.tunnel.handle(None, 0)
+            assert recv_exactly(self.remote, 10) == b"helloworld"
+
+        def stops_reading_end_whose_peer_is_blocked(self):
+            _block_channel(self)
+            self.local.sendall(b"hello")
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            self.tunnel.update(self.selector)
+            with pytest.raises(KeyError):
+                self.selector.get_key(self.sock)
+
+        def waits_for_writability_of_full_socket(self):
+            # Fill up the local socket's buffers
+            self.sock.setblocking(False)
+            try:
+                while True:
+                    self.sock.send(b"x" * 65536)
+            except BlockingIOError:
+                pass
+            self.remote.sendall(b"more")
+            self.tunnel.handle(self.channel, selectors.EVENT_READ)
+            self.tunnel.update(self.selector)
+            key = self.selector.get_key(self.sock)
+            assert key.events & selectors.EVENT_WRITE
+            # No more reading from the channel until that drains
+            with pytest.raises(KeyError):
+                self.selector.get_key(self.channel)
+
+    class eof:
+        def flushes_pending_data_before_being_done(self):
+            _block_channel(self)
+            self.local.sendall(b"bye")
+            self.local.shutdown(socket.SHUT_WR)
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            self.tunnel.handle(self.sock, selectors.EVENT_READ)
+            assert not self.tunnel.done
+            self.channel.window = 10
+            self.tunnel.handle(None, 0)
+            assert self.tunnel.done
+            assert recv_exactly(self.remote, 3) == b"bye"
+
+        def read_and_write_returns_True_on_empty_read(self):
+            self.local.close()
+            result = self.tunnel.read_and_write(self.sock, self.channel, 1024)
+            assert result is True
+
+    def close_closes_both_ends_and_sets_finished(self):
+        self.tunnel.close()
+        assert self.tunnel.finished.is_set()
+        assert recv_exactly(self.remote, 1) == b""
+        assert recv_exactly(self.local, 1) == b""
+
+
+class TunnelManager_:
+    def setup(self):
+        self.manager = TunnelManager()
+        self.manager.start()
+        assert self.manager.ready.wait(2)
+
+    def teardown(self):
+        self.manager.stop()
+        self.manager.join(2)
+
+    def _tunnel(self):
+        channel, remote = socket.socketpair()
+        sock, local = socket.socketpair()
+        self.manager.add_tunnel(Tunnel(channel=channel, sock=sock))
+        return remote, local
+
+    def forwards_added_tunnels(self):
+        pairs = [self._tunnel() for _ in range(3)]
+        for i, (remote, local) in enumerate(pairs):
+            local.sendall(str(i).encode())
+            remote.sendall(str(i * 2).encode())
+        for i, (remote, local) in enumerate(pairs):
+            assert recv_exactly(remote, 1) == str(i).encode()
+            assert recv_exactly(local, 1) == str(i * 2).encode()
+
+    def counts_bytes_across_all_tunnels(self):
+        pairs = [self._tunnel() for _ in range(2)]
+        for remote, local in pairs:
+            local.sendall(b"abc")
+            remote.sendall(b"de")
+            recv_exactly(remote, 3)
+            recv_exactly(local, 2)
+        self.manager.stop()
+        self.manager.join(2)
+        assert self.manager.bytes_sent == 6
+        assert self.manager.bytes_received == 4
+
+    def hands_chunk_sizes_to_its_tunnels(self):
+        manager = TunnelManager(socket_chunk_size=10, channel_chunk_size=20)
+        assert manager.tunnel_kwargs == dict(
+            socket_chunk_size=10, channel_chunk_size=20
+        )
+        assert TunnelManager().tunnel_kwargs == {}
+
+    def closes_tunnel_when_either_end_hangs_up(self):
+        remote, local = self._tunnel()
+        local.sendall(b"last words")
+        local.close()
+        assert recv_exactly(remote, 10) == b"last words"
+        assert recv_exactly(remote, 1) == b""
+
+    def stop_is_prompt_and_closes_tunnels(self):
+        remote, local = self._tunnel()
+        start = time.monotonic()
+        self.manager.stop()
+        self.manager.join(2)
+        # Much quicker than select_timeout
+        assert time.monotonic() - start < 0.5
+        assert not self.manager.is_alive()
+        assert recv_exactly(remote, 1) == b""
+        assert recv_exactly(local, 1) == b""
+
+    def setting_finished_directly_still_works(self):
+        self.manager.select_timeout = 0.05
+        # Get past the current (default length) select() call
+        self.manager._wake()
+        self.manager.finished.set()
+        self.manager.join(2)
+        assert not self.manager.is_alive()
+
+    def adding_tunnels_after_stopping_is_harmless(self):
+        self.manager.stop()
+        self.manager.join(2)
+        tunnel = Tunnel(channel=Mock(), sock=Mock())
+        self.manager.add_tunnel(tunnel)
+        # Not an error, though nothing will ever service it
+        assert not tunnel.finished.is_set()
+
+    def tunnel_errors_are_collected_without_harming_others(self):
+        class Sentinel(Exception):
+            pass
+
+        channel, remote = socket.socketpair()
+        sock, local = socket.socketpair()
+        broken = Mock(
+            wraps=channel,
+            fileno=channel.fileno,
+            recv=Mock(side_effect=Sentinel),
+            recv_into=Mock(side_effect=Sentinel),
+        )
+        self.manager.add_tunnel(Tunnel(channel=broken, sock=sock))
+        remote.sendall(b"boom")
+        # The broken tunnel is shut down...
+        assert recv_exactly(local, 1) == b""
+        # ...but the others keep going
+        other_remote, other_local = self._tunnel()
+        other_local.sendall(b"ok")
+        assert recv_exactly(other_remote, 2) == b"ok"
+        self.manager.stop()
+        self.manager.join(2)
+        wrapper = self.manager.exception()
+        assert wrapper.type is ThreadException
+        assert len(wrapper.value.exceptions) == 1
+        assert wrapper.value.exceptions[0].type is Sentinel